@@ -0,0 +1,95 @@
+"""load test of the build requests coalescing
+
+generate a synthetic aircraft graph, then send waves of concurrent build requests:
+in each wave, each distinct request (one by rail) is sent by several clients at the same time,
+as a supervision dashboard and a robot controller requesting the same sequence.
+the waves are run without and with the coalescing, and the number of buildings, the wall time
+and the latencies of the requests are compared
+
+usage: python -m benchmarks.bench_coalescing [--goals 3000] [--duplicates 4] [--waves 3]
+"""
+import argparse
+import statistics
+import threading
+import time
+from typing import Callable, Dict, List
+from processor.coalescing import SingleFlight, request_key
+from processor.components import FileDataUnit, SequenceUnit, SequenceTypeRegister
+from processor.model.partition import AIRCRAFT_RAIL_ORDER
+from .synthetic import generate_goals
+
+
+def run_waves(send:Callable[[Dict], None], requests:List[Dict], duplicates:int, waves:int) -> Dict:
+  """function to send the waves of requests, each request by duplicates clients at once
+  """
+  latencies = []
+  lock = threading.Lock()
+  tb = time.perf_counter()
+  for _ in range(waves):
+    clients = [request for request in requests for _ in range(duplicates)]
+    barrier = threading.Barrier(len(clients))
+
+    def client(request:Dict):
+      barrier.wait()
+      tr = time.perf_counter()
+      send(request)
+      with lock:
+        latencies.append(time.perf_counter() - tr)
+
+    threads = [threading.Thread(target=client, args=(request,)) for request in clients]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+
+  latencies.sort()
+  return {'wall': time.perf_counter() - tb,
+          'p50': statistics.median(latencies),
+          'p95': latencies[int(len(latencies)*0.95) - 1],
+          'requests': len(latencies)}
+
+
+def main(goal_number:int, duplicates:int, waves:int):
+  graph = generate_goals(goal_number)
+  situation = graph.situation_definition()
+  sequence_unit = SequenceUnit(FileDataUnit(graph.snapshot()))
+  requests = [{'rails': [rail], 'railArea': 'all', 'railSide': 'all', 'crossbeamSide': 'all'}
+              for rail in AIRCRAFT_RAIL_ORDER]
+
+  builds = 0
+  builds_lock = threading.Lock()
+
+  def build(goals_definition:Dict):
+    nonlocal builds
+    with builds_lock:
+      builds += 1
+    return sequence_unit.build(SequenceTypeRegister.work_area, goals_definition, situation)
+
+  coalescer = SingleFlight()
+
+  def coalesced_build(goals_definition:Dict):
+    key = request_key('work_area', goals_definition, situation)
+    return coalescer.do(key, build, goals_definition)
+
+  print(f"{goal_number} goals, {len(requests)} distinct requests x {duplicates} clients, {waves} waves")
+  print(f"{'mode':>10} {'requests':>9} {'builds':>7} {'wall':>9} {'p50':>9} {'p95':>9}")
+  for mode, send in (('direct', build), ('coalesced', coalesced_build)):
+    builds = 0
+    result = run_waves(send, requests, duplicates, waves)
+    print(f"{mode:>10} {result['requests']:>9} {builds:>7} {result['wall']:>8.2f}s"
+          f" {result['p50']:>8.2f}s {result['p95']:>8.2f}s")
+
+  sequence_unit.close()
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--goals', type=int, default=3000,
+                      help='number of goals of the synthetic aircraft')
+  parser.add_argument('--duplicates', type=int, default=4,
+                      help='number of clients sending each request at once')
+  parser.add_argument('--waves', type=int, default=3,
+                      help='number of waves of requests')
+  args = parser.parse_args()
+
+  main(args.goals, args.duplicates, args.waves)
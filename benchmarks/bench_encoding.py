@@ -0,0 +1,86 @@
+"""benchmark of the buildProcess wire formats
+
+compare the payload size and the serialisation time of the json sequence
+with the compact formats (asset and action dictionaries), with and without compression
+
+usage: python -m benchmarks.bench_encoding [--actions 10000]
+"""
+import argparse
+import json
+import time
+from typing import Callable, Dict, List
+from processor import encoding
+
+ASSETS = [{'uid': f'asset_{i}',
+           'description': f'mars asset {i}, robot carrier or effector',
+           'interface': 'fanuc_robot_interface'} for i in range(4)]
+
+TRANSITIONS = ['move_station_tool', 'load_effector', 'move_station_work',
+               'move_tcp_approach', 'move_tcp_clearance', 'release_work']
+
+
+def build_sequence(action_number:int) -> List[Dict]:
+  """function to build a sequence representative of a work sequence:
+  unique work actions separated by few repeated transition actions
+  """
+  sequence = []
+  for i in range(action_number):
+    if i % 2:
+      uid = TRANSITIONS[i % len(TRANSITIONS)]
+      sequence.append({'uid': uid,
+                       'description': f'transition action {uid}',
+                       'type': 'MOVE.TCP.CLEARANCE',
+                       'assets': ASSETS[:2]})
+    else:
+      sequence.append({'uid': f'drill_assembly_{i}',
+                       'description': f'drilling of the assembly {i}',
+                       'type': 'MOVE.TCP.WORK',
+                       'assets': ASSETS[:3]})
+  return sequence
+
+
+def measure(function:Callable, repeat:int=5) -> float:
+  best = float('inf')
+  for _ in range(repeat):
+    tb = time.perf_counter()
+    function()
+    best = min(best, time.perf_counter() - tb)
+  return best
+
+
+def run(action_number:int) -> List[Dict]:
+  body = {'buildProcess': build_sequence(action_number)}
+
+  results = []
+  formats = [(encoding.JSON_CONTENT_TYPE, None),
+             (encoding.JSON_CONTENT_TYPE, 'gzip'),
+             (encoding.COMPACT_JSON_CONTENT_TYPE, None),
+             (encoding.COMPACT_JSON_CONTENT_TYPE, 'gzip')]
+  if encoding.msgpack:
+    formats += [(encoding.COMPACT_MSGPACK_CONTENT_TYPE, None),
+                (encoding.COMPACT_MSGPACK_CONTENT_TYPE, 'gzip')]
+
+  for content_type, content_encoding in formats:
+    def encode():
+      payload = encoding.encode_body(body, content_type, content_encoding)
+      # the plain json body is serialized by the server
+      return payload if type(payload) == bytes else json.dumps(payload).encode('utf-8')
+
+    results.append({'content_type': content_type,
+                    'content_encoding': content_encoding,
+                    'size': len(encode()),
+                    'time': measure(encode)})
+  return results
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--actions', type=int, default=10000)
+  args = parser.parse_args()
+
+  results = run(args.actions)
+  reference = results[0]
+  for result in results:
+    print(f"{result['content_type']:40} {str(result['content_encoding']):8}"
+          f" size {result['size']:>10} ({result['size']/reference['size']:6.1%})"
+          f" time {result['time']*1000:8.2f} ms ({result['time']/reference['time']:6.1%})")
@@ -0,0 +1,183 @@
+"""benchmark of the register queries on a local neo4j database
+
+load a synthetic aircraft graph in the database (--load, the database is emptied first: use a database
+dedicated to the benchmark), ensure the indexes and constraints of the queries, then run the work and
+transition requests with the legacy queries (a CALL subquery by action part, the values in the query text)
+and the parameterized queries of the register, and compare the database time (result available + consumed)
+and the database hits (PROFILE) by request. the records of both shapes are checked to be the same actions
+
+the credentials are read from the DB_USERNAME and DB_PASSWORD environment variables
+
+usage: python -m benchmarks.bench_neo4j [--uri bolt://localhost:7687] [--load] [--goals 3000] [--repeat 5]
+"""
+import argparse
+import os
+import statistics
+import time
+from typing import Callable, Dict, List, Tuple
+from processor.db.drivers import Neo4jDriver
+from processor.db.queries import register
+from processor.model.partition import AIRCRAFT_RAIL_ORDER
+from .bench_queries import tree_action_by_state, tree_work_by_area
+from .synthetic import SyntheticGraph, generate_goals
+
+AREA_ALL = {'rails': 'all', 'railArea': 'all', 'railSide': 'all', 'crossbeamSide': 'all'}
+BATCH_SIZE = 1000
+
+
+def batches(rows:List[Dict]):
+  for i in range(0, len(rows), BATCH_SIZE):
+    yield rows[i:i+BATCH_SIZE]
+
+
+def load(driver:Neo4jDriver, graph:SyntheticGraph):
+  """function to empty the database and load the synthetic graph, with the same labels and relations
+  as the production graph
+  """
+  snapshot = graph.snapshot()
+  while driver.run('match (n) with n limit 10000 detach delete n return count(n) as count')[0]['count']:
+    pass
+  # the uid lookups of the loading use the indexes
+  driver.ensure_indexes(register.INDEXES)
+  driver.run('create index action_uid if not exists for (n:Action) on (n.uid)')
+
+  areas, states, assets = {}, {}, {}
+  for action in snapshot.actions:
+    for area in action['areas']:
+      areas[area['uid']] = area
+    for state in action['preconditions'] + action['results']:
+      states[state['definition']['uid']] = state['definition']
+    for asset in action['assets']:
+      assets[asset['definition']['uid']] = asset
+  for assembly in snapshot.assemblies:
+    for area in assembly['areas']:
+      areas[area['uid']] = area
+
+  driver.run('unwind $rows as row create (n:Process:Area) set n = row', rows=list(areas.values()))
+  driver.run('unwind $rows as row create (n:Resource:StateObject) set n = row', rows=list(states.values()))
+  for asset in assets.values():
+    label = [label for label in asset['type'] if not label in ('Resource', 'Asset')][0]
+    driver.run(f'create (n:Resource:Asset:{label}) set n = $definition', definition=asset['definition'])
+
+  for rows in batches(snapshot.actions):
+    driver.run('''unwind $rows as row
+                  create (action:Resource:Action) set action = row.definition
+                  with action, row
+                  call {with action, row
+                        unwind row.preconditions as precondition
+                        match (state:StateObject{uid: precondition.definition.uid})
+                        create (state)-[:PRECONDITION{state: precondition.state,
+                                                      relation: precondition.relation,
+                                                      priority: precondition.priority}]->(action)}
+                  call {with action, row
+                        unwind row.results as result
+                        match (state:StateObject{uid: result.definition.uid})
+                        create (action)-[:RESULT{state: result.state, relation: result.relation}]->(state)}
+                  call {with action, row
+                        unwind row.assets as asset
+                        match (node:Asset{uid: asset.definition.uid})
+                        create (action)-[:PERFORMED_BY]->(node)}
+                  call {with action, row
+                        unwind row.areas as area
+                        match (node:Area{uid: area.uid})
+                        create (action)-[:TO_REACH]->(node)}''', rows=rows)
+
+  for rows in batches(snapshot.assemblies):
+    driver.run('''unwind $rows as row
+                  create (assembly:Product:Assembly{uid: row.uid,
+                                                    origin: point({x: row.origin.x, y: row.origin.y, z: row.origin.z})})
+                  with assembly, row
+                  unwind row.areas as area
+                  match (node:Area{uid: area.uid})
+                  create (assembly)-[:LOCALIZED_IN]->(node)''', rows=rows)
+
+
+def transition_requests(graph:SyntheticGraph) -> List[Dict]:
+  """function to get the state definitions of the transitions lookups, as sent by the solver
+  """
+  requests = []
+  for action in graph.transition + graph.station + graph.approach:
+    result = action['results'][0]
+    uid = result['definition']['uid']
+    preconditions = [p for p in action['preconditions'] if p['definition']['uid'] == uid and p['relation'] == 'eq']
+    request = {'uid': uid, 'result': result['state']}
+    if preconditions:
+      request['precondition'] = preconditions[0]['state']
+    requests.append(request)
+  return requests
+
+
+def run(driver:Neo4jDriver, query:str, parameters:Dict) -> Tuple[float, set]:
+  # database time of a query in ms and the uids of the actions returned
+  records, summary = driver.run_with_summary(query, 'benchmark', **parameters)
+  return (summary['result_available_after'] or 0) + (summary['result_consumed_after'] or 0), \
+         set(record['definition']['uid'] for record in records)
+
+
+def db_hits(driver:Neo4jDriver, query:str, parameters:Dict) -> int:
+  # database hits of a query, run once with PROFILE
+  _, summary = driver.run_with_summary(f'PROFILE {query}', 'benchmark', **parameters)
+  return summary.get('db_hits', 0)
+
+
+def compare(driver:Neo4jDriver,
+            name:str,
+            legacy:Callable[[Dict], str],
+            builder:Callable[[Dict], Tuple[str, Dict]],
+            requests:List[Dict],
+            repeat:int):
+  """function to run the requests with both shapes and print the database time and hits by request
+  """
+  times = {'legacy': [], 'register': []}
+  hits = {'legacy': [], 'register': []}
+  for request in requests:
+    legacy_query = legacy(request)
+    query, parameters = builder(request)
+    # first run to plan the queries, not measured
+    _, legacy_uids = run(driver, legacy_query, {})
+    _, uids = run(driver, query, parameters)
+    assert legacy_uids == uids, f"{name} records differ for {request}"
+    hits['legacy'].append(db_hits(driver, legacy_query, {}))
+    hits['register'].append(db_hits(driver, query, parameters))
+    for _ in range(repeat):
+      times['legacy'].append(run(driver, legacy_query, {})[0])
+      times['register'].append(run(driver, query, parameters)[0])
+
+  for shape, shape_times in times.items():
+    print(f"{name:>12} {shape:>9} {len(requests):>9} {statistics.median(shape_times):>9.1f}ms"
+          f" {sum(shape_times)/len(shape_times):>9.1f}ms {statistics.mean(hits[shape]):>11.0f}")
+
+
+def main(uri:str, goal_number:int, repeat:int, load_graph:bool):
+  driver = Neo4jDriver(uri, os.getenv('DB_USERNAME'), os.getenv('DB_PASSWORD'))
+  graph = generate_goals(goal_number)
+  try:
+    if load_graph:
+      tb = time.time()
+      load(driver, graph)
+      print(f"synthetic graph of {len(graph.work)} goals loaded in {round(time.time() - tb, 1)} seconds")
+    else:
+      driver.ensure_indexes(register.INDEXES)
+
+    work_requests = [AREA_ALL] + [dict(AREA_ALL, rails=[rail]) for rail in AIRCRAFT_RAIL_ORDER]
+    print(f"{'query':>12} {'shape':>9} {'requests':>9} {'p50':>11} {'mean':>11} {'db hits':>11}")
+    compare(driver, 'work', tree_work_by_area, register.build_work_by_area, work_requests, repeat)
+    compare(driver, 'transition', tree_action_by_state, register.build_action_by_state,
+            transition_requests(graph), repeat)
+  finally:
+    driver.close()
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--uri', type=str, default='bolt://localhost:7687',
+                      help='bolt uri of the benchmark database')
+  parser.add_argument('--goals', type=int, default=3000,
+                      help='number of goals of the synthetic aircraft')
+  parser.add_argument('--repeat', type=int, default=5,
+                      help='number of runs by request and shape')
+  parser.add_argument('--load', action='store_true',
+                      help='empty the database and load the synthetic graph')
+  args = parser.parse_args()
+
+  main(args.uri, args.goals, args.repeat, args.load)
@@ -0,0 +1,164 @@
+"""microbenchmark of the cypher queries construction
+
+compare the construction of the queries by a tree of DBQuery objects built at each call
+(the previous shape: a CALL subquery by action part, the values in the query text) with the
+query templates rendered at import, where only the area filters of the requests are rendered.
+the transitions lookup (build_action_by_state) is on the solver hot path, one query by state.
+the legacy builders are also used by bench_neo4j to compare the queries on a database
+
+usage: python -m benchmarks.bench_queries [--number 20000]
+"""
+import argparse
+import timeit
+from typing import Callable, Dict
+from processor.db.queries import register
+from processor.db.queries.components import DBPipeline, DBQuery, LogicClause, LogicList, LogicOperator
+
+STATE_DEFINITION = {'uid': 'station', 'result': 'station_12', 'precondition': 'station_11'}
+AREA_DEFINITION = {'rails': ['rail_1', 'rail_2'], 'railArea': 'all', 'railSide': 'rail_side_lhs', 'crossbeamSide': 'all'}
+
+
+def legacy_subqueries() -> list:
+  """function to build the preconditions, results and assets subqueries of the legacy shape
+  """
+  preconditions = DBQuery()
+  preconditions.input_clause.add('action')
+  preconditions.match_clause.add('(action)<-[precondition:PRECONDITION]-(precond_state:Resource:StateObject)')
+  preconditions.with_clause.add('''collect({state:precondition.state,
+                                   relation:precondition.relation,
+                                   priority:precondition.priority,
+                                   definition:properties(precond_state)})''', 'preconditions')
+  preconditions.return_clause.add('preconditions')
+
+  results = DBQuery()
+  results.input_clause.add('action')
+  results.match_clause.add('(action)-[result:RESULT]->(result_state:Resource:StateObject)')
+  results.with_clause.add('''collect({definition:properties(result_state),
+                             state:result.state,
+                             relation:result.relation})''', 'results')
+  results.return_clause.add('results')
+
+  assets = DBQuery()
+  assets.input_clause.add('action')
+  assets.match_clause.add('(action)-[:PERFORMED_BY]->(asset:Resource:Asset)')
+  assets.with_clause.add('''collect({definition: properties(asset),
+                            type: labels(asset)})''', 'assets')
+  assets.return_clause.add('assets')
+  return [preconditions, results, assets]
+
+
+def legacy_pipeline_end(pipeline:DBPipeline, keys:list):
+  for key in keys:
+    if key == 'definition':
+      pipeline.with_clause.add('properties(action)', 'definition')
+    else:
+      pipeline.with_clause.add(key)
+    pipeline.return_clause.add(key)
+
+
+def tree_action_by_state(state_object_definition:Dict) -> str:
+  """function to build the legacy transition query by a tree of DBQuery objects
+  """
+  where_and = LogicClause('where')
+  uid = state_object_definition['uid']
+  result = state_object_definition['result']
+  precondition = state_object_definition.get('precondition')
+  where_and.add(f'state_object.uid = "{uid}"')
+  where_and.add(f'result.state = "{result}"')
+  if precondition:
+    pre_or = LogicList(LogicOperator.OR)
+    eq_pre_and = LogicList(LogicOperator.AND)
+    neq_pre_and = LogicList(LogicOperator.AND)
+    eq_pre_and.add('precondition.relation = "eq"')
+    eq_pre_and.add(f'precondition.state = "{precondition}"')
+    neq_pre_and.add('precondition.relation = "neq"')
+    neq_pre_and.add(f'precondition.state = "{result}"')
+    pre_or.add(eq_pre_and)
+    pre_or.add(neq_pre_and)
+    where_and.add(pre_or)
+
+  action = DBQuery()
+  action.match_clause.add("(state_object:StateObject)-[precondition:PRECONDITION]->(action:Action)-[result:RESULT]->(state_object)")
+  action.where_clause = where_and
+  action.return_clause.add('action')
+
+  pipeline = DBPipeline()
+  pipeline.add(action)
+  for subquery in legacy_subqueries():
+    pipeline.add(subquery)
+  legacy_pipeline_end(pipeline, ['definition', 'preconditions', 'results', 'assets'])
+  return pipeline.build()
+
+
+def tree_work_by_area(area_definition:Dict) -> str:
+  """function to build the legacy work query by a tree of DBQuery objects,
+  the work actions of each assembly are looked up in a subquery by assembly
+  """
+  where_and = LogicClause('where')
+  area_str = "exists((assembly)-[:LOCALIZED_IN]->(:Process:Area{{uid:'{area_uid}'}}))"
+  for value in area_definition.values():
+    if not value == 'all':
+      if type(value) == list:
+        where_or = LogicList(LogicOperator.OR)
+        for uid in value:
+          where_or.append(area_str.format(area_uid=uid))
+        where_and.add(where_or)
+      else:
+        where_and.add(area_str.format(area_uid=value))
+
+  assembly = DBQuery()
+  assembly.match_clause.add('(assembly:Product:Assembly)-[:LOCALIZED_IN]->(area:Process:Area)')
+  assembly.where_clause = where_and
+  assembly.with_clause.add('assembly.uid', 'uid')
+  assembly.with_clause.add('''{coordinates: {x:assembly.origin.x,
+                                             y:assembly.origin.y,
+                                             z:assembly.origin.z},
+                               areas:collect({reference: area.reference,
+                                              type: area.type,
+                                              uid: area.uid})}''', 'position')
+  assembly.return_clause.add('uid')
+  assembly.return_clause.add('position')
+
+  action = DBQuery()
+  action.input_clause.add('uid')
+  action.match_clause.add('''(action:Resource:Action{type:"MOVE.TCP.WORK"})
+                          -[result:RESULT]->(so:Resource:StateObject{uid:"tcp_work"})''')
+  # equality join, the assembly uid is a string (same semantic as the graph snapshot)
+  action.where_clause.add('result.state = uid')
+  action.return_clause.add('action')
+
+  pipeline = DBPipeline()
+  pipeline.add(assembly)
+  pipeline.add(action)
+  for subquery in legacy_subqueries():
+    pipeline.add(subquery)
+  legacy_pipeline_end(pipeline, ['definition', 'preconditions', 'results', 'assets', 'position'])
+  return pipeline.build()
+
+
+def measure(function:Callable[[Dict], str], definition:Dict, number:int) -> float:
+  """function to get the best time of a construction, in microseconds
+  """
+  return min(timeit.repeat(lambda: function(definition), number=number, repeat=5)) / number * 1e6
+
+
+def main(number:int):
+  cases = (('action_by_state tree', tree_action_by_state, STATE_DEFINITION),
+           ('action_by_state template', register.build_action_by_state, STATE_DEFINITION),
+           ('work_by_area tree', tree_work_by_area, AREA_DEFINITION),
+           ('work_by_area template', register.build_work_by_area, AREA_DEFINITION),
+           ('station_by_area template', register.build_station_by_area, AREA_DEFINITION))
+
+  print(f"{number} constructions by case")
+  print(f"{'case':>26} {'us/query':>9}")
+  for name, function, definition in cases:
+    print(f"{name:>26} {measure(function, definition, number):>9.2f}")
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--number', type=int, default=20000,
+                      help='number of constructions by measure')
+  args = parser.parse_args()
+
+  main(args.number)
@@ -0,0 +1,100 @@
+"""benchmark of the graph snapshot loading
+
+for each goals number, generate a synthetic aircraft graph, save it as json, gzip json and binary snapshot
+and measure in a new process (as a worker) the load time, the time of a first work query
+and the resident memory after the load (anonymous memory owned by the process, file memory shared by the processes)
+
+usage: python -m benchmarks.bench_snapshot [--goals 1000 10000 100000] [--repeat 3]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+from processor.components import FileDataUnit
+from processor.db.binary import write_binary_snapshot
+from .synthetic import generate_goals
+
+AREA_ALL = {'rails': 'all', 'railArea': 'all', 'railSide': 'all', 'crossbeamSide': 'all'}
+
+FORMATS = {'json': 'graph.json', 'json.gz': 'graph.json.gz', 'bin': 'graph.bin'}
+
+
+def resident_memory() -> Dict[str, int]:
+  """function to read the resident memory of the process in bytes (linux only)
+  """
+  memory = {}
+  with open('/proc/self/status') as status:
+    for line in status:
+      key, _, value = line.partition(':')
+      if key in ('VmRSS', 'RssAnon', 'RssFile'):
+        memory[key] = int(value.split()[0]) * 1024
+  return memory
+
+
+def child(path:str):
+  # run in a new process, print the measures as json
+  before = resident_memory()
+  tb = time.perf_counter()
+  data_unit = FileDataUnit.from_file(path)
+  load = time.perf_counter() - tb
+
+  tb = time.perf_counter()
+  records = data_unit.get_work_by_area(AREA_ALL)
+  query = time.perf_counter() - tb
+  del records
+
+  after = resident_memory()
+  print(json.dumps({'load': load,
+                    'query': query,
+                    'anonymous': after.get('RssAnon', after['VmRSS']) - before.get('RssAnon', before['VmRSS']),
+                    'file': after.get('RssFile', 0) - before.get('RssFile', 0)}))
+  data_unit.close()
+
+
+def measure(path:str, repeat:int) -> Dict:
+  """function to measure the load of a snapshot file in new processes, the best run is kept
+  """
+  runs = []
+  for _ in range(repeat):
+    output = subprocess.run([sys.executable, '-m', 'benchmarks.bench_snapshot', '--child', path],
+                            capture_output=True, check=True, text=True).stdout
+    runs.append(json.loads(output))
+  return min(runs, key=lambda run: run['load'])
+
+
+def main(goal_numbers:List[int], repeat:int):
+  print(f"{'goals':>8} {'format':>8} {'size':>10} {'load':>9} {'query':>9} {'anon rss':>10} {'file rss':>10}")
+  with tempfile.TemporaryDirectory() as directory:
+    for goal_number in goal_numbers:
+      snapshot = generate_goals(goal_number).snapshot()
+      paths = {name: os.path.join(directory, file_name) for name, file_name in FORMATS.items()}
+      snapshot.save(paths['json'])
+      snapshot.save(paths['json.gz'])
+      write_binary_snapshot(snapshot, paths['bin'])
+      del snapshot
+
+      for name, path in paths.items():
+        result = measure(path, repeat)
+        print(f"{goal_number:>8} {name:>8} {os.path.getsize(path)/2**20:>8.1f}Mi"
+              f" {result['load']*1000:>7.1f}ms {result['query']*1000:>7.1f}ms"
+              f" {result['anonymous']/2**20:>8.1f}Mi {result['file']/2**20:>8.1f}Mi")
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--goals', type=int, nargs='+', default=[1000, 10000, 100000],
+                      help='goals numbers to benchmark')
+  parser.add_argument('--repeat', type=int, default=3,
+                      help='number of loads by format, the best time is kept')
+  parser.add_argument('--child', type=str,
+                      help=argparse.SUPPRESS)
+  args = parser.parse_args()
+
+  if args.child:
+    child(args.child)
+  else:
+    main(args.goals, args.repeat)
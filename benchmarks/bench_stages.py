@@ -0,0 +1,132 @@
+"""benchmark of the sequence building stages
+
+for each goals number, generate a synthetic aircraft graph and measure the time and the peak memory of each stage:
+query (FileDataUnit on the graph snapshot), parsing (Action.from_dict), sort (sort_by_position), resolve (SequenceSolver),
+probing (begin_with_probing), serialisation (Action.to_dict)
+
+the results are written in a json file to track the regressions
+
+usage: python -m benchmarks.bench_stages [--goals 100 1000 10000 100000] [--output bench_results.json]
+"""
+import argparse
+import datetime
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+from processor.components import FileDataUnit, SequenceSolver
+from processor.model.marsnode import Action
+from processor.model.optimization import begin_with_probing
+from processor.model.scoring import sort_by_position
+from .synthetic import generate_goals
+
+AREA_ALL = {'rails': 'all', 'railArea': 'all', 'railSide': 'all', 'crossbeamSide': 'all'}
+
+
+def measure_time(function:Callable, repeat:int) -> float:
+  """function to measure the best execution time of a function on several runs
+  """
+  best = float('inf')
+  for _ in range(repeat):
+    tb = time.perf_counter()
+    function()
+    best = min(best, time.perf_counter() - tb)
+  return best
+
+
+def measure_memory(function:Callable) -> int:
+  """function to measure the peak of memory allocated during a function execution
+  """
+  tracemalloc.start()
+  try:
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+  finally:
+    tracemalloc.stop()
+  return peak
+
+
+def stages(data_unit:FileDataUnit, situation_definition:Dict) -> Dict[str, Callable]:
+  """function to define the stages, each stage run on the result of the previous one
+  """
+  state = {}
+
+  def query():
+    state['records'] = data_unit.get_work_by_area(AREA_ALL)
+
+  def parsing():
+    state['actions'] = [Action.from_dict(record) for record in state['records']]
+
+  def sort():
+    state['goals'] = sort_by_position(state['actions'])
+
+  def resolve():
+    # new solver on each run, no transitions cached from a previous run
+    solver = SequenceSolver(data_unit)
+    state['sequence'] = solver.resolve(state['goals'], situation_definition)
+
+  def probing():
+    state['optimized'] = begin_with_probing(state['sequence'])
+
+  def serialisation():
+    state['json'] = [action.to_dict() for action in state['optimized']]
+
+  return {'query': query,
+          'parsing': parsing,
+          'sort': sort,
+          'resolve': resolve,
+          'probing': probing,
+          'serialisation': serialisation}, state
+
+
+def run(goal_number:int, repeat:int) -> Dict:
+  graph = generate_goals(goal_number)
+  data_unit = FileDataUnit(graph.snapshot())
+  situation_definition = graph.situation_definition()
+
+  stage_functions, state = stages(data_unit, situation_definition)
+  result = {'goals': len(graph.work), 'stages': {}}
+
+  for name, function in stage_functions.items():
+    elapsed = measure_time(function, repeat)
+    peak = measure_memory(function)
+    result['stages'][name] = {'time': elapsed, 'peak_memory': peak}
+
+  result['sequence_length'] = len(state['json'])
+  result['total_time'] = sum(stage['time'] for stage in result['stages'].values())
+  return result
+
+
+def main(goal_numbers:List[int], output:str, repeat:int):
+  results = []
+  for goal_number in goal_numbers:
+    # one run only for the big graphs
+    result = run(goal_number, repeat if goal_number < 10000 else 1)
+    results.append(result)
+
+    stage_times = ' '.join(f"{name} {stage['time']*1000:.1f}ms" for name, stage in result['stages'].items())
+    peak = max(stage['peak_memory'] for stage in result['stages'].values())
+    print(f"{result['goals']:>7} goals - total {result['total_time']:.3f}s - peak {peak/2**20:.1f}MiB - {stage_times}")
+
+  report = {'benchmark': 'stages',
+            'date': datetime.datetime.now().isoformat(),
+            'python': sys.version,
+            'platform': platform.platform(),
+            'results': results}
+
+  with open(output, 'w') as output_file:
+    json.dump(report, output_file, indent=2)
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--goals', type=int, nargs='+', default=[100, 1000, 10000, 100000],
+                      help='goals numbers to benchmark')
+  parser.add_argument('--repeat', type=int, default=3,
+                      help='number of runs by stage, the best time is kept')
+  parser.add_argument('--output', type=str, default='bench_results.json',
+                      help='path of the json results file')
+  args = parser.parse_args()
+  main(args.goals, args.output, args.repeat)
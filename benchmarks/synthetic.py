@@ -0,0 +1,226 @@
+"""synthetic aircraft graph generator
+
+generate the records returned by the register queries (definition, preconditions, results, assets, position)
+for a synthetic aircraft: N rails, M assemblies by rail area, effectors, stations, approaches and probing states.
+
+the generated transitions follow the state evolutions of the production graph:
+  - effectors loaded/unloaded at the tool station
+  - one work station by rail and rail area, one approach by station (by crossbeam side for the flange)
+  - one probing action by rail and crossbeam side, required before the flange work
+  - generic clearance and release actions to leave the approach and the work positions
+"""
+import random
+from typing import Dict, List
+from processor.db.snapshot import GraphSnapshot
+from processor.model.scoring import AIRCRAFT_RAIL_ORDER
+
+# precondition priority by state, the work states (probing) first
+STATE_PRIORITY = {'work': 0, 'effector': 1, 'station': 2, 'tcp_approach': 3, 'tcp_work': 4}
+
+EFFECTORS = {'flange': 'flange_c_drilling', 'web': 'web_c_drilling'}
+
+ROBOT_STATES = {'effector': 'no_effector',
+                'station': 'home_station',
+                'tcp_approach': 'move_station_position',
+                'tcp_work': 'out_work'}
+
+ASSETS = [{'definition': {'uid': 'mars_robot',
+                          'description': 'mars robot carrier',
+                          'interface': 'fanuc_robot_interface'},
+           'type': ['Resource', 'Asset', 'Robot']},
+          {'definition': {'uid': 'mars_controller',
+                          'description': 'mars cell controller',
+                          'interface': 'plc_interface'},
+           'type': ['Resource', 'Asset', 'Controller']}]
+
+
+def state(uid:str, value:str, relation:str='eq', priority:int=None) -> Dict:
+  """function to build a stateobject definition, priority is None for the results
+  """
+  definition = {'definition': {'uid': uid, 'description': f'{uid} state meta object'},
+                'state': value,
+                'relation': relation}
+  if priority is not None:
+    definition['priority'] = priority
+  return definition
+
+
+def precondition(uid:str, value:str, relation:str='eq') -> Dict:
+  priority = STATE_PRIORITY.get(uid, STATE_PRIORITY['work'])
+  return state(uid, value, relation, priority)
+
+
+def action(uid:str, type:str, preconditions:List[Dict], results:List[Dict], areas:List[Dict]=None,
+           coordinates:Dict=None) -> Dict:
+  """function to build an action record, the position is added if areas are defined
+  the position has the shape of the register queries: the areas, and the coordinates (assembly origin) for the work actions
+  """
+  record = {'definition': {'uid': uid, 'description': f'{type.lower()} {uid}', 'type': type},
+            'preconditions': preconditions,
+            'results': results,
+            'assets': ASSETS}
+  if areas:
+    record['position'] = {'areas': areas}
+    if coordinates:
+      record['position']['coordinates'] = coordinates
+  return record
+
+
+def areas(rail:str, rail_area:str, rail_side:str=None, crossbeam_side:str=None) -> List[Dict]:
+  area_list = [{'reference': 'aircraft', 'type': 'rail', 'uid': rail},
+               {'reference': 'rail', 'type': 'area', 'uid': rail_area}]
+  if rail_side:
+    area_list.append({'reference': 'rail', 'type': 'side', 'uid': rail_side})
+  if crossbeam_side:
+    area_list.append({'reference': 'crossbeam', 'type': 'side', 'uid': crossbeam_side})
+  return area_list
+
+
+def action_record(record:Dict) -> Dict:
+  # the action record without position
+  return {key: value for key, value in record.items() if key != 'position'}
+
+
+def probing_state(rail:str, crossbeam_side:str) -> str:
+  prefix = 'kff' if crossbeam_side == 'front' else 'kfr'
+  return f'{prefix}_{rail}'
+
+
+class SyntheticGraph:
+  """records of a synthetic aircraft graph, by register query
+  """
+  def __init__(self, work:List[Dict], station:List[Dict], approach:List[Dict], transition:List[Dict],
+               rails:List[str]):
+    self.work = work
+    self.station = station
+    self.approach = approach
+    self.transition = transition
+    self.rails = rails
+
+  @property
+  def actions(self) -> List[Dict]:
+    return self.work + self.station + self.approach + self.transition
+
+  def snapshot(self) -> GraphSnapshot:
+    """function to build the graph snapshot, same content as an export of the database
+    """
+    actions = []
+    # the work actions position is the assembly position, not an area to reach
+    for record in self.work:
+      actions.append(dict(action_record(record), areas=[]))
+    for record in self.station + self.approach + self.transition:
+      areas = record['position']['areas'] if 'position' in record else []
+      actions.append(dict(action_record(record), areas=areas))
+
+    assemblies = [{'uid': record['results'][0]['state'],
+                   'origin': record['position']['coordinates'],
+                   'areas': record['position']['areas']} for record in self.work]
+
+    return GraphSnapshot(actions, assemblies)
+
+  def situation_definition(self) -> Dict:
+    """function to build the initial situation definition (same shape as mars.yaml default situations)
+    robot at home without effector and no rail probed
+    """
+    robot_situation = {uid: state(uid, value, priority=0) for uid, value in ROBOT_STATES.items()}
+    work_situation = {}
+    for rail in self.rails:
+      for side in ('front', 'rear'):
+        uid = probing_state(rail, side)
+        key = uid.replace('+', 'p').replace('-', 'n')
+        work_situation[key] = state(uid, 'no_probed', priority=0)
+    return {'robot_situation': robot_situation, 'work_situation': work_situation}
+
+
+def generate(rail_number:int=6, assemblies:int=10, seed:int=0) -> SyntheticGraph:
+  """function to generate a synthetic aircraft graph
+
+  Args:
+      rail_number (int, optional): number of rails (max 6). Defaults to 6.
+      assemblies (int, optional): number of assemblies by rail area (flange front, flange rear, web). Defaults to 10.
+      seed (int, optional): random seed for the coordinates. Defaults to 0.
+
+  Returns:
+      SyntheticGraph: the generated records, goals number = rail_number * 3 * assemblies
+  """
+  rnd = random.Random(seed)
+  rails = list(AIRCRAFT_RAIL_ORDER[:rail_number])
+  work, station, approach, transition = [], [], [], []
+
+  # robot carrier transitions
+  transition.append(action('move_station_tool', 'MOVE.STATION.TOOL',
+                           [precondition('station', 'tool_station', 'neq'),
+                            precondition('tcp_approach', 'move_station_position')],
+                           [state('station', 'tool_station')]))
+  transition.append(action('move_station_home', 'MOVE.STATION.HOME',
+                           [precondition('station', 'home_station', 'neq'),
+                            precondition('tcp_approach', 'move_station_position')],
+                           [state('station', 'home_station')]))
+  transition.append(action('clearance', 'MOVE.TCP.CLEARANCE',
+                           [precondition('tcp_approach', 'move_station_position', 'neq'),
+                            precondition('tcp_work', 'out_work')],
+                           [state('tcp_approach', 'move_station_position')]))
+  transition.append(action('release', 'MOVE.TCP.CLEARANCE',
+                           [precondition('tcp_work', 'out_work', 'neq')],
+                           [state('tcp_work', 'out_work')]))
+
+  for effector in EFFECTORS.values():
+    transition.append(action(f'load_{effector}', 'LOAD.EFFECTOR',
+                             [precondition('effector', 'no_effector'),
+                              precondition('station', 'tool_station')],
+                             [state('effector', effector)]))
+    transition.append(action(f'unload_{effector}', 'UNLOAD.EFFECTOR',
+                             [precondition('effector', effector),
+                              precondition('station', 'tool_station')],
+                             [state('effector', 'no_effector')]))
+
+  for rail in rails:
+    for rail_area in ('flange', 'web'):
+      station_uid = f'station_{rail}_{rail_area}'
+      station.append(action(f'move_{station_uid}', 'MOVE.STATION.WORK',
+                            [precondition('station', station_uid, 'neq'),
+                             precondition('tcp_approach', 'move_station_position')],
+                            [state('station', station_uid)],
+                            areas(rail, rail_area)))
+
+      sides = ('front', 'rear') if rail_area == 'flange' else (None,)
+      for side in sides:
+        rail_side = 'right' if side else None
+        approach_uid = f'approach_{rail}_{rail_area}_{side}' if side else f'approach_{rail}_{rail_area}'
+        approach.append(action(f'move_{approach_uid}', 'MOVE.TCP.APPROACH',
+                               [precondition('station', station_uid),
+                                precondition('tcp_approach', 'move_station_position'),
+                                precondition('tcp_work', 'out_work')],
+                               [state('tcp_approach', approach_uid)],
+                               areas(rail, rail_area, rail_side, side)))
+
+        work_preconditions = [precondition('effector', EFFECTORS[rail_area]),
+                              precondition('station', station_uid),
+                              precondition('tcp_approach', approach_uid),
+                              precondition('tcp_work', 'out_work')]
+
+        # the flange must be probed before the work
+        if side:
+          probing_uid = probing_state(rail, side)
+          transition.append(action(f'probe_{probing_uid}', 'WORK.PROBE',
+                                   [precondition(probing_uid, 'no_probed')] + work_preconditions,
+                                   [state(probing_uid, 'probed')]))
+          work_preconditions = [precondition(probing_uid, 'probed')] + work_preconditions
+
+        for i in range(assemblies):
+          assembly_uid = f'assembly_{rail}_{rail_area}_{side}_{i}' if side else f'assembly_{rail}_{rail_area}_{i}'
+          coordinates = {'x': rnd.randint(-15000, 15000), 'y': 0, 'z': rnd.randint(0, 1000)}
+          work.append(action(f'drill_{assembly_uid}', 'MOVE.TCP.WORK',
+                             work_preconditions,
+                             [state('tcp_work', assembly_uid)],
+                             areas(rail, rail_area, rail_side, side),
+                             coordinates))
+
+  return SyntheticGraph(work, station, approach, transition, rails)
+
+
+def generate_goals(goal_number:int, seed:int=0) -> SyntheticGraph:
+  """function to generate a synthetic aircraft graph with about goal_number work goals on the six rails
+  """
+  assemblies = max(1, round(goal_number / (len(AIRCRAFT_RAIL_ORDER) * 3)))
+  return generate(len(AIRCRAFT_RAIL_ORDER), assemblies, seed)
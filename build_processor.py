@@ -1,6 +1,6 @@
 from ast import arg
 from glob import glob
-from typing import Dict, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from exceptions import BaseExceptionType, BaseException
 from server.http import HttpServer, EFunction
 from server.amqp import AMQPServer, CPipeline, CFunction
@@ -9,12 +9,35 @@ from server.validation import Validator
 from utils import GetAttrEnum, GetItemEnum, get_config_from_file, get_validation_schemas
 import re
 import os
+import copy
+import json
 import sys
+import time
+import threading
+import tracemalloc
 import logging
 import argparse
 from enum import Enum
+from functools import partial, wraps
+from concurrent.futures import Future
+from contextlib import ExitStack, nullcontext
+from contextvars import ContextVar
 from dotenv import load_dotenv
-from processor.components import DataUnit, SequenceUnit, SequenceTypeRegister
+from processor.components import DataUnit, Neo4jDataUnit, FileDataUnit, ReplayDataUnit, SequenceUnit, SequenceTypeRegister, NOT_COUNTED
+from processor.db.exceptions import DBDriverException, DBExceptionType
+from processor.encoding import encode_response
+from processor.metrics import REGISTRY, PROMETHEUS_CONTENT_TYPE, STAGE_SECONDS, REQUESTS
+from processor.trace import SolverTrace
+from processor.profiler import RequestProfiler
+from processor.memory import MemoryBudget
+from processor.admission import AdmissionController, AdmissionLane, busy_response, LIGHT_LANE, HEAVY_LANE
+from processor.exceptions import BusyException
+from processor.coalescing import SingleFlight, completed, request_key
+from processor.versioning import GraphVersionWatcher
+from processor.warmup import WarmUp
+from processor.persistence import DiskCache
+from processor.model.partition import AIRCRAFT_RAIL_ORDER
+from processor.model.situation import SituationTemplate, overlay_situation_definition
 
 load_dotenv()
 
@@ -26,15 +49,37 @@ __MARS_CONFIG_FILE = './config/mars.yaml'
 DATA_UNIT:DataUnit = None
 SEQUENCE_UNIT:SequenceUnit = None
 
-DEFAULT_SITUATION_DEFINITION = None
+# default situation parsed once, the requests situations are overlays of it
+DEFAULT_SITUATION:SituationTemplate = None
 DEFAULT_GOALS_DEFINITION = None
 
+AMQP_SERVER:AMQPServer = None
+# the responses are published by the consumer and by the heavy lane workers, one publication at once
+PUBLISH_LOCK = threading.Lock()
+STREAM_CHUNK_SIZE = 50
+
+# metrics report published on amqp every METRICS_REPORT_INTERVAL seconds (0 = no report)
+METRICS_REPORT_INTERVAL = 0
+METRICS_REPORT_TOPIC = 'report.build_processor.metrics'
+LAST_METRICS_REPORT = time.time()
+
+# profiler of the requests with a x-profile header, None if profiling not configured
+PROFILER:RequestProfiler = None
+# profile headers of the request handled, set when its build is profiled in the thread processing it
+PROFILE_HEADERS:ContextVar[Optional[Dict]] = ContextVar('profile_headers', default=None)
+
+# admission control of the build requests, light and heavy lanes, None if not configured
+ADMISSION:AdmissionController = None
+
+# coalescing of the identical build requests in flight, None if disabled
+COALESCER:SingleFlight = None
+
 # get neo4j credentials => env var
 DB_USER  = os.getenv('DB_USERNAME')
 DB_PASSWD = os.getenv('DB_PASSWORD')
 
 # amqp topics
-__AMQP_TOPICS = "request.build_processor", "report.build_processor"
+__AMQP_TOPICS = "request.build_processor", "request.build_processor.resume", "request.build_processor.stream", "report.build_processor"
 
 class ConfigLoader(argparse.Action):
   def __call__(self, parser, namespace, values, option_strings=None) -> Dict:
@@ -54,16 +99,159 @@ class ConfigLoader(argparse.Action):
                         f"validation schema directory {values} not found") 
 
 
+def profiled(handler:Callable) -> Callable:
+  # run the handler under the profiler if the request headers (or amqp message headers) ask it
+  # the profile id is returned in the response headers
+  # on amqp with admission control a request may be handed off to the heavy lane workers,
+  # so only its build is profiled, in the thread processing it (see process)
+  @wraps(handler)
+  def profiled_handler(body:Dict,
+                       headers:Dict,
+                       path:str,
+                       query_args:Dict):
+    if not PROFILER or not RequestProfiler.requested(headers):
+      return handler(body, headers, path, query_args)
+
+    if AMQP_SERVER and ADMISSION:
+      profile_headers = {}
+      token = PROFILE_HEADERS.set(profile_headers)
+      try:
+        response, response_headers = handler(body, headers, path, query_args)
+      finally:
+        PROFILE_HEADERS.reset(token)
+    else:
+      (response, response_headers), profile_headers = PROFILER.profile(handler, body, headers, path, query_args)
+    response_headers = dict(response_headers) if response_headers else {}
+    response_headers.update(profile_headers)
+    return response, response_headers
+
+  return profiled_handler
+
+def profile_build(build:Callable[[Optional[int]], Any], profile_headers:Dict, goal_number:Optional[int]):
+  # run a build under the profiler, in the thread processing it (heavy lane worker or consumer)
+  # the profile headers are set before the build result is available
+  result, headers = PROFILER.profile(build, goal_number)
+  profile_headers.update(headers)
+  return result
+
+def count_goals(sequence_type:SequenceTypeRegister, goals_definition:Dict) -> Optional[int]:
+  # number of goals of a request, counted once for the admission control and the memory budget
+  # without admission control, the memory budget counts the goals if needed
+  if not ADMISSION:
+    return NOT_COUNTED
+  return SEQUENCE_UNIT.count_goals(sequence_type, goals_definition)
+
+def admit(goal_number:Optional[int]):
+  # context manager processing the request in the caller thread, in its admission lane
+  # raise a BusyException if the lane is full
+  if not ADMISSION:
+    return nullcontext()
+  return ADMISSION.lane(goal_number).admit()
+
+def busy(error:BusyException, headers:Dict):
+  # response to a request refused by the admission control
+  body, response_headers = encode_response(busy_response(error), headers)
+  response_headers = dict(response_headers) if response_headers else {}
+  response_headers['retry-after'] = str(error.retry_after)
+  return body, response_headers
+
+def start(build:Callable[[Optional[int]], Any], goal_number:Callable[[], Optional[int]]) -> Future:
+  # start the processing of a request in the admission lane of its number of goals
+  # the heavy requests are handed off to the heavy lane workers, the others are processed in the caller thread
+  if not ADMISSION:
+    return completed(build, NOT_COUNTED)
+
+  count = goal_number()
+  lane = ADMISSION.lane(count)
+  if lane is ADMISSION.heavy:
+    return lane.submit(build, count)
+
+  def admitted():
+    with lane.admit():
+      return build(count)
+  return completed(admitted)
+
+def process(build:Callable[[Optional[int]], Any],
+            goal_number:Callable[[], Optional[int]],
+            respond:Callable[[Any], Tuple],
+            headers:Dict,
+            key:str=None):
+  # process a request, the build get the number of goals counted for the admission
+  # the identical requests in flight (same key) share the processing of the first one:
+  # only the first one is counted and admitted, the others wait for its result without a lane slot
+  # on amqp the consumer does not wait for a request handed off to the heavy lane workers:
+  # the response is published by the worker and the consumer keeps receiving the light requests
+  profile_headers = PROFILE_HEADERS.get()
+  if profile_headers is not None:
+    build = partial(profile_build, build, profile_headers)
+
+  try:
+    if COALESCER and key:
+      future, _ = COALESCER.submit(key, partial(start, build, goal_number))
+    else:
+      future = start(build, goal_number)
+  except BusyException as error:
+    return busy(error, headers)
+
+  if AMQP_SERVER and not future.done():
+    future.add_done_callback(partial(publish_handed_off, respond, headers, profile_headers))
+    return None, headers
+
+  try:
+    return respond(future.result())
+  except BusyException as error:
+    return busy(error, headers)
+
+def publish_handed_off(respond:Callable[[Any], Tuple], headers:Dict, profile_headers:Optional[Dict], future:Future):
+  # publish the response of a request processed by the heavy lane workers, or shared with it
+  # with the profile headers of its build if it was profiled
+  try:
+    response = respond(future.result())
+  except BusyException as error:
+    response = busy(error, headers)
+  except BaseException as error:
+    LOGGER.error(f"heavy request failed : {error.describe()}")
+    response = encode_response({'error': error.describe()}, headers)
+  except Exception:
+    LOGGER.exception("heavy request failed")
+    return
+  body, response_headers = response
+  if profile_headers:
+    response_headers = {**(response_headers or {}), **profile_headers}
+  publish_and_report(body, response_headers)
+
+def run_build(sequence_type:SequenceTypeRegister,
+              goals_definition:Dict,
+              situation_definition:Dict,
+              robots_definition:List[Dict],
+              trace:SolverTrace=None,
+              goal_number:Optional[int]=NOT_COUNTED):
+  # build the sequences of a request, the goals counted for the admission are passed to the memory budget
+  if robots_definition:
+    # one sequence by robot
+    return SEQUENCE_UNIT.build_partitioned(sequence_type,
+                                           goals_definition,
+                                           robots_definition,
+                                           goal_number)
+  # build sequence
+  return SEQUENCE_UNIT.build(sequence_type,
+                             goals_definition,
+                             situation_definition,
+                             trace,
+                             goal_number)
+
 def build_sequence(body:Dict,
                    headers:Dict,
                    path:str,
                    query_args:Dict):
   
   global SEQUENCE_UNIT
+  REQUESTS.inc(handler='build')
 
   #get definitions from request body
-  situation_definition = build_situation_definition(body)
-  definition_type, goals_definition = build_goals_definition(body)
+  with STAGE_SECONDS.time(stage='request'):
+    situation_definition = build_situation_definition(body)
+    definition_type, goals_definition = build_goals_definition(body)
   
   # read target from url /sequence/$target
   target = re.search('\w+$', path).group()
@@ -71,50 +259,260 @@ def build_sequence(body:Dict,
   #define sequence_type
   sequence_type = f'{target}_{definition_type}'
 
-  # build sequence
-  json_sequence = SEQUENCE_UNIT.build(SequenceTypeRegister[sequence_type],
-                                      goals_definition,
-                                      situation_definition)
+  # if several robot situations in request
+  # build one sequence by robot
+  robots_definition = build_robots_situation_definition(body, situation_definition)
+
+  # explain mode, the solver trace is returned with the sequence
+  trace = SolverTrace() if body and body.get('explain') else None
+
+  # each caller get its own response, encoded with its headers (reply topic, correlation)
+  def respond(built):
+    if robots_definition:
+      body = {
+        "buildProcesses": [json_sequence for _, json_sequence in built],
+        "sequenceIds": [sequence_id for sequence_id, _ in built]
+      }
+      return encode_response(body, headers)
+
+    sequence_id, json_sequence = built
+    body = {
+      "buildProcess": json_sequence,
+      "sequenceId": sequence_id
+    }
+    if trace:
+      body['explain'] = trace.to_dict()
+
+    # return sequence under the format negotiated by the request headers
+    return encode_response(body, headers)
+
+  sequence_type = SequenceTypeRegister[sequence_type]
+
+  # the cached sequences are served without admission control, the goals are not counted
+  if not robots_definition and not trace:
+    cached = SEQUENCE_UNIT.cached(sequence_type, goals_definition, situation_definition)
+    if cached:
+      return respond(cached)
+
+  # the request is processed in the light or heavy lane according to its number of goals
+  build = partial(run_build,
+                  sequence_type,
+                  goals_definition,
+                  situation_definition,
+                  robots_definition,
+                  trace)
+
+  # the identical requests in flight share one building, the explained requests have their own trace
+  key = None if trace else request_key(sequence_type.name, goals_definition,
+                                       robots_definition or situation_definition)
+
+  return process(build, partial(count_goals, sequence_type, goals_definition), respond, headers, key)
+
+def stream_sequence(body:Dict,
+                    headers:Dict,
+                    path:str,
+                    query_args:Dict):
+
+  global SEQUENCE_UNIT
+  REQUESTS.inc(handler='stream')
+
+  #get definitions from request body
+  with STAGE_SECONDS.time(stage='request'):
+    situation_definition = build_situation_definition(body)
+    definition_type, goals_definition = build_goals_definition(body)
+
+  # read target from request body, the path is the stream topic
+  target = body.get('target', 'work') if body else 'work'
+  sequence_type = SequenceTypeRegister[f'{target}_{definition_type}']
+
+  def stream(goal_number:Optional[int]):
+    chunks = SEQUENCE_UNIT.build_stream(sequence_type,
+                                        goals_definition,
+                                        situation_definition,
+                                        STREAM_CHUNK_SIZE,
+                                        goal_number)
+
+    # publish each chunk as a numbered message as soon as it is solved
+    # the end of the stream is marked by a last message without actions, numbered after the chunks
+    index = 0
+    sequence_id = None
+    for sequence_id, json_sequence in chunks:
+      publish_chunk((sequence_id, json_sequence), index, False, headers)
+      index += 1
+
+    publish_chunk((sequence_id, []), index, True, headers)
+
+  # the chunks are published by the stream, no response
+  return process(stream, partial(count_goals, sequence_type, goals_definition), lambda _: (None, headers), headers)
+
+def publish_chunk(chunk:Tuple[str, List[Dict]], index:int, last:bool, headers:Dict):
+  sequence_id, json_sequence = chunk
+  chunk_headers = headers.copy()
+  chunk_headers['chunk_index'] = index
+  chunk_headers['last_chunk'] = last
+
   body = {
-    "buildProcess": json_sequence
+    "buildProcess": json_sequence,
+    "sequenceId": sequence_id,
+    "chunk": index,
+    "last": last
   }
+  with PUBLISH_LOCK:
+    AMQP_SERVER.publish(*encode_response(body, chunk_headers))
 
-  # return sequence under json form
-  return body, headers
+def http_stream_sequence(body:Dict,
+                         headers:Dict,
+                         path:str,
+                         query_args:Dict):
 
-def build_situation_definition(request_body:Dict):
+  global SEQUENCE_UNIT
+  REQUESTS.inc(handler='stream')
 
-  temp_situation = DEFAULT_SITUATION_DEFINITION.copy()
+  #get definitions from request body
+  with STAGE_SECONDS.time(stage='request'):
+    situation_definition = build_situation_definition(body)
+    definition_type, goals_definition = build_goals_definition(body)
+
+  # read target from url /sequence/$target/stream
+  target = re.search('(\w+)/stream$', path).group(1)
+  sequence_type = SequenceTypeRegister[f'{target}_{definition_type}']
+  goal_number = count_goals(sequence_type, goals_definition)
+
+  # the chunks are solved while the server sends them, in the server thread
+  # the request keeps its admission lane slot until the stream ends
+  admission = ExitStack()
+  try:
+    admission.enter_context(admit(goal_number))
+  except BusyException as error:
+    return busy(error, headers)
+
+  chunks = SEQUENCE_UNIT.build_stream(sequence_type,
+                                      goals_definition,
+                                      situation_definition,
+                                      STREAM_CHUNK_SIZE,
+                                      goal_number)
+
+  # one json document by line, sent as soon as the chunk is solved (chunked transfer)
+  def ndjson_chunks():
+    with admission:
+      for index, (sequence_id, json_sequence) in enumerate(chunks):
+        yield json.dumps({"buildProcess": json_sequence,
+                          "sequenceId": sequence_id,
+                          "chunk": index}) + '\n'
+
+  headers = {'content-type': 'application/x-ndjson'}
+  return ndjson_chunks(), headers
+
+def resume_sequence(body:Dict,
+                    headers:Dict,
+                    path:str,
+                    query_args:Dict):
+  
+  global SEQUENCE_UNIT
+  REQUESTS.inc(handler='resume')
+
+  # the actual situation replace the initial situation
+  with STAGE_SECONDS.time(stage='request'):
+    situation_definition = build_situation_definition(body, 'currentSituation')
+  index = body['index']
+  trace = SolverTrace() if body.get('explain') else None
+
+  def respond(resumed):
+    sequence_id, json_sequence = resumed
+    body = {
+      "buildProcess": json_sequence,
+      "sequenceId": sequence_id
+    }
+    if trace:
+      body['explain'] = trace.to_dict()
+
+    return encode_response(body, headers)
+
+  if body.get('sequenceId'):
+    # resume a sequence builded by the processor
+    goal_number = partial(SEQUENCE_UNIT.count_stored_goals, body['sequenceId'])
+    # the stored goals are not counted again
+    resume = lambda _: SEQUENCE_UNIT.resume(body['sequenceId'],
+                                            index,
+                                            situation_definition,
+                                            trace)
+  else:
+    # resume a sequence from its definition, the goals are got again
+    definition_type, goals_definition = build_goals_definition(body)
+    sequence_type = SequenceTypeRegister[f"{body['target']}_{definition_type}"]
+    goal_number = partial(count_goals, sequence_type, goals_definition)
+    resume = partial(SEQUENCE_UNIT.resume_sequence,
+                     sequence_type,
+                     goals_definition,
+                     body['sequence'],
+                     index,
+                     situation_definition,
+                     trace)
+
+  return process(resume, goal_number, respond, headers)
+
+def get_metrics(body:Dict,
+                headers:Dict,
+                path:str,
+                query_args:Dict):
+  # metrics of the process in the prometheus text format
+  return REGISTRY.render(), {'content-type': PROMETHEUS_CONTENT_TYPE}
+
+def publish_and_report(*args):
+  # publish the response then the metrics report if the interval is elapsed
+  # no response is published for a request handed off to the heavy lane or a stream published by chunks
+  # the consumer and the heavy lane workers share the amqp connection, the publications are serialized
+  global LAST_METRICS_REPORT
+
+  with PUBLISH_LOCK:
+    if args[0] is not None:
+      AMQP_SERVER.publish(*args)
+
+    now = time.time()
+    if METRICS_REPORT_INTERVAL and now - LAST_METRICS_REPORT >= METRICS_REPORT_INTERVAL:
+      LAST_METRICS_REPORT = now
+      AMQP_SERVER.publish({'metrics': REGISTRY.report(), 'timestamp': now},
+                          {'report_topic': METRICS_REPORT_TOPIC})
+
+def build_situation_definition(request_body:Dict, situation_key:str='initialSituation'):
 
   # if situation info in request
-  # read situation info from request and update standard
-  if request_body and request_body.get('initialSituation'):
+  # read situation info from request and overlay it on the default situation
+  # the overridden states are copied, the default situation is not modified
+  if request_body and request_body.get(situation_key):
 
-    request_situation = request_body.get('initialSituation')
+    request_situation = request_body.get(situation_key)
 
-    work_situation:Dict = request_body['initialSituation'].get('workSituation')
-    robot_situation:Dict = request_situation['initialSituation'].get('robotSituation')
+    work_situation:Dict = request_situation.get('workSituation')
+    robot_situation:Dict = request_situation.get('robotSituation')
 
-    if work_situation:
-      for state, value in work_situation.items():
-        temp_situation['work_situation'][state]['state']=value
-        temp_situation['work_situation'][state]['relation']='eq'
-    
-    if robot_situation:
-      for state, value in robot_situation.items():
-        temp_situation['robot_situation'][state]['state']=value
-        temp_situation['robot_situation'][state]['relation']='eq'
+    return DEFAULT_SITUATION.definition(work_situation, robot_situation)
 
-  return temp_situation
+  return DEFAULT_SITUATION.definition()
 
-def build_goals_definition(request_body:Dict) -> Tuple[str, Dict]:
+def build_robots_situation_definition(request_body:Dict, situation_definition:Dict) -> List[Dict]:
+
+  robots_situation = []
+
+  # if robot situations in request
+  # build one situation definition by robot
+  if request_body and request_body.get('initialSituation'):
 
-  temp_goals = DEFAULT_GOALS_DEFINITION.copy()
+    robot_situations:List[Dict] = request_body['initialSituation'].get('robotSituations', [])
 
+    for robot_situation in robot_situations:
+      # each robot get its own overlay of the situation definition
+      robots_situation.append(overlay_situation_definition(situation_definition, robot_situation=robot_situation))
+
+  return robots_situation
+
+def build_goals_definition(request_body:Dict) -> Tuple[str, Dict]:
+
+  # the default definition is copied, the request definition must not modify the defaults
   if request_body and request_body.get('goalsDefinition'):   
 
     definition_type = request_body['goalsDefinition']['definitionType']
-    temp_goals = DEFAULT_GOALS_DEFINITION[definition_type]
+    temp_goals = copy.deepcopy(DEFAULT_GOALS_DEFINITION[definition_type])
 
     definition:Dict = request_body['goalsDefinition'].get('definition')
     if definition:
@@ -124,8 +522,34 @@ def build_goals_definition(request_body:Dict) -> Tuple[str, Dict]:
     return definition_type, temp_goals
 
   else:
-    default_type = DEFAULT_GOALS_DEFINITION['defaultType']
-    return default_type, DEFAULT_GOALS_DEFINITION[default_type]
+    # default definition type, 'type' key of the mars configuration default goals
+    default_type = DEFAULT_GOALS_DEFINITION['type']
+    return default_type, copy.deepcopy(DEFAULT_GOALS_DEFINITION[default_type])
+
+def build_warmup_requests(warmup_config:Dict) -> List[Tuple[SequenceTypeRegister, Dict, Dict]]:
+  """function to build the requests of the warm up, as the request handlers build them:
+  the default goals and each single rail, with the default situation, for each target
+
+  Args:
+      warmup_config (Dict): warm up configuration
+
+  Returns:
+      List[Tuple[SequenceTypeRegister, Dict, Dict]]: sequence type, goals definition and situation definition of each request
+  """
+  bodies = [None]
+  if warmup_config.get('rails', True):
+    bodies.extend({'goalsDefinition': {'definitionType': DEFAULT_GOALS_DEFINITION['type'],
+                                       'definition': {'rails': [rail]}}}
+                  for rail in AIRCRAFT_RAIL_ORDER)
+
+  requests = []
+  for target in warmup_config.get('targets', ['work']):
+    for body in bodies:
+      definition_type, goals_definition = build_goals_definition(body)
+      requests.append((SequenceTypeRegister[f'{target}_{definition_type}'],
+                       goals_definition,
+                       build_situation_definition(body)))
+  return requests
 
 def get_http_para_from_config(http_config:Dict) -> Tuple[str, int]:
   try:
@@ -163,6 +587,62 @@ def build_amqp_server(amqp_config:Dict):
     error.add_in_stack(['INIT','SERVER'])
     raise error
 
+def build_data_unit_factory(database_config:Dict, db_auth:Tuple[str, str]) -> Callable[[], DataUnit]:
+  """function to get the function instantiating the DataUnit according the database type
+
+  Args:
+      database_config (Dict): database configuration
+      db_auth (Tuple[str, str]): database credentials
+
+  Raises:
+      DBDriverException: raise if the database type is unknown
+
+  Returns:
+      Callable[[], DataUnit]: function to instantiate the DataUnit
+  """
+  database_type = database_config['type']
+
+  if database_type == 'NEO4J':
+    return partial(Neo4jDataUnit,
+                   host_uri=database_config['uri'],
+                   auth=db_auth,
+                   record_directory=database_config.get('record'),
+                   profiling=database_config.get('profiling'))
+  elif database_type == 'REPLAY':
+    # queries recorded by a NEO4J database with a record directory
+    return partial(ReplayDataUnit,
+                   database_config['record'])
+  elif database_type == 'FILE':
+    # graph snapshot exported with the --export-graph option
+    return partial(FileDataUnit.from_file,
+                   database_config['path'])
+  else:
+    raise DBDriverException(['CONFIG', 'DATABASE'],
+                            DBExceptionType.UNKNOW_TYPE,
+                            f"database type {database_type} unknown, NEO4J, FILE or REPLAY expected")
+
+def export_graph(environment_config:Dict, db_auth:Tuple[str, str], path:str):
+  # export the graph from the neo4j database to a snapshot file
+  database_config = environment_config['database']
+  data_unit = Neo4jDataUnit(host_uri=database_config['uri'],
+                            auth=db_auth)
+  try:
+    LOGGER.info(f"export the graph to {path}")
+    data_unit.export(path)
+  finally:
+    data_unit.close()
+
+def ensure_indexes(environment_config:Dict, db_auth:Tuple[str, str]):
+  # create the indexes and constraints used by the queries in the neo4j database
+  database_config = environment_config['database']
+  data_unit = Neo4jDataUnit(host_uri=database_config['uri'],
+                            auth=db_auth)
+  try:
+    for statement in data_unit.ensure_indexes():
+      LOGGER.info(f"ensured : {statement}")
+  finally:
+    data_unit.close()
+
 def build_validator(schemas_dict:Dict)-> Validator:
   # instanciate validator to validate request 
   validator = Validator()
@@ -179,10 +659,10 @@ def main(activated_server:str,
          validation_schemas:str,
          db_auth:Tuple[str, str]):
 
-  global DATA_UNIT, SEQUENCE_UNIT, DEFAULT_SITUATION_DEFINITION, DEFAULT_GOALS_DEFINITION
+  global DATA_UNIT, SEQUENCE_UNIT, DEFAULT_SITUATION, DEFAULT_GOALS_DEFINITION
+  global AMQP_SERVER, STREAM_CHUNK_SIZE, METRICS_REPORT_INTERVAL, PROFILER, ADMISSION, COALESCER
 
   HTTP_SERVER:HttpServer = None
-  AMQP_SERVER:AMQPServer = None
 
   try:
         
@@ -191,19 +671,99 @@ def main(activated_server:str,
 
     # TODO implement json schema for all configuration files
     # get default situation and goals from mars configuration
-    DEFAULT_SITUATION_DEFINITION = environment_config['default_parameters']['situations']
+    DEFAULT_SITUATION = SituationTemplate(environment_config['default_parameters']['situations'])
     DEFAULT_GOALS_DEFINITION = environment_config['default_parameters']['goals']
 
     # get database configuration from mars configuration
     DATABASE_CONFIG = environment_config['database']
 
     # initialize the DataUnit in charge of the db communications 
-    DATA_UNIT = DataUnit(host_uri=DATABASE_CONFIG['uri'],
-                         auth=db_auth)
+    # the factory is used to instantiate a DataUnit in each solving worker process
+    data_unit_factory = build_data_unit_factory(DATABASE_CONFIG, db_auth)
+    DATA_UNIT = data_unit_factory()
+
+    # get processing configuration from mars configuration
+    PROCESSOR_CONFIG = environment_config.get('processor', {})
+    workers = PROCESSOR_CONFIG.get('workers', 0)
+    workers = os.cpu_count() if workers == 'auto' else workers
+    STREAM_CHUNK_SIZE = PROCESSOR_CONFIG.get('stream_chunk_size', STREAM_CHUNK_SIZE)
+    METRICS_REPORT_INTERVAL = PROCESSOR_CONFIG.get('metrics_report_interval', METRICS_REPORT_INTERVAL)
+
+    # on demand profiling of the requests, rate limited
+    PROFILING_CONFIG = PROCESSOR_CONFIG.get('profiling')
+    if PROFILING_CONFIG:
+      PROFILER = RequestProfiler(directory=PROFILING_CONFIG['directory'],
+                                 rate=PROFILING_CONFIG.get('rate', 6),
+                                 burst=PROFILING_CONFIG.get('burst', 1))
+
+    # the identical build requests in flight wait for the first one and share its sequence
+    if PROCESSOR_CONFIG.get('coalescing', False):
+      COALESCER = SingleFlight()
+
+    # admission control, the cheap requests keep a low latency while the heavy ones wait in their own queue
+    # a request over the queue capacity get a busy response with a retry delay
+    ADMISSION_CONFIG = PROCESSOR_CONFIG.get('admission')
+    if ADMISSION_CONFIG:
+      ADMISSION = AdmissionController(
+        light=AdmissionLane(LIGHT_LANE, **ADMISSION_CONFIG.get('light', {'workers': 4, 'queue_size': 16})),
+        heavy=AdmissionLane(HEAVY_LANE, **ADMISSION_CONFIG.get('heavy', {'workers': 1, 'queue_size': 2})),
+        heavy_goals=ADMISSION_CONFIG.get('heavy_goals', 500))
+
+    # memory budget of the work requests, estimated from a count query before getting the goals
+    # and memory accounting by stage, tracemalloc slows the processing so it is disabled by default
+    MEMORY_CONFIG = PROCESSOR_CONFIG.get('memory', {})
+    memory_budget = MemoryBudget(budget=MEMORY_CONFIG['budget'] * 2**20,
+                                 bytes_per_goal=MEMORY_CONFIG.get('bytes_per_goal', 8192),
+                                 policy=MEMORY_CONFIG.get('policy', 'reject')) \
+      if MEMORY_CONFIG.get('budget') else None
+    if MEMORY_CONFIG.get('accounting'):
+      tracemalloc.start(MEMORY_CONFIG.get('accounting_frames', 1))
+
+    # detection of the graph changes, polling the graph version
+    # required by the goals and sequences caches, served while the database is not reachable
+    GRAPH_WATCH_CONFIG = PROCESSOR_CONFIG.get('graph_watch')
+    graph_watcher = None
+    if GRAPH_WATCH_CONFIG:
+      graph_watcher = GraphVersionWatcher(DATA_UNIT.graph_version,
+                                          GRAPH_WATCH_CONFIG.get('interval', 10))
+      # the dataunit is updated before the caches are refreshed
+      graph_watcher.add_listener(lambda old_version, version: DATA_UNIT.refresh())
+
+    # persistent tier of the caches, shared by the processes of the node and kept between the restarts
+    DISK_CACHE_CONFIG = PROCESSOR_CONFIG.get('disk_cache')
+    disk_cache = DiskCache(DISK_CACHE_CONFIG['path'], DISK_CACHE_CONFIG.get('max_entries', 256)) \
+      if DISK_CACHE_CONFIG and graph_watcher else None
 
     # initialize the SEQUENCE_UNIT in charge of the processing
     # DATA_UNIT in parameter for db communication
-    SEQUENCE_UNIT = SequenceUnit(data_unit=DATA_UNIT)
+    SEQUENCE_UNIT = SequenceUnit(data_unit=DATA_UNIT,
+                                 data_unit_factory=data_unit_factory,
+                                 workers=workers,
+                                 parallel_min_goals=PROCESSOR_CONFIG.get('parallel_min_goals', 0),
+                                 store_size=PROCESSOR_CONFIG.get('store_size', 100),
+                                 transitions_cache_size=PROCESSOR_CONFIG.get('transitions_cache_size', 1024),
+                                 memory_budget=memory_budget,
+                                 memory_accounting=MEMORY_CONFIG.get('accounting', False),
+                                 graph_watcher=graph_watcher,
+                                 area_cache_size=PROCESSOR_CONFIG.get('area_cache_size', 64),
+                                 sequence_cache_size=PROCESSOR_CONFIG.get('sequence_cache_size', 16),
+                                 area_cell_cache_size=PROCESSOR_CONFIG.get('area_cell_cache_size', 32),
+                                 action_cache_size=PROCESSOR_CONFIG.get('action_cache_size', 50000),
+                                 situation_template=DEFAULT_SITUATION,
+                                 disk_cache=disk_cache)
+
+    # warm up of the common requests in background, to fill the sequences cache
+    WARMUP_CONFIG = PROCESSOR_CONFIG.get('warmup')
+    if WARMUP_CONFIG and not SEQUENCE_UNIT.caching:
+      LOGGER.warning("warm up configured without graph_watch, no sequences cache to fill, warm up disabled")
+    elif WARMUP_CONFIG:
+      warmup = WarmUp(SEQUENCE_UNIT, build_warmup_requests(WARMUP_CONFIG))
+      if WARMUP_CONFIG.get('on_graph_change', True):
+        graph_watcher.add_listener(warmup.start)
+      warmup.start()
+
+    if graph_watcher:
+      graph_watcher.start()
 
     http_config = server_config.get('http')
     amqp_config = server_config.get('amqp')
@@ -218,11 +778,22 @@ def main(activated_server:str,
 
       # prepare a consumer pipeline
       # no topic parameter for publish => report_topic contained in the message header
-      req_pipeline = CPipeline([CFunction(build_sequence),
-                                CFunction(AMQP_SERVER.publish)])
+      req_pipeline = CPipeline([CFunction(profiled(build_sequence)),
+                                CFunction(publish_and_report)])
       
       AMQP_SERVER.add_consumer('request.build_processor', req_pipeline)
 
+      resume_pipeline = CPipeline([CFunction(profiled(resume_sequence)),
+                                   CFunction(publish_and_report)])
+
+      AMQP_SERVER.add_consumer('request.build_processor.resume', resume_pipeline)
+
+      # the stream publish itself the numbered chunks, only a busy response is published by the pipeline
+      stream_pipeline = CPipeline([CFunction(stream_sequence),
+                                   CFunction(publish_and_report)])
+
+      AMQP_SERVER.add_consumer('request.build_processor.stream', stream_pipeline)
+
     # TODO implement multithreading if two activated server
     # if http server activate in configuration
     elif activated_server == 'http' and http_config :
@@ -234,15 +805,28 @@ def main(activated_server:str,
       LOGGER.info("configure http server")
       HTTP_SERVER.add_endpoint('/sequence/approach',
                       'approach',
-                      EFunction(build_sequence),
+                      EFunction(profiled(build_sequence)),
                       methods=['GET'])
       HTTP_SERVER.add_endpoint('/sequence/station',
                       'station',
-                      EFunction(build_sequence),
+                      EFunction(profiled(build_sequence)),
                       methods=['GET'])
       HTTP_SERVER.add_endpoint('/sequence/work',
                       'work',
-                      EFunction(build_sequence),
+                      EFunction(profiled(build_sequence)),
+                      methods=['GET'])
+      for target in ('approach', 'station', 'work'):
+        HTTP_SERVER.add_endpoint(f'/sequence/{target}/stream',
+                        f'{target}_stream',
+                        EFunction(http_stream_sequence),
+                        methods=['GET'])
+      HTTP_SERVER.add_endpoint('/sequence/resume',
+                      'resume',
+                      EFunction(profiled(resume_sequence)),
+                      methods=['GET'])
+      HTTP_SERVER.add_endpoint('/metrics',
+                      'metrics',
+                      EFunction(get_metrics),
                       methods=['GET'])
 
     # if no server activated, raise an error
@@ -301,6 +885,14 @@ if __name__ == '__main__':
                         action=ConfigLoader,
                         help='path of the directory contains schemas for requests validations')
 
+    parser.add_argument('--export-graph',
+                        type=str,
+                        help='export the graph from the neo4j database to a snapshot file (.bin for a binary snapshot) and exit')
+
+    parser.add_argument('--ensure-indexes',
+                        action='store_true',
+                        help='create the indexes and constraints used by the queries in the neo4j database and exit')
+
     args = parser.parse_args()
     args.validation_schemas = get_validation_schemas(__VALIDATION_SCHEMA_DIR)\
                               if not args.validation_schemas else args.validation_schemas
@@ -313,7 +905,9 @@ if __name__ == '__main__':
     DB_PASSWD = os.getenv('DB_PASSWORD')
 
     # check if db credentials are in defined (passed in env var)
-    assert DB_USER and DB_PASSWD, "missing database authentification parameters DB_USERNAME and/or DB_PASSWORD"
+    # not required for a graph snapshot file
+    if args.export_graph or args.ensure_indexes or args.environment_config['database'].get('type') == 'NEO4J':
+      assert DB_USER and DB_PASSWD, "missing database authentification parameters DB_USERNAME and/or DB_PASSWORD"
     
     if args.verbose:
       logging.basicConfig(level=logging.DEBUG, format=LOG_FORMAT)
@@ -323,12 +917,17 @@ if __name__ == '__main__':
     logging.getLogger("pika").setLevel(logging.WARNING)
     logging.getLogger("neo4j").setLevel(logging.WARNING)
 
-    LOGGER.info("run build_processor service")
-    main(activated_server=args.server,
-         server_config=args.server_config,
-         environment_config=args.environment_config,
-         validation_schemas=args.validation_schemas,
-         db_auth=(DB_USER, DB_PASSWD))
+    if args.export_graph:
+      export_graph(args.environment_config, (DB_USER, DB_PASSWD), args.export_graph)
+    elif args.ensure_indexes:
+      ensure_indexes(args.environment_config, (DB_USER, DB_PASSWD))
+    else:
+      LOGGER.info("run build_processor service")
+      main(activated_server=args.server,
+           server_config=args.server_config,
+           environment_config=args.environment_config,
+           validation_schemas=args.validation_schemas,
+           db_auth=(DB_USER, DB_PASSWD))
   
   except BaseException as error:
     LOGGER.fatal(error.describe())
@@ -338,6 +937,8 @@ if __name__ == '__main__':
   except KeyboardInterrupt as error:
     LOGGER.info("manual interruption")
   finally:
+    if SEQUENCE_UNIT:
+      SEQUENCE_UNIT.close()
     if DATA_UNIT:
       DATA_UNIT.close()
     sys.exit(1)
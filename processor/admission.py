@@ -0,0 +1,153 @@
+import logging
+import math
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Optional
+from .exceptions import BusyException
+from .metrics import ADMISSIONS, ADMISSION_WAIT_SECONDS
+
+LIGHT_LANE = 'light'
+HEAVY_LANE = 'heavy'
+
+
+class AdmissionLane:
+  """bounded lane of requests: a number of requests processed at once and a bounded queue
+  the requests are processed in the caller thread (admit) or handed off to the lane workers (submit),
+  a request over the capacity is refused
+  """
+  def __init__(self, name:str, workers:int, queue_size:int, timeout:float=None):
+    """
+    Args:
+        name (str): lane name
+        workers (int): number of requests processed at once
+        queue_size (int): number of requests waiting for a worker
+        timeout (float, optional): maximal waiting time in seconds. Defaults to None, no limit.
+    """
+    self.name = name
+    self._workers = workers
+    self._capacity = workers + queue_size
+    self._timeout = timeout
+    self._slots = threading.Semaphore(workers)
+    # workers of the handed off requests, the threads are started on first use
+    self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'{name}-lane')
+    self._lock = threading.Lock()
+    # requests processed or waiting
+    self._pending = 0
+    # mean processing duration (exponential moving average) to estimate the retry delay
+    self._duration = None
+
+  @property
+  def pending(self) -> int:
+    return self._pending
+
+  def retry_after(self) -> int:
+    """function to estimate the delay in seconds before a worker is free
+    """
+    duration = self._duration if self._duration is not None else 1
+    return max(1, math.ceil(duration * (self._pending - self._workers + 1) / self._workers))
+
+  def __reserve(self):
+    # count the request in the lane, refused if the lane is full
+    with self._lock:
+      if self._pending >= self._capacity:
+        ADMISSIONS.inc(lane=self.name, result='refused')
+        raise BusyException(['PROCESS', 'ADMISSION'],
+                            f"{self.name} requests queue full, {self._pending} requests pending",
+                            self.retry_after())
+      self._pending += 1
+
+  @contextmanager
+  def __processing(self, tb:float):
+    # wait for a free slot, the waiting time since the request was admitted is limited by the timeout
+    timeout = None if self._timeout is None else self._timeout - (time.perf_counter() - tb)
+    if (timeout is not None and timeout <= 0) or not self._slots.acquire(timeout=timeout):
+      with self._lock:
+        self._pending -= 1
+      ADMISSIONS.inc(lane=self.name, result='timeout')
+      raise BusyException(['PROCESS', 'ADMISSION'],
+                          f"{self.name} request not processed after {self._timeout} seconds in queue",
+                          self.retry_after())
+
+    tstart = time.perf_counter()
+    ADMISSION_WAIT_SECONDS.observe(tstart - tb, lane=self.name)
+    ADMISSIONS.inc(lane=self.name, result='admitted')
+    try:
+      yield
+    finally:
+      duration = time.perf_counter() - tstart
+      with self._lock:
+        self._pending -= 1
+        self._duration = duration if self._duration is None else 0.8*self._duration + 0.2*duration
+      self._slots.release()
+
+  @contextmanager
+  def admit(self):
+    """context manager processing a request in the lane, in the caller thread
+
+    Raises:
+        BusyException: raise if the lane is full or the request waited too long
+    """
+    self.__reserve()
+    with self.__processing(time.perf_counter()):
+      yield
+
+  def submit(self, function:Callable, *args) -> Future:
+    """function to hand off a request to the lane workers, the caller thread does not wait for it
+
+    Args:
+        function (Callable): function processing the request
+        args: function arguments
+
+    Raises:
+        BusyException: raise if the lane is full, a request waiting too long fails with a BusyException
+
+    Returns:
+        Future: result of the function
+    """
+    self.__reserve()
+    return self._executor.submit(self.__run, time.perf_counter(), function, *args)
+
+  def __run(self, tb:float, function:Callable, *args) -> Any:
+    with self.__processing(tb):
+      return function(*args)
+
+
+class AdmissionController:
+  """route the requests to a light or a heavy lane according to their estimated cost
+  the cost is the number of goals of the request, unknown for the approach and station requests
+  which are always light
+  """
+  def __init__(self, light:AdmissionLane, heavy:AdmissionLane, heavy_goals:int):
+    """
+    Args:
+        light (AdmissionLane): lane of the cheap requests
+        heavy (AdmissionLane): lane of the heavy requests
+        heavy_goals (int): minimal number of goals of a heavy request
+    """
+    self.light = light
+    self.heavy = heavy
+    self._heavy_goals = heavy_goals
+    self._logger = logging.getLogger('sequencer.admission')
+
+  def lane(self, goal_number:Optional[int]) -> AdmissionLane:
+    """function to get the lane of a request
+
+    Args:
+        goal_number (Optional[int]): estimated number of goals, None if not estimated
+
+    Returns:
+        AdmissionLane: lane processing the request
+    """
+    lane = self.heavy if goal_number is not None and goal_number >= self._heavy_goals else self.light
+    self._logger.debug("request of %s goals routed to the %s lane", goal_number, lane.name)
+    return lane
+
+
+def busy_response(error:BusyException) -> dict:
+  """function to build the body of the response to a refused request
+  """
+  return {'busy': True,
+          'retryAfter': error.retry_after,
+          'error': error.describe()}
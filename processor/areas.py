@@ -0,0 +1,109 @@
+import logging
+from typing import Callable, Dict, List, Optional
+from .cache import LRUCache
+from .db.exceptions import DBDriverException
+from .db.snapshot import in_area
+from .metrics import CACHE_REQUESTS
+
+RAILS_KEY = 'rails'
+
+
+def record_area_uids(record:Dict) -> set:
+  """function to get the uids of the areas of a goals query record
+  """
+  return set(area['uid'] for area in record['position']['areas'])
+
+
+class AreaCellCache:
+  """goals queries results cached by cell (query type and rail)
+  a request on a list of rails is composed from the cached cells, the missing cells are fetched in a single query
+  the other area filters (rail area, sides) are applied in memory on the cells records
+  the cells are tagged with the graph version, a cell of a previous version is fetched again,
+  or served if the database is not reachable
+  """
+  def __init__(self, maxsize:int, version:Callable[[], Optional[str]]):
+    """
+    Args:
+        maxsize (int): maximal number of cells
+        version (Callable[[], Optional[str]]): function to get the actual graph version
+    """
+    self._cells = LRUCache(maxsize)
+    self._version = version
+    self._logger = logging.getLogger('sequencer.cache')
+
+  @staticmethod
+  def decomposable(area_definition:Dict) -> bool:
+    """function to check if a request is composed of rail cells, the requests on all the rails are not
+    """
+    return type(area_definition.get(RAILS_KEY)) == list
+
+  def get(self, query_type:str, area_definition:Dict, query:Callable[[Dict], List[Dict]]) -> List[Dict]:
+    """function to get the records of a request on a list of rails
+
+    Args:
+        query_type (str): goals query type (work, station, approach)
+        area_definition (Dict): dict defining the targeted area, with a list of rails
+        query (Callable[[Dict], List[Dict]]): function running the goals query of an area definition
+
+    Returns:
+        List[Dict]: records verifying the area definition
+    """
+    rails = area_definition[RAILS_KEY]
+    version = self._version()
+
+    cells:Dict[str, List[Dict]] = {}
+    stale:Dict[str, List[Dict]] = {}
+    for rail in rails:
+      entry = self._cells.get((query_type, rail))
+      if entry and entry[0] == version:
+        CACHE_REQUESTS.inc(cache='area_cells', result='hit')
+        cells[rail] = entry[1]
+      else:
+        CACHE_REQUESTS.inc(cache='area_cells', result='miss')
+        if entry:
+          stale[rail] = entry[1]
+
+    missing = [rail for rail in rails if not rail in cells]
+    if missing:
+      cells.update(self.__fetch(query_type, missing, stale, version, query))
+
+    # compose the cells, the records on several rails are kept once
+    filters = {key: value for key, value in area_definition.items() if key != RAILS_KEY}
+    records = []
+    uids = set()
+    for rail in rails:
+      for record in cells[rail]:
+        uid = record['definition']['uid']
+        if not uid in uids and in_area(record['position']['areas'], filters):
+          uids.add(uid)
+          records.append(record)
+    return records
+
+  def __fetch(self,
+        query_type:str,
+        rails:List[str],
+        stale:Dict[str, List[Dict]],
+        version:Optional[str],
+        query:Callable[[Dict], List[Dict]]) -> Dict[str, List[Dict]]:
+    # fetch the missing cells in a single query, all the records of the rails
+    try:
+      records = query({RAILS_KEY: rails})
+    except DBDriverException:
+      if len(stale) < len(rails):
+        raise
+      self._logger.warning("database not reachable, stale %s cells served for the rails %s", query_type, rails)
+      return stale
+
+    cells = {rail: [] for rail in rails}
+    for record in records:
+      area_uids = record_area_uids(record)
+      for rail in rails:
+        if rail in area_uids:
+          cells[rail].append(record)
+
+    for rail, cell in cells.items():
+      self._cells.put((query_type, rail), (version, cell))
+    return cells
+
+  def clear(self):
+    self._cells.clear()
@@ -0,0 +1,219 @@
+import logging
+from collections import OrderedDict
+from concurrent.futures import Executor
+from threading import Lock
+from typing import Any, Callable, Dict, Hashable, List, Optional
+from .metrics import CACHE_REQUESTS
+from .model.marsnode import Action
+
+
+class LRUCache:
+  """bounded cache, the least recently used element is removed when the cache is full
+  the cache can be shared between threads
+  """
+  def __init__(self, maxsize:int=128):
+    """init function
+
+    Args:
+        maxsize (int, optional): maximal number of elements. Defaults to 128.
+    """
+    self._maxsize = maxsize
+    self._elements:OrderedDict = OrderedDict()
+    self._lock = Lock()
+
+  def get(self, key:Hashable, default:Any=None) -> Any:
+    """function to get an element of the cache
+
+    Args:
+        key (Hashable): element key
+        default (Any, optional): value returned if the key is not in the cache. Defaults to None.
+
+    Returns:
+        Any: the element or the default value
+    """
+    with self._lock:
+      if key in self._elements:
+        self._elements.move_to_end(key)
+        return self._elements[key]
+      return default
+
+  def put(self, key:Hashable, value:Any):
+    """function to add or update an element in the cache
+
+    Args:
+        key (Hashable): element key
+        value (Any): element value
+    """
+    with self._lock:
+      self._elements[key] = value
+      self._elements.move_to_end(key)
+      if len(self._elements) > self._maxsize:
+        self._elements.popitem(last=False)
+
+  def clear(self):
+    with self._lock:
+      self._elements.clear()
+
+  def __contains__(self, key:Hashable) -> bool:
+    with self._lock:
+      return key in self._elements
+
+  def __len__(self) -> int:
+    return len(self._elements)
+
+
+class VersionedCache:
+  """cache of values computed from the graph, each value is tagged with the graph version
+  a value of a previous graph version is served while it is refreshed in background (stale while revalidate),
+  so the callers get the last good value while the refresh runs or if the database is not reachable
+  """
+  def __init__(self, name:str, maxsize:int, version:Callable[[], Optional[str]], refresher:Executor,
+               persistent:'DiskCache'=None):
+    """init function
+
+    Args:
+        name (str): cache name, for the metrics and the persistent cache namespace
+        maxsize (int): maximal number of values
+        version (Callable[[], Optional[str]]): function to get the actual graph version, None if unknown
+        refresher (Executor): executor refreshing the stale values
+        persistent (DiskCache, optional): persistent cache tier shared by the processes, the keys must be str.
+        Defaults to None.
+    """
+    self._name = name
+    self._persistent = persistent
+    self._entries = LRUCache(maxsize)
+    self._version = version
+    self._refresher = refresher
+    # keys refreshed in background
+    self._refreshing = set()
+    self._lock = Lock()
+    self._logger = logging.getLogger('sequencer.cache')
+
+  def get(self, key:Hashable, loader:Callable[[], Any], refresher:Callable[[], Any]=None, stale:bool=True) -> Any:
+    """function to get a value, loaded if not in the cache
+
+    Args:
+        key (Hashable): value key
+        loader (Callable[[], Any]): function to compute the value
+        refresher (Callable[[], Any], optional): function to compute the value in the background refresh.
+        Defaults to None, the loader.
+        stale (bool, optional): serve a stale value, else the value is computed again. Defaults to True.
+
+    Returns:
+        Any: the value, stale if the graph changed since it was computed
+    """
+    value = self.lookup(key, refresher if refresher else loader, stale)
+    if value is not None:
+      return value
+
+    CACHE_REQUESTS.inc(cache=self._name, result='miss')
+    # tagged with the version before the computation, a change during the computation makes it stale
+    version = self._version()
+    value = loader()
+    self.__put(key, version, value)
+    return value
+
+  def lookup(self, key:Hashable, refresher:Callable[[], Any]=None, stale:bool=True) -> Any:
+    """function to get a value only if it is in the cache, the value is not computed
+
+    Args:
+        key (Hashable): value key
+        refresher (Callable[[], Any], optional): function to compute the value in the background refresh.
+        Defaults to None, the stale values are not served.
+        stale (bool, optional): serve a stale value. Defaults to True.
+
+    Returns:
+        Any: the value, stale if the graph changed since it was computed, None if not in the cache
+    """
+    version = self._version()
+    entry = self._entries.get(key)
+
+    if entry is not None and entry[0] == version:
+      CACHE_REQUESTS.inc(cache=self._name, result='hit')
+      return entry[1]
+
+    # value computed by an other process or before a restart
+    if self._persistent:
+      value = self._persistent.get(self._name, key, version)
+      if value is not None:
+        CACHE_REQUESTS.inc(cache=self._name, result='disk_hit')
+        self._entries.put(key, (version, value))
+        return value
+
+    if entry is not None and stale and refresher:
+      CACHE_REQUESTS.inc(cache=self._name, result='stale')
+      self.__refresh(key, refresher, version)
+      return entry[1]
+    return None
+
+  def __put(self, key:Hashable, version:Optional[str], value:Any):
+    self._entries.put(key, (version, value))
+    if self._persistent:
+      self._persistent.put(self._name, key, version, value)
+
+  def __refresh(self, key:Hashable, loader:Callable[[], Any], version:Optional[str]):
+    # refresh a stale value in background, once by key
+    with self._lock:
+      if key in self._refreshing:
+        return
+      self._refreshing.add(key)
+
+    def refresh():
+      try:
+        self.__put(key, version, loader())
+      except Exception as error:
+        # database not reachable or error, the stale value is kept
+        self._logger.warning("refresh of a %s cache value failed, stale value kept: %s", self._name, error)
+      finally:
+        with self._lock:
+          self._refreshing.discard(key)
+
+    self._refresher.submit(refresh)
+
+  def clear(self):
+    self._entries.clear()
+
+  def __len__(self) -> int:
+    return len(self._entries)
+
+
+class ActionCache:
+  """parsed actions by record kind, action uid and graph version, shared by the requests
+  the actions are not modified once parsed, so the same object is used by the concurrent sequences
+  the kind separates the records of the different queries, which don't have the same metadata (position)
+  """
+  def __init__(self, maxsize:int, version:Callable[[], Optional[str]]):
+    """init function
+
+    Args:
+        maxsize (int): maximal number of actions
+        version (Callable[[], Optional[str]]): function to get the actual graph version
+    """
+    self._actions = LRUCache(maxsize)
+    self._version = version
+
+  def parse(self, kind:str, records:List[Dict]) -> List[Action]:
+    """function to get the parsed actions of records, the actions not in the cache are parsed
+
+    Args:
+        kind (str): kind of records (query type)
+        records (List[Dict]): action records
+
+    Returns:
+        List[Action]: parsed actions, in the records order
+    """
+    version = self._version()
+    actions = []
+    misses = 0
+    for record in records:
+      key = (kind, record['definition']['uid'], version)
+      action = self._actions.get(key)
+      if action is None:
+        misses += 1
+        action = Action.from_dict(record)
+        self._actions.put(key, action)
+      actions.append(action)
+
+    CACHE_REQUESTS.inc(len(records) - misses, cache='actions', result='hit')
+    CACHE_REQUESTS.inc(misses, cache='actions', result='miss')
+    return actions
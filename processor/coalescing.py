@@ -0,0 +1,85 @@
+import json
+import threading
+from concurrent.futures import Future
+from functools import partial
+from typing import Any, Callable, Dict, Tuple
+from .metrics import COALESCED_REQUESTS
+
+
+def request_key(*parts) -> str:
+  """function to get the canonical key of a request, independent of the keys order
+  """
+  return json.dumps(parts, sort_keys=True, separators=(',', ':'), default=str)
+
+
+def completed(function:Callable, *args) -> Future:
+  """function to run a function in the caller thread and get its result (or its exception) as a done future
+  """
+  future = Future()
+  try:
+    future.set_result(function(*args))
+  except Exception as error:
+    future.set_exception(error)
+  return future
+
+
+class SingleFlight:
+  """coalescing of the identical concurrent calls
+  the first call of a key starts the computation, the calls with the same key arriving while it runs
+  get the future of its result (or of its exception), they don't start an other computation
+  the result is not kept once the computation ended
+  """
+  def __init__(self):
+    self._futures:Dict[str, Future] = {}
+    self._lock = threading.Lock()
+
+  def submit(self, key:str, start:Callable[[], Future]) -> Tuple[Future, bool]:
+    """function to start a computation once for all the concurrent calls with the same key, without waiting for it
+
+    Args:
+        key (str): canonical key of the call
+        start (Callable[[], Future]): function starting the computation, in the caller thread or in background
+
+    Returns:
+        Tuple[Future, bool]: the future of the result and true if the result is shared with an other call
+    """
+    with self._lock:
+      future = self._futures.get(key)
+      if future is not None:
+        COALESCED_REQUESTS.inc(result='shared')
+        return future, True
+      future = Future()
+      self._futures[key] = future
+
+    COALESCED_REQUESTS.inc(result='computed')
+    try:
+      started = start()
+    except Exception as error:
+      started = Future()
+      started.set_exception(error)
+    started.add_done_callback(partial(self.__done, key, future))
+    return future, False
+
+  def do(self, key:str, function:Callable, *args) -> Tuple[Any, bool]:
+    """function to run a function once for all the concurrent calls with the same key
+
+    Args:
+        key (str): canonical key of the call
+        function (Callable): function to run, in the caller thread of the first call
+        args: function arguments
+
+    Returns:
+        Tuple[Any, bool]: the function result and true if the result is shared with an other call
+    """
+    future, shared = self.submit(key, partial(completed, function, *args))
+    return future.result(), shared
+
+  def __done(self, key:str, future:Future, started:Future):
+    # the computation ended, the next calls start a new one
+    with self._lock:
+      del self._futures[key]
+    error = started.exception()
+    if error is not None:
+      future.set_exception(error)
+    else:
+      future.set_result(started.result())
@@ -1,32 +1,52 @@
 
+from abc import ABC, abstractmethod
 from enum import Enum
 import logging
 from processor.model.marsnode import Action
 from .db.drivers import Neo4jDriver
+from .db.replay import RecordingDriver, ReplayDriver
+from .db.snapshot import GraphSnapshot, export_snapshot, APPROACH_ACTION_TYPE, STATION_ACTION_TYPE
+from .db.binary import BinarySnapshot, write_binary_snapshot, BINARY_EXTENSION
 from .db.queries import register as qreg
 from .model.scoring import sort_by_position
 from .model.situation import Situation
 from .exceptions import ProcessException, ProcessExceptionType
-from typing import List, Dict, Deque, Union
-from .model.situation import StateObject, Situation
+from typing import Callable, Iterator, List, Dict, Deque, Optional, Set, Tuple, Union
+from .model.situation import StateObject, Situation, SituationTemplate
 from collections import deque
 from .model.marsnode import Action
 from .model.optimization import begin_with_probing
+from .model.partition import partition_by_rail, split_by_rail
+from .cache import ActionCache, LRUCache, VersionedCache
+from .areas import AreaCellCache
+from .persistence import DiskCache
+from .coalescing import request_key
+from .versioning import GraphVersionWatcher
+from .db.exceptions import DBDriverException
+from functools import partial
+from .trace import SolverTrace, CACHE_SOURCE, DB_SOURCE
+from .memory import MemoryAccounting, MemoryBudget, account
+from .metrics import STAGE_SECONDS, DB_QUERY_SECONDS, DB_LOOKUPS, CACHE_REQUESTS, SOLVER_ITERATIONS, SOLVER_EXPANSIONS
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+import os
+import threading
 import time
+import uuid
+
+# number of goals of a request not counted by the caller, counted if required by the memory budget
+NOT_COUNTED = -1
 
 class SequenceTypeRegister(Enum):
   work_area = 'get_work_by_area'
   station_area = 'get_station_by_area'
   approach_area = 'get_approach_by_area'
 
-class DataUnit():
+class DataUnit(ABC):
   """
-    object to data from neo4j database
+    interface of the objects getting data for the processing
     it contains function to application specific needs
   """
-  def __init__(self, host_uri:str, auth:tuple):
-    self._driver = Neo4jDriver(host_uri, auth[0], auth[1])
-  
+  @abstractmethod
   def get_work_by_area(self, area_definition:Dict) -> List[Dict]:
     """fonction to get the work actions according to the area definition 
 
@@ -36,11 +56,10 @@ class DataUnit():
     Returns:
         List: list of dict defining the work actions
     """
-    query = qreg.build_work_by_area(area_definition)
-    records = self._driver.run(query)
-    return records
+    raise NotImplementedError()
   
-  def get_station_by_area(self, area_definition:Dict):
+  @abstractmethod
+  def get_station_by_area(self, area_definition:Dict) -> List[Dict]:
     """fonction to get the move station actions according to the area definition 
 
     Args:
@@ -49,11 +68,10 @@ class DataUnit():
     Returns:
         List: list of dict defining the move station actions
     """
-    query = qreg.build_station_by_area(area_definition)
-    records = self._driver.run(query)
-    return records
+    raise NotImplementedError()
   
-  def get_approach_by_area(self, area_definition:Dict):
+  @abstractmethod
+  def get_approach_by_area(self, area_definition:Dict) -> List[Dict]:
     """fonction to get the approach actions according to the area definition 
 
     Args:
@@ -62,11 +80,10 @@ class DataUnit():
     Returns:
         List: list of dict defining the approach actions
     """
-    query = qreg.build_approach_by_area(area_definition)
-    records = self._driver.run(query)
-    return records
+    raise NotImplementedError()
   
-  def get_action_by_state(self, state_definition:Dict):
+  @abstractmethod
+  def get_action_by_state(self, state_definition:Dict) -> List[Dict]:
     """fonction to get the actions to move from a state (precondition) to an other (result)
       the precondition and the result are define in the state definition   
 
@@ -76,84 +93,1014 @@ class DataUnit():
     Returns:
         List: list of dict defining the action
     """
-    query = qreg.build_action_by_state(state_definition)
-    records = self._driver.run(query)
+    raise NotImplementedError()
+
+  @abstractmethod
+  def count_work_by_area(self, area_definition:Dict) -> int:
+    """fonction to count the work actions according to the area definition
+      cheap query run before get_work_by_area to estimate the request size
+
+    Args:
+        area_definition (Dict): dict defining the targeted area
+
+    Returns:
+        int: number of work actions
+    """
+    raise NotImplementedError()
+
+  def graph_version(self) -> Optional[str]:
+    """fonction to get the version of the graph, changed when the graph is modified
+      used to detect the graph changes and invalidate the caches
+
+    Returns:
+        Optional[str]: graph version, None if the graph never change
+    """
+    return None
+
+  def refresh(self):
+    """fonction to update the dataunit after a graph change
+    """
+    pass
+
+  def close(self):
+    """close the dataunit object
+    """
+    pass
+
+
+class Neo4jDataUnit(DataUnit):
+  """
+    object to get data from neo4j database
+    if a record directory is defined, the queries results are recorded to be replayed with a ReplayDataUnit
+  """
+  def __init__(self, host_uri:str=None, auth:tuple=None, record_directory:str=None, profiling:Dict=None,
+               driver:Union[Neo4jDriver, ReplayDriver]=None):
+    """
+    Args:
+        host_uri (str, optional): neo4j database uri. Defaults to None.
+        auth (tuple, optional): database credentials. Defaults to None.
+        record_directory (str, optional): directory to record the queries results. Defaults to None.
+        profiling (Dict, optional): queries profiling configuration. Defaults to None.
+        driver (Union[Neo4jDriver, ReplayDriver], optional): driver running the queries,
+          instead of a driver connected to host_uri. Defaults to None.
+    """
+    self._neo4j = driver if driver else Neo4jDriver(host_uri, auth[0], auth[1], profiling)
+    self._driver = self._neo4j
+    if record_directory:
+      self._driver = RecordingDriver(self._neo4j, record_directory)
+    self._logger = logging.getLogger('sequencer.graph_version')
+    self._marker_missing = False
+  
+  def get_work_by_area(self, area_definition:Dict) -> List[Dict]:
+    with STAGE_SECONDS.time(stage='query_build'):
+      query, parameters = qreg.build_work_by_area(area_definition)
+    records = self._driver.run(query, 'work', **parameters)
+    return records
+  
+  def get_station_by_area(self, area_definition:Dict) -> List[Dict]:
+    with STAGE_SECONDS.time(stage='query_build'):
+      query, parameters = qreg.build_station_by_area(area_definition)
+    records = self._driver.run(query, 'station', **parameters)
     return records
+  
+  def get_approach_by_area(self, area_definition:Dict) -> List[Dict]:
+    with STAGE_SECONDS.time(stage='query_build'):
+      query, parameters = qreg.build_approach_by_area(area_definition)
+    records = self._driver.run(query, 'approach', **parameters)
+    return records
+  
+  def get_action_by_state(self, state_definition:Dict) -> List[Dict]:
+    with STAGE_SECONDS.time(stage='query_build'):
+      query, parameters = qreg.build_action_by_state(state_definition)
+    records = self._driver.run(query, 'transition', **parameters)
+    return records
+
+  def count_work_by_area(self, area_definition:Dict) -> int:
+    with STAGE_SECONDS.time(stage='query_build'):
+      query, parameters = qreg.build_count_work_by_area(area_definition)
+    records = self._driver.run(query, 'count_work', **parameters)
+    return records[0]['count'] if records else 0
+
+  def ensure_indexes(self) -> List[str]:
+    """function to create the indexes and constraints used by the queries, if not exist
+    the schema statements are not recorded
+
+    Returns:
+        List[str]: the statements run
+    """
+    return self._neo4j.ensure_indexes(qreg.INDEXES)
+
+  def graph_version(self) -> Optional[str]:
+    """fonction to get the version of the graph: GraphVersion marker, nodes and relationships counts
+      the graph writers must update the marker (max version property of the GraphVersion nodes) on each change,
+      without marker only the changes of the nodes and relationships counts are detected, not the properties changes
+
+    Returns:
+        Optional[str]: graph version
+    """
+    records = self._driver.run(qreg.build_graph_version(), 'version')
+    record = records[0]
+    if record['marker'] is None and not self._marker_missing:
+      self._logger.warning("no GraphVersion marker in the graph, the properties changes are not detected: "
+                           "the cached goals, sequences and transitions may be stale until the nodes or "
+                           "relationships counts change")
+    self._marker_missing = record['marker'] is None
+    return f"{record['marker']}:{record['nodes']}:{record['relations']}"
+
+  def export(self, path:str):
+    """function to export the graph to a snapshot file, to use with a FileDataUnit
+    binary snapshot if the extension is .bin, else json snapshot
+
+    Args:
+        path (str): snapshot file path
+    """
+    snapshot = export_snapshot(self._driver)
+    if path.endswith(BINARY_EXTENSION):
+      write_binary_snapshot(snapshot, path)
+    else:
+      snapshot.save(path)
 
   def close(self):
     """close the dataunit object
     """
     self._driver.close()
 
+
+class ReplayDataUnit(Neo4jDataUnit):
+  """
+    object to get data from the neo4j queries recorded by a Neo4jDataUnit, without database
+    the same queries are built, a query not recorded raise a DBDriverException
+  """
+  def __init__(self, record_path:str):
+    super().__init__(driver=ReplayDriver(record_path))
+
+  def graph_version(self) -> Optional[str]:
+    # the recorded graph never change
+    return None
+
+  def report(self) -> Dict:
+    return self._driver.report()
+
+
+class FileDataUnit(DataUnit):
+  """
+    object to get data from a graph snapshot loaded in memory
+    the snapshot is exported from the database with Neo4jDataUnit.export
+    a binary snapshot is mapped in memory and shared by the processes opening it
+  """
+  def __init__(self, snapshot:Union[GraphSnapshot, BinarySnapshot], path:str=None):
+    self._snapshot = snapshot
+    # snapshot file, reloaded when it is replaced
+    self._path = path
+    # the previous snapshot is closed on refresh once the queries reading it end, the records are copies
+    self._lock = threading.Lock()
+
+  @staticmethod
+  def load_snapshot(path:str) -> Union[GraphSnapshot, BinarySnapshot]:
+    if path.endswith(BINARY_EXTENSION):
+      return BinarySnapshot(path)
+    return GraphSnapshot.load(path)
+
+  @staticmethod
+  def from_file(path:str) -> 'FileDataUnit':
+    return FileDataUnit(FileDataUnit.load_snapshot(path), path)
+
+  def graph_version(self) -> Optional[str]:
+    # the snapshot file modification time and size
+    if not self._path:
+      return None
+    stat = os.stat(self._path)
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+  def refresh(self):
+    # reload the replaced snapshot file and close the previous one (mmap and file)
+    if self._path:
+      snapshot = FileDataUnit.load_snapshot(self._path)
+      with self._lock:
+        previous, self._snapshot = self._snapshot, snapshot
+        FileDataUnit.__close_snapshot(previous)
+
+  @staticmethod
+  def __close_snapshot(snapshot:Union[GraphSnapshot, BinarySnapshot]):
+    if isinstance(snapshot, BinarySnapshot):
+      snapshot.close()
+
+  def get_work_by_area(self, area_definition:Dict) -> List[Dict]:
+    with self._lock:
+      return self._snapshot.work_by_area(area_definition)
+  
+  def get_station_by_area(self, area_definition:Dict) -> List[Dict]:
+    with self._lock:
+      return self._snapshot.actions_by_area(STATION_ACTION_TYPE, area_definition)
+  
+  def get_approach_by_area(self, area_definition:Dict) -> List[Dict]:
+    with self._lock:
+      return self._snapshot.actions_by_area(APPROACH_ACTION_TYPE, area_definition)
+  
+  def get_action_by_state(self, state_definition:Dict) -> List[Dict]:
+    with self._lock:
+      return self._snapshot.action_by_state(state_definition)
+
+  def count_work_by_area(self, area_definition:Dict) -> int:
+    with self._lock:
+      return self._snapshot.count_work_by_area(area_definition)
+
+  def close(self):
+    with self._lock:
+      FileDataUnit.__close_snapshot(self._snapshot)
+
+
+# solver used by the segment solving worker processes
+WORKER_SOLVER:'SequenceSolver' = None
+
+def init_segment_worker(data_unit_factory:Callable[[], DataUnit]):
+  """function to initialize a segment solving worker process
+  each worker has its own dataunit and solver
+
+  Args:
+      data_unit_factory (Callable[[], DataUnit]): function to instantiate a dataunit
+  """
+  global WORKER_SOLVER
+  WORKER_SOLVER = SequenceSolver(data_unit_factory())
+
+def solve_segment(goals:List[Action],
+                  situation:Situation,
+                  final_situation:Situation) -> Tuple[List[Action], List[int]]:
+  """function to solve a segment of goals in a worker process
+
+  Args:
+      goals (List[Action]): segment goals
+      situation (Situation): situation at the segment begin
+      final_situation (Situation): situation to reach at the segment end
+
+  Returns:
+      Tuple[List[Action], List[int]]: the segment sequence and the index of the goals in the sequence
+  """
+  sequence = WORKER_SOLVER.resolve_from(goals, situation, final_situation)
+  # the actions are copied between processes, keep the goals position
+  goal_ids = set(id(goal) for goal in goals)
+  goal_indexes = [i for i, action in enumerate(sequence) if id(action) in goal_ids]
+  return sequence, goal_indexes
+
+
+class SequenceRecord:
+  """object storing a builded sequence and its goals
+  used to resume an interrupted sequence without getting again the goals
+  """
+  def __init__(self, sequence_type:SequenceTypeRegister,
+               goals:List[Action],
+               sequence:List[Action]):
+    self._sequence_type = sequence_type
+    self._goals = goals
+    self._sequence = sequence
+
+  @property
+  def sequence_type(self):
+    return self._sequence_type
+
+  @property
+  def goals(self):
+    return self._goals
+
+  @property
+  def sequence(self):
+    return self._sequence
+
+
 class SequenceUnit():
 
-  def __init__(self, data_unit:DataUnit):
+  def __init__(self, data_unit:DataUnit,
+               data_unit_factory:Callable[[], DataUnit]=None,
+               workers:int=0,
+               parallel_min_goals:int=0,
+               store_size:int=100,
+               transitions_cache_size:int=1024,
+               memory_budget:MemoryBudget=None,
+               memory_accounting:bool=False,
+               graph_watcher:GraphVersionWatcher=None,
+               area_cache_size:int=64,
+               sequence_cache_size:int=16,
+               area_cell_cache_size:int=32,
+               disk_cache:DiskCache=None,
+               action_cache_size:int=50000,
+               situation_template:SituationTemplate=None):
+    """init function
+
+    Args:
+        data_unit (DataUnit): dataunit to get data
+        data_unit_factory (Callable[[], DataUnit], optional): function to instantiate
+        a dataunit in each worker process. Defaults to None, no parallel solving.
+        workers (int, optional): number of worker processes to solve the rail segments. Defaults to 0.
+        parallel_min_goals (int, optional): minimal number of goals to solve the segments in parallel. Defaults to 0.
+        store_size (int, optional): number of builded sequences kept to be resumed. Defaults to 100.
+        transitions_cache_size (int, optional): number of transition actions kept by the solvers. Defaults to 1024.
+        memory_budget (MemoryBudget, optional): memory budget of the work requests. Defaults to None, no budget.
+        memory_accounting (bool, optional): measure the memory allocated by stage,
+        the tracing must be started with tracemalloc.start. Defaults to False.
+        graph_watcher (GraphVersionWatcher, optional): detector of the graph changes. Defaults to None,
+        no goals and sequences caches.
+        area_cache_size (int, optional): number of goals queries results kept. Defaults to 64.
+        sequence_cache_size (int, optional): number of builded sequences kept by request. Defaults to 16.
+        area_cell_cache_size (int, optional): number of goals queries results kept by rail. Defaults to 32.
+        disk_cache (DiskCache, optional): persistent tier of the goals and sequences caches,
+        shared by the processes and kept between the restarts. Defaults to None.
+        action_cache_size (int, optional): number of parsed actions kept. Defaults to 50000.
+        situation_template (SituationTemplate, optional): parsed default situation,
+        the states of the requests situations not overridden are not parsed again. Defaults to None.
+    """
     # data unit to get data
     self.__data_unit = data_unit
+
+    # cache of the transition actions got from database, shared by the solvers
+    # keyed by graph version, cleared on the graph changes
+    self.__transitions = LRUCache(transitions_cache_size)
+    self.__version:Callable[[], Optional[str]] = (lambda: graph_watcher.version) if graph_watcher else None
+
+    # parsed default situation
+    self.__situation_template = situation_template
     
-    # instantiate a sequence solver,
-    # I pass a dataunit as parameter to it get the missing data
-    self._solver = SequenceSolver(data_unit)
+    # a sequence solver is instantiated by request (__new_solver), it stores its planning context
+    # so it can't be shared by concurrent requests
     self._logger = logging.getLogger('sequencer.processor')
+
+    # builded sequences by id, to resume them
+    self.__store = LRUCache(store_size)
+
+    # process pool to solve the rail segments in parallel
+    # instantiated on first use
+    self.__data_unit_factory = data_unit_factory
+    self.__workers = workers
+    self.__parallel_min_goals = parallel_min_goals
+    self.__pool:ProcessPoolExecutor = None
+    # the pool is replaced on the graph changes while the requests submit to it
+    self.__pool_lock = threading.Lock()
+
+    self.__memory_budget = memory_budget
+    self.__memory_accounting = memory_accounting
+    self._memory_logger = logging.getLogger('sequencer.memory')
+
+    # caches of the goals queries results and of the builded sequences by request
+    # only safe if the graph changes are detected: the values of a previous graph version are served
+    # while they are refreshed in background, and while the database is not reachable
+    self.__areas:VersionedCache = None
+    self.__sequences:VersionedCache = None
+    self.__cells:AreaCellCache = None
+    self.__actions:ActionCache = None
+    self.__refresher:ThreadPoolExecutor = None
+    if graph_watcher:
+      version = lambda: graph_watcher.version
+      self.__refresher = ThreadPoolExecutor(max_workers=1, thread_name_prefix='cache-refresh')
+      self.__areas = VersionedCache('areas', area_cache_size, version, self.__refresher, disk_cache)
+      self.__sequences = VersionedCache('sequences_by_request', sequence_cache_size, version, self.__refresher,
+                                        disk_cache)
+      # the requests on a list of rails are composed from the results by rail
+      self.__cells = AreaCellCache(area_cell_cache_size, version)
+      # the parsed actions, the same records are parsed by each request
+      self.__actions = ActionCache(action_cache_size, version)
+      graph_watcher.add_listener(self.__on_graph_change)
     
+  @property
+  def caching(self) -> bool:
+    """true if the goals and sequences are cached by request
+    """
+    return self.__sequences is not None
+
   def build(self,
         sequence_type:SequenceTypeRegister,
         query_definition:Dict,
         states_definition:Dict,
-        ) -> List[Dict]:
+        trace:SolverTrace=None,
+        goal_number:Optional[int]=NOT_COUNTED
+        ) -> Tuple[str, List[Dict]]:
     """function to build a sequence of action according the user query definition
     and a initial situation (states definition)
 
+    Args:
+        sequence_type (SequenceTypeRegister): sequence type to build
+        query_definition (Dict): user query
+        states_definition (Dict): initial state
+        trace (SolverTrace, optional): trace to fill in explain mode, the sequence is then solved without parallel segments.
+        Defaults to None.
+        goal_number (Optional[int], optional): number of goals counted by the caller (count_goals). Defaults to NOT_COUNTED.
+
+    Raises:
+        ProcessException: raise if the request is over the memory budget with the reject policy
+
+    Returns:
+        Tuple[str, List[Dict]]: the sequence id and the sequence of action definition,
+        the sequence id is None if the request is downgraded
+    """
+    if self.__sequences is not None and not trace:
+      # the identical requests get the sequence builded on the graph version
+      key = request_key(sequence_type.value, query_definition, states_definition)
+      # the background refresh get the goals of the new graph version, not the stale ones
+      sequence_id, record, json_sequence = self.__sequences.get(key,
+                                                                partial(self.__build, sequence_type,
+                                                                        query_definition, states_definition,
+                                                                        goal_number=goal_number),
+                                                                partial(self.__build, sequence_type,
+                                                                        query_definition, states_definition,
+                                                                        fresh=True))
+    else:
+      sequence_id, record, json_sequence = self.__build(sequence_type, query_definition, states_definition, trace,
+                                                        goal_number=goal_number)
+
+    # the record is stored again, it may have been removed from the store since it was cached
+    if record:
+      self.__store.put(sequence_id, record)
+    return sequence_id, json_sequence
+
+  def cached(self,
+        sequence_type:SequenceTypeRegister,
+        query_definition:Dict,
+        states_definition:Dict) -> Optional[Tuple[str, List[Dict]]]:
+    """function to get the sequence of a request from the sequences cache, without building it
+    a stale sequence is served and refreshed in background, as by build
+
     Args:
         sequence_type (SequenceTypeRegister): sequence type to build
         query_definition (Dict): user query
         states_definition (Dict): initial state
 
     Returns:
-        List[Dict]: sequence of action definition
+        Optional[Tuple[str, List[Dict]]]: the sequence id and the sequence of action definition, None if not cached
     """
+    if self.__sequences is None:
+      return None
+
+    key = request_key(sequence_type.value, query_definition, states_definition)
+    cached = self.__sequences.lookup(key, partial(self.__build, sequence_type,
+                                                  query_definition, states_definition,
+                                                  fresh=True))
+    if cached is None:
+      return None
+
+    sequence_id, record, json_sequence = cached
+    if record:
+      self.__store.put(sequence_id, record)
+    return sequence_id, json_sequence
+
+  def __build(self,
+        sequence_type:SequenceTypeRegister,
+        query_definition:Dict,
+        states_definition:Dict,
+        trace:SolverTrace=None,
+        fresh:bool=False,
+        goal_number:Optional[int]=NOT_COUNTED
+        ) -> Tuple[str, SequenceRecord, List[Dict]]:
     tb = time.time()
-    self._logger.info('get goals from database')
+    # a downgraded request is solved without worker processes and not stored
+    in_budget = self.__check_budget(sequence_type, query_definition, goal_number)
+    accounting = MemoryAccounting() if self.__memory_accounting else None
+
+    actions = self.__get_goals(sequence_type, query_definition, trace, accounting, fresh)
+
+    segments = split_by_rail(actions)
+
+    # use the solver to resolve problem and produce sequence
+    # large requests on several rails are solved by segment in parallel
+    with account(accounting, 'solve'):
+      if not trace and in_budget and self.__is_parallel(actions, segments):
+        sequence = self.__solve_segments(segments, states_definition)
+      else:
+        sequence = self.__solve(self.__new_solver(trace), actions, states_definition)
+
+    tsequence = time.time()
+    # transform to dict for json transfert
+    with STAGE_SECONDS.time(stage='serialisation'), account(accounting, 'serialisation'):
+      json_sequence = [action.to_dict() for action in sequence]
+
+    ttb = round(tsequence - tb, 2)
+    self._logger.info(f'sequence builded - time to build sequence : {ttb} seconds')
+    if accounting:
+      self.__log_accounting(accounting)
+
+    if not in_budget:
+      return None, None, json_sequence
+    return str(uuid.uuid4()), SequenceRecord(sequence_type, actions, sequence), json_sequence
+
+  def build_partitioned(self,
+        sequence_type:SequenceTypeRegister,
+        query_definition:Dict,
+        states_definitions:List[Dict],
+        goal_number:Optional[int]=NOT_COUNTED
+        ) -> List[Tuple[str, List[Dict]]]:
+    """function to build one sequence of action by robot according the user query definition
+    the goals are split in balanced partitions by aircraft rail, one partition by robot,
+    and each partition is solved in parallel from the robot initial situation
+
+    Args:
+        sequence_type (SequenceTypeRegister): sequence type to build
+        query_definition (Dict): user query
+        states_definitions (List[Dict]): initial state of each robot
+        goal_number (Optional[int], optional): number of goals counted by the caller (count_goals). Defaults to NOT_COUNTED.
+
+    Returns:
+        List[Tuple[str, List[Dict]]]: the sequence id and the sequence of action definition for each robot
+    """
+    tb = time.time()
+    in_budget = self.__check_budget(sequence_type, query_definition, goal_number)
+    actions = self.__get_goals(sequence_type, query_definition)
+
+    self._logger.info(f'split the actions in {len(states_definitions)} partitions')
+    partitions = partition_by_rail(actions, len(states_definitions))
+
+    self._logger.info('solve the partitions')
+    if self.__data_unit_factory and self.__workers > 1:
+      # the partitions are solved by the worker processes, from each robot initial situation
+      situations = [SequenceSolver.parse_situation(states_definition, self.__situation_template)
+                    for states_definition in states_definitions]
+      with STAGE_SECONDS.time(stage='solve'):
+        futures = self.__submit([(partition, situation, robot_situation)
+                                 for partition, (situation, robot_situation) in zip(partitions, situations)])
+        solved = [future.result()[0] for future in futures]
+      with STAGE_SECONDS.time(stage='optimization'):
+        sequences = [begin_with_probing(sequence) for sequence in solved]
+    else:
+      # one solver by partition, a solver store its planning context
+      solvers = [SequenceSolver(self.__data_unit, self.__transitions, self.__actions, self.__version)
+                 for _ in partitions]
+      with ThreadPoolExecutor(max_workers=len(partitions)) as executor:
+        sequences = list(executor.map(self.__solve,
+                                      solvers,
+                                      partitions,
+                                      states_definitions))
+
+    tsequence = time.time()
+    # transform to dict for json transfert
+    with STAGE_SECONDS.time(stage='serialisation'):
+      json_sequences = [[action.to_dict() for action in sequence] for sequence in sequences]
+
+    ttb = round(tsequence - tb, 2)
+    self._logger.info(f'sequences builded - time to build {len(sequences)} sequences : {ttb} seconds')
+
+    sequence_ids = [self.__register(sequence_type, partition, sequence) if in_budget else None
+                    for partition, sequence in zip(partitions, sequences)]
+    return list(zip(sequence_ids, json_sequences))
+
+  def build_stream(self,
+        sequence_type:SequenceTypeRegister,
+        query_definition:Dict,
+        states_definition:Dict,
+        chunk_size:int=50,
+        goal_number:Optional[int]=NOT_COUNTED) -> Iterator[Tuple[str, List[Dict]]]:
+    """generator version of build, the sequence is returned by chunks as soon as they are solved
+    the probing actions required by the goals are solved first, so the sequence begin with the probing
+    without reordering the complete sequence
+
+    Args:
+        sequence_type (SequenceTypeRegister): sequence type to build
+        query_definition (Dict): user query
+        states_definition (Dict): initial state
+        chunk_size (int, optional): number of actions by chunk. Defaults to 50.
+        goal_number (Optional[int], optional): number of goals counted by the caller (count_goals). Defaults to NOT_COUNTED.
+
+    Yields:
+        Tuple[str, List[Dict]]: the sequence id and a chunk of the sequence of action definition
+    """
+    tb = time.time()
+    in_budget = self.__check_budget(sequence_type, query_definition, goal_number)
+    actions = self.__get_goals(sequence_type, query_definition)
+
+    # a dedicated solver, the generator keep its planning context between two chunks
+    solver = SequenceSolver(self.__data_unit, self.__transitions, self.__actions, self.__version)
+
+    situation, robot_situation = SequenceSolver.parse_situation(states_definition, self.__situation_template)
+    work_uids = set(sd['definition']['uid'] for sd in states_definition['work_situation'].values())
+
+    # the probing prefix: actions to reach the work states required by the goals
+    self._logger.info('get the probing actions')
+    probing = solver.prerequisites(actions, situation, work_uids)
+
+    sequence_id = str(uuid.uuid4()) if in_budget else None
+    sequence = []
+    chunk = []
+
+    self._logger.info('solve and stream the actions definition')
+    for action in solver.iter_resolve_from(probing+actions, situation, robot_situation):
+      sequence.append(action)
+      chunk.append(action.to_dict())
+      if len(chunk) == chunk_size:
+        if len(sequence) == chunk_size:
+          ttf = round(time.time() - tb, 2)
+          self._logger.info(f'first chunk solved - time to first chunk : {ttf} seconds')
+        yield sequence_id, chunk
+        chunk = []
+
+    if chunk:
+      yield sequence_id, chunk
+
+    ttb = round(time.time() - tb, 2)
+    self._logger.info(f'sequence streamed - time to build sequence : {ttb} seconds')
+
+    if in_budget:
+      self.__register(sequence_type, actions, sequence, sequence_id)
+
+  def resume(self,
+        sequence_id:str,
+        index:int,
+        states_definition:Dict,
+        trace:SolverTrace=None) -> Tuple[str, List[Dict]]:
+    """function to build the remaining part of an interrupted sequence
+    the goals got for the sequence are reused, only the goals not performed are solved again
+
+    Args:
+        sequence_id (str): id of the interrupted sequence
+        index (int): index of the first action not performed in the sequence
+        states_definition (Dict): actual situation
+        trace (SolverTrace, optional): trace to fill in explain mode. Defaults to None.
+
+    Raises:
+        ProcessException: raise if no sequence is stored with this id
+
+    Returns:
+        Tuple[str, List[Dict]]: the new sequence id and the remaining sequence of action definition
+    """
+    record:SequenceRecord = self.__store.get(sequence_id)
+    CACHE_REQUESTS.inc(cache='sequences', result='hit' if record else 'miss')
+    if not record:
+      raise ProcessException(['PROCESS', 'RESUME'],
+                             ProcessExceptionType.UNKNOWN_SEQUENCE,
+                             f"unable to resume the sequence: no sequence with id {sequence_id}, build it again")
+
+    executed_uids = set(action.uid for action in record.sequence[:index])
+    return self.__resume(record.sequence_type, record.goals, executed_uids, states_definition, trace)
+
+  def resume_sequence(self,
+        sequence_type:SequenceTypeRegister,
+        query_definition:Dict,
+        sequence:List[Dict],
+        index:int,
+        states_definition:Dict,
+        trace:SolverTrace=None,
+        goal_number:Optional[int]=NOT_COUNTED) -> Tuple[str, List[Dict]]:
+    """function to build the remaining part of an interrupted sequence not stored
+    the goals are got from the database, only the goals not performed are solved again
+
+    Args:
+        sequence_type (SequenceTypeRegister): sequence type of the interrupted sequence
+        query_definition (Dict): user query of the interrupted sequence
+        sequence (List[Dict]): interrupted sequence of action definition
+        index (int): index of the first action not performed in the sequence
+        states_definition (Dict): actual situation
+        trace (SolverTrace, optional): trace to fill in explain mode. Defaults to None.
+        goal_number (Optional[int], optional): number of goals counted by the caller (count_goals). Defaults to NOT_COUNTED.
+
+    Returns:
+        Tuple[str, List[Dict]]: the new sequence id and the remaining sequence of action definition
+    """
+    self.__check_budget(sequence_type, query_definition, goal_number)
+    goals = self.__get_goals(sequence_type, query_definition, trace)
+    executed_uids = set(action['uid'] for action in sequence[:index])
+    return self.__resume(sequence_type, goals, executed_uids, states_definition, trace)
+
+  def __resume(self,
+        sequence_type:SequenceTypeRegister,
+        goals:List[Action],
+        executed_uids:Set[str],
+        states_definition:Dict,
+        trace:SolverTrace=None) -> Tuple[str, List[Dict]]:
+    tb = time.time()
+    # keep the goals not performed, in the sorted order
+    remaining = [goal for goal in goals if not goal.uid in executed_uids]
+    self._logger.info(f'resume the sequence - {len(remaining)}/{len(goals)} goals to perform')
+
+    solver = self.__new_solver(trace)
+    sequence = self.__solve(solver, remaining, states_definition)
+    with STAGE_SECONDS.time(stage='serialisation'):
+      json_sequence = [action.to_dict() for action in sequence]
+
+    ttb = round(time.time() - tb, 2)
+    self._logger.info(f'sequence resumed - time to resume sequence : {ttb} seconds')
+
+    sequence_id = self.__register(sequence_type, remaining, sequence)
+    return sequence_id, json_sequence
+
+  def __register(self,
+        sequence_type:SequenceTypeRegister,
+        goals:List[Action],
+        sequence:List[Action],
+        sequence_id:str=None) -> str:
+    # store the sequence and its goals to resume it if interrupted
+    sequence_id = sequence_id if sequence_id else str(uuid.uuid4())
+    self.__store.put(sequence_id, SequenceRecord(sequence_type, goals, sequence))
+    return sequence_id
+
+  def __on_graph_change(self, old_version:Optional[str], version:str):
+    # the transitions are only got by state, they are invalidated
+    self.__transitions.clear()
+    # the worker processes have their own dataunit and transitions cache, they are restarted on next use
+    # the segments already submitted to the old pool are solved before its workers stop
+    with self.__pool_lock:
+      pool, self.__pool = self.__pool, None
+    if pool:
+      pool.shutdown(wait=False)
+
+  def close(self):
+    """close the sequenceunit object, stop the worker processes
+    """
+    with self.__pool_lock:
+      pool, self.__pool = self.__pool, None
+    if pool:
+      pool.shutdown()
+    if self.__refresher:
+      self.__refresher.shutdown()
+      self.__refresher = None
+
+  def count_goals(self, sequence_type:SequenceTypeRegister, query_definition:Dict) -> Optional[int]:
+    """function to get the number of goals of a request with a count query, without getting the goals
+    only the work requests are large enough to be counted
+
+    Args:
+        sequence_type (SequenceTypeRegister): sequence type to build
+        query_definition (Dict): user query
+
+    Returns:
+        Optional[int]: number of goals, None if the request is not counted
+    """
+    if sequence_type != SequenceTypeRegister.work_area:
+      return None
+
+    DB_LOOKUPS.inc(query='count_work_by_area')
+    try:
+      with DB_QUERY_SECONDS.time(query='count_work_by_area'):
+        return self.__data_unit.count_work_by_area(query_definition)
+    except DBDriverException as error:
+      # the goals may be served by the caches, the request is not counted
+      self._logger.warning(f"unable to count the goals: {error.describe()['description']}")
+      return None
+
+  def count_stored_goals(self, sequence_id:str) -> Optional[int]:
+    """function to get the number of goals of a stored sequence, None if the sequence is not stored
+    """
+    record:SequenceRecord = self.__store.get(sequence_id)
+    return len(record.goals) if record else None
+
+  def __check_budget(self,
+        sequence_type:SequenceTypeRegister,
+        query_definition:Dict,
+        goal_number:Optional[int]=NOT_COUNTED) -> bool:
+    """function to check the memory budget of a request before getting the goals
+    the goals are counted only if the caller did not count them
+
+    Returns:
+        bool: true if the request is in the budget, false if it must be downgraded
+    """
+    if not self.__memory_budget:
+      return True
+
+    if goal_number == NOT_COUNTED:
+      goal_number = self.count_goals(sequence_type, query_definition)
+    return goal_number is None or self.__memory_budget.check(goal_number)
+
+  def __log_accounting(self, accounting:MemoryAccounting):
+    for stage, measure in accounting.report().items():
+      self._memory_logger.info("stage %s - peak %.1fMiB, allocated %.1fMiB",
+                               stage, measure['peak']/2**20, measure['allocated']/2**20)
+      for site in measure['sites']:
+        self._memory_logger.debug("  %s : %+.1fKiB in %+d blocks", site['site'], site['size']/2**10, site['count'])
+
+  def __new_solver(self, trace:SolverTrace=None) -> 'SequenceSolver':
+    # a dedicated solver by request, the transitions cache is shared
+    # the dataunit is passed to the solver to get the missing data
+    solver = SequenceSolver(self.__data_unit, self.__transitions, self.__actions, self.__version)
+    solver.trace = trace
+    return solver
+
+  def __is_parallel(self, goals:List[Action], segments:List[List[Action]]) -> bool:
+    return bool(self.__data_unit_factory) \
+           and self.__workers > 1 \
+           and len(segments) > 1 \
+           and len(goals) >= self.__parallel_min_goals
+
+  def __solve_segments(self,
+        segments:List[List[Action]],
+        states_definition:Dict) -> List[Action]:
+    """function to solve the rail segments in parallel and stitch the segments sequences
+    each segment is solved from the situation predicted at its begin and return to the robot initial situation,
+    the sequences are then stitched by a boundary repair solve
+
+    Args:
+        segments (List[List[Action]]): list of goals segments
+        states_definition (Dict): initial state
+
+    Returns:
+        List[Action]: optimized sequence of action
+    """
+    situation, robot_situation = SequenceSolver.parse_situation(states_definition, self.__situation_template)
+    work_uids = set(sd['definition']['uid'] for sd in states_definition['work_situation'].values())
+
+    # predict the work situation at each segment begin
+    # the robot is in its initial situation between two segments
+    situations = []
+    predicted = situation
+    for segment in segments:
+      situations.append(predicted)
+      predicted = SequenceSolver.predict_situation(segment, predicted, work_uids)
+
+    self._logger.info(f'solve {len(segments)} rail segments in parallel')
+    with STAGE_SECONDS.time(stage='solve'):
+      futures = self.__submit([(segment, segment_situation, robot_situation)
+                               for segment, segment_situation in zip(segments, situations)])
+      solved_segments = [future.result() for future in futures]
+
+      self._logger.info('stitch the segments')
+      sequence = self.__stitch(solved_segments, situation, robot_situation)
+
+    # optimize the sequence
+    # begin with all probing subsequence
+    self._logger.info('optimize the sequence')
+    with STAGE_SECONDS.time(stage='optimization'):
+      return begin_with_probing(sequence)
+
+  def __submit(self, tasks:List[Tuple[List[Action], Situation, Situation]]) -> List[Future]:
+    """function to submit goals to solve to the worker processes (solve_segment)
+    the pool is instantiated on first use
+
+    Args:
+        tasks (List[Tuple[List[Action], Situation, Situation]]): goals, initial and final situations of each task
+
+    Returns:
+        List[Future]: the sequence and goals index of each task
+    """
+    # the tasks are submitted under the lock, the pool is not shut down by a graph change meanwhile
+    with self.__pool_lock:
+      if not self.__pool:
+        self.__pool = ProcessPoolExecutor(max_workers=self.__workers,
+                                          initializer=init_segment_worker,
+                                          initargs=(self.__data_unit_factory,))
+      return [self.__pool.submit(solve_segment, *task) for task in tasks]
+
+  def __stitch(self,
+        solved_segments:List[Tuple[List[Action], List[int]]],
+        situation:Situation,
+        robot_situation:Situation) -> List[Action]:
+    """function to stitch segments sequences
+    the return to the initial situation at the end of a segment and the start of the following segment
+    are replaced by a repair sequence from the last goal of a segment to the first goal of the following one
+
+    Args:
+        solved_segments (List[Tuple[List[Action], List[int]]]): sequence and goals index of each segment
+        situation (Situation): initial situation
+        robot_situation (Situation): robot initial situation, to reach at the end
+
+    Returns:
+        List[Action]: the stitched sequence
+    """
+    sequence = []
+    solver = self.__new_solver()
+
+    for i, (segment_sequence, goal_indexes) in enumerate(solved_segments):
+      if not goal_indexes:
+        # no goal of the segment in its sequence, nothing to stitch, the situation is unchanged
+        continue
+      first, last = goal_indexes[0], goal_indexes[-1]
+
+      if i == 0:
+        # first segment, keep the start from the initial situation
+        sequence.extend(segment_sequence[:last+1])
+        situation = SequenceSolver.replay(sequence, situation)
+        continue
+
+      # boundary repair, from the previous last goal to the segment first goal
+      repair = solver.resolve_from([segment_sequence[first]], situation)
+      situation = SequenceSolver.replay(repair, situation)
+      sequence.extend(repair)
+
+      body = segment_sequence[first+1:last+1]
+      body_situation = SequenceSolver.replay(body, situation)
+
+      if body_situation is None:
+        # the segment sequence is not valid from the repaired situation
+        # solve again the segment goals from it
+        self._logger.debug('segment not valid after repair, solve it again')
+        goals = [segment_sequence[i] for i in goal_indexes[1:]]
+        body = solver.resolve_from(goals, situation)
+        body_situation = SequenceSolver.replay(body, situation)
+
+      sequence.extend(body)
+      situation = body_situation
+
+    # return to the robot initial situation
+    sequence.extend(solver.resolve_from([], situation, robot_situation))
+    return sequence
+
+  def __query_goals(self, sequence_type:SequenceTypeRegister, query_definition:Dict) -> List[Dict]:
     # get DataUnit function according sequence_type
     query_function = getattr(self.__data_unit, sequence_type.value)
 
     # get data from database
-    records = query_function(query_definition)
+    query_type = sequence_type.value.replace('get_', '')
+
+    def query(area_definition:Dict) -> List[Dict]:
+      DB_LOOKUPS.inc(query=query_type)
+      with DB_QUERY_SECONDS.time(query=query_type):
+        return query_function(area_definition)
+
+    if self.__cells is not None and AreaCellCache.decomposable(query_definition):
+      return self.__cells.get(query_type, query_definition, query)
+    return query(query_definition)
+
+  def __get_goals(self,
+        sequence_type:SequenceTypeRegister,
+        query_definition:Dict,
+        trace:SolverTrace=None,
+        accounting:MemoryAccounting=None,
+        fresh:bool=False) -> List[Action]:
+    """function to get the goals from the database and sort them by position
+
+    Args:
+        sequence_type (SequenceTypeRegister): sequence type to build
+        query_definition (Dict): user query
+        trace (SolverTrace, optional): trace to fill with the stages durations. Defaults to None.
+        accounting (MemoryAccounting, optional): memory accounting of the stages. Defaults to None.
+        fresh (bool, optional): get the goals of the actual graph version, not a stale cached value. Defaults to False.
+
+    Returns:
+        List[Action]: list of goals sorted by position
+    """
+    self._logger.info('get goals from database')
+    tb = time.perf_counter()
+    with account(accounting, 'query'):
+      if self.__areas is not None:
+        records = self.__areas.get(request_key(sequence_type.value, query_definition),
+                                   partial(self.__query_goals, sequence_type, query_definition),
+                                   stale=not fresh)
+      else:
+        records = self.__query_goals(sequence_type, query_definition)
+    tquery = time.perf_counter()
 
     self._logger.info('build the sequence')
     # transform json data to actions
     self._logger.info('transform data to actions')
-    actions = [Action.from_dict(action) for action in records]
+    with STAGE_SECONDS.time(stage='parsing'), account(accounting, 'parsing'):
+      if self.__actions is not None:
+        actions = self.__actions.parse(sequence_type.value, records)
+      else:
+        actions = [Action.from_dict(action) for action in records]
+    tparsing = time.perf_counter()
     
     # sort action
     self._logger.info('sort actions')
-    actions = sort_by_position(actions)
+    with STAGE_SECONDS.time(stage='sort'), account(accounting, 'sort'):
+      actions = sort_by_position(actions)
+
+    if trace:
+      trace.stage('query', tquery - tb)
+      trace.stage('parsing', tparsing - tquery)
+      trace.stage('sort', time.perf_counter() - tparsing)
+    return actions
+
+  def __solve(self,
+        solver:'SequenceSolver',
+        goals:List[Action],
+        states_definition:Dict) -> List[Action]:
+    """function to solve a list of goals and optimize the resulting sequence
 
+    Args:
+        solver (SequenceSolver): solver to use
+        goals (List[Action]): list of goals
+        states_definition (Dict): initial state
 
+    Returns:
+        List[Action]: optimized sequence of action
+    """
     # use the solver to resolve problem and produce sequence
     self._logger.info('solve the actions definition')
-    sequence  = self._solver.resolve(actions, states_definition)
+    tb = time.perf_counter()
+    with STAGE_SECONDS.time(stage='solve'):
+      sequence  = solver.resolve(goals, states_definition, self.__situation_template)
+    tsolve = time.perf_counter()
 
     # optimize the sequence
     # begin with all probing subsequence
     self._logger.info('optimize the sequence')
-    sequence = begin_with_probing(sequence)
+    # in explain mode, keep the subsequences moved by the optimization
+    moves = [] if solver.trace else None
+    with STAGE_SECONDS.time(stage='optimization'):
+      sequence = begin_with_probing(sequence, moves)
 
-    tsequence = time.time()
-    # transform to dict for json transfert
-    json_sequence = [action.to_dict() for action in sequence]
-
-    ttb = round(tsequence - tb, 2)
-    self._logger.info(f'sequence builded - time to build sequence : {ttb} seconds')
-
-    return json_sequence
+    if solver.trace:
+      solver.trace.stage('solve', tsolve - tb)
+      solver.trace.stage('optimization', time.perf_counter() - tsolve)
+      solver.trace.probing(moves)
+    return sequence
 
 
 class SequenceSolver:
     
-    def __init__(self, data_unit:DataUnit):
+    def __init__(self, data_unit:DataUnit,
+                 transitions:LRUCache=None,
+                 actions:ActionCache=None,
+                 version:Callable[[], Optional[str]]=None):
         # dataunit to get data from database
         self._data_unit = data_unit
+        # cache of the actions got from database by state definition and graph version
+        self._transitions = transitions if transitions is not None else LRUCache()
+        # function to get the graph version of the transitions, None if the graph never change
+        self._version = version
+        # cache of the parsed actions, None to parse each record
+        self._actions = actions
         # variable to store internal situation (list of states)
         self._situation:Situation = None
         # variable to store goals
@@ -162,10 +1109,13 @@ class SequenceSolver:
         self._init_situation = None
         # variable to store internal state definition
         self._history_state_def = None
+        # trace of the resolution in explain mode, None if no trace
+        self.trace:SolverTrace = None
         self._logger = logging.getLogger('sequencer.solver')
 
     def resolve(self, goals: List[Action],
-            init_situation_definition:Dict) -> List[Action]:
+            init_situation_definition:Dict,
+            template:SituationTemplate=None) -> List[Action]:
       """fonction to resolve the problem : 
       from the initial situation, define all the actions to do
       to perform all the actions listed in the goals list 
@@ -173,51 +1123,112 @@ class SequenceSolver:
       Args:
           goals (List[Action]): list of goals, action to perform
           init_situation_definition (Dict): initial situation
+          template (SituationTemplate, optional): parsed default situation, to parse only the overridden states. Defaults to None.
+
+      Returns:
+          List[Action]: list of action to perform all the goals 
+      """
+      situation, robot_situation = SequenceSolver.parse_situation(init_situation_definition, template)
+      return self.resolve_from(goals, situation, robot_situation)
+
+    def resolve_from(self, goals: List[Action],
+            situation:Situation,
+            final_situation:Situation=None) -> List[Action]:
+      """fonction to resolve the problem from a parsed situation : 
+      define all the actions to do to perform all the actions listed in the goals list
+      and to reach the final situation once all the goals are performed
+
+      Args:
+          goals (List[Action]): list of goals, action to perform
+          situation (Situation): initial situation
+          final_situation (Situation, optional): situation to reach at the end.
+          Defaults to None, the sequence end with the last goal.
 
       Returns:
           List[Action]: list of action to perform all the goals 
       """
+      # return the plan list when all the goals are performed
+      return list(self.iter_resolve_from(goals, situation, final_situation))
+
+    def iter_resolve_from(self, goals: List[Action],
+            situation:Situation,
+            final_situation:Situation=None) -> Iterator[Action]:
+      """generator version of resolve_from,
+      the actions are returned as soon as they are defined
+
+      Args:
+          goals (List[Action]): list of goals, action to perform
+          situation (Situation): initial situation
+          final_situation (Situation, optional): situation to reach at the end.
+          Defaults to None, the sequence end with the last goal.
+
+      Yields:
+          Action: the next action to perform
+      """
       # reverse the list of goals (the first action must be at the end) 
       # and cast list of goals to a queue
       self._goals = deque(goals[::-1])
 
-      # get the robot and work situations
-      robot_situation_definition = init_situation_definition['robot_situation']
-      work_situation_definition = init_situation_definition['work_situation']
-      
-      # get the states definition (values)
-      carrier_states = [sd for sd in robot_situation_definition.values()]
-      work_states = [sd for sd in work_situation_definition.values()]
-      
-      # parse the list of states to get Situation objects
-      self._situation = Situation.from_list(carrier_states+work_states)
-      self._init_situation = Situation.from_list(carrier_states)
-
-      # list to store actions
-      plan_list = []
+      # work on a copy, the situation is updated during the resolution
+      self._situation = situation.copy()
+      self._init_situation = final_situation
+      self._history_state_def = None
 
       # get the next goal
       action = self.__next_goal()
 
       # while the goals queue return an action
       while action:
+        SOLVER_ITERATIONS.inc()
         # if the action effect is not a the actual situation
         if not action.effect == self._situation:
+          poss = self.__poss(action)
+          if self.trace:
+            self.trace.iteration(action, poss)
           # if it's possible to perform the action (all preconditions are verified)
-          if self.__poss(action):
-            # do the action (update the actual situation) and append it to the plan list
+          if poss:
+            # do the action (update the actual situation) and return it
             self.__do(action)
-            plan_list.append(action)
+            yield action
             # get the next action in the goals queue
             action = self.__next_goal()
           else:
             # expand the action => explore the action and found other actions
             # to perform to verify all the conditions
             action = self.__expand(action)
-      
-      # return the plan list when all the goals are performed
-      return plan_list
-    
+        else:
+          # the action effect is already reached, nothing to do
+          if self.trace:
+            self.trace.iteration(action)
+          action = self.__next_goal()
+
+    def prerequisites(self, goals:List[Action],
+            situation:Situation,
+            state_uids:Set[str]) -> List[Action]:
+      """function to get the actions to reach the states required by the goals preconditions
+      only the states in state_uids are considered, used to define the probing before the goals
+
+      Args:
+          goals (List[Action]): list of goals
+          situation (Situation): initial situation
+          state_uids (Set[str]): uid of the states to consider
+
+      Returns:
+          List[Action]: list of actions, in the order of the goals requiring them
+      """
+      predicted = situation.copy()
+      actions = []
+      for goal in goals:
+        for state in goal.preconditions:
+          if state.uid in state_uids and state.relation == StateObject.eq \
+             and not state == predicted.get(state.uid):
+            state_definition = SequenceSolver.__build_state_definition(predicted.get(state.uid), state)
+            action = self.__get_action_from_db(state_definition)
+            if action:
+              actions.append(action)
+            predicted.update(state)
+      return actions
+
     def __next_goal(self)-> Action:
       """function to get the next action from the goals queue
 
@@ -230,6 +1241,9 @@ class SequenceSolver:
           return self._goals.pop()
       except IndexError as e:
         # raise if no more action in the goals queue
+        # no situation to reach, the resolution is finished
+        if self._init_situation is None:
+          return None
         # check if the system is in the initial situation
         if not self._situation == self._init_situation :
           # if not compare the situation and return the first different state (StateObject)
@@ -243,6 +1257,75 @@ class SequenceSolver:
           t_action = self.__get_action_from_db(state_definition)
           return t_action
 
+    @staticmethod
+    def parse_situation(init_situation_definition:Dict,
+                        template:SituationTemplate=None) -> Tuple[Situation, Situation]:
+      """function to parse a situation definition
+
+      Args:
+          init_situation_definition (Dict): situation definition with robot and work situations
+          template (SituationTemplate, optional): parsed default situation, its states are not parsed again. Defaults to None.
+
+      Returns:
+          Tuple[Situation, Situation]: the full situation and the robot situation
+      """
+      if template:
+        parsed = template.parse(init_situation_definition)
+        if parsed:
+          return parsed
+
+      # get the robot and work situations
+      robot_situation_definition = init_situation_definition['robot_situation']
+      work_situation_definition = init_situation_definition['work_situation']
+      
+      # get the states definition (values)
+      carrier_states = [sd for sd in robot_situation_definition.values()]
+      work_states = [sd for sd in work_situation_definition.values()]
+      
+      # parse the list of states once to get Situation objects, the stateobjects are not modified
+      carrier_situation = Situation.from_list(carrier_states)
+      work_situation = Situation.from_list(work_states)
+      return Situation(list(carrier_situation) + list(work_situation)), carrier_situation
+
+    @staticmethod
+    def predict_situation(goals:List[Action], situation:Situation, state_uids:Set[str]) -> Situation:
+      """function to predict the situation once all the goals are performed
+      only the states in state_uids are predicted, they keep the value required by the goals preconditions
+
+      Args:
+          goals (List[Action]): list of goals
+          situation (Situation): situation before the goals
+          state_uids (Set[str]): uid of the states to predict
+
+      Returns:
+          Situation: the predicted situation
+      """
+      predicted = situation.copy()
+      for goal in goals:
+        for state in goal.preconditions:
+          if state.uid in state_uids and state.relation == StateObject.eq:
+            predicted.update(state)
+      return predicted
+
+    @staticmethod
+    def replay(sequence:List[Action], situation:Situation) -> Union[Situation, None]:
+      """function to perform a sequence from a situation, checking the preconditions of each action
+
+      Args:
+          sequence (List[Action]): sequence of action to perform
+          situation (Situation): initial situation
+
+      Returns:
+          Situation|None: the situation at the end of the sequence or None if an action can't be performed
+      """
+      situation = situation.copy()
+      for action in sequence:
+        if not action.preconditions == situation:
+          return None
+        for result in action.results:
+          situation.update(result)
+      return situation
+
     @staticmethod
     def __build_state_definition(precondition:StateObject, result:StateObject) -> Dict:
       """function to build a structured dict from a result and a precondition
@@ -276,11 +1359,13 @@ class SequenceSolver:
       Returns:
           Action: the action to perform to obtain the precondition
       """
-      self._logger.debug(f'expand the action {action}')
+      self._logger.debug('expand the action %s', action)
       # compare the action preconditions with actual situation, return the first different state
       result_state, precondition_state = action.preconditions.compare(self._situation)
       # build a state definition 
       state_definition = SequenceSolver.__build_state_definition(precondition_state, result_state)
+      if self.trace:
+        self.trace.expansion(state_definition)
 
       # condition to avoid infinite resolution
       # compare the actual statedef to the previous on (if exist)
@@ -294,12 +1379,13 @@ class SequenceSolver:
         self._history_state_def = state_definition
 
       # request to db to get the action
+      SOLVER_EXPANSIONS.inc(search='precondition')
       t_action = self.__get_action_from_db(state_definition)
 
       # if no action found in db, expand search 
       if not t_action: 
-        print('action not found with initial situation, extend the search')
-        self._logger.debug(f'expand the action {action}')
+        SOLVER_EXPANSIONS.inc(search='extended')
+        self._logger.debug('action not found with initial situation %s, extend the search', state_definition)
         # delete precondition parameter (keep only the result)
         del state_definition['precondition']
         # and do a new request
@@ -316,6 +1402,8 @@ class SequenceSolver:
       # and return the result of expand
       
       self._goals.append(action)
+      if self.trace:
+        self.trace.close_expansion()
       return t_action
 
     def __poss(self, action:Action) -> bool:
@@ -329,7 +1417,7 @@ class SequenceSolver:
           bool: true if all precondition are verified else false
       """
       poss = action.preconditions == self._situation
-      self._logger.debug(f'possibility to perform action {action} -> {poss}')
+      self._logger.debug('possibility to perform action %s -> %s', action, poss)
       return poss
 
     
@@ -339,7 +1427,7 @@ class SequenceSolver:
       Args:
           action (Action): action to perform
       """
-      self._logger.debug(f"perform the action {action}")
+      self._logger.debug("perform the action %s", action)
 
       for result in action.results:
           self._situation.update(result)
@@ -355,12 +1443,31 @@ class SequenceSolver:
       Returns:
           Action|None: the action to perform to change the state or None if no action found
       """
-      self._logger.debug(f"search in DB the action in db solving situation {states_definition}")
-      records = self._data_unit.get_action_by_state(states_definition)
+      # the same state evolutions are requested many times, check the cache before the database
+      # the key has the graph version of the lookup, a lookup in flight during a graph change
+      # put its action (or its absence) under the old version, it is not served on the new one
+      version = self._version() if self._version else None
+      key = (version, tuple(sorted(states_definition.items())))
+      if key in self._transitions:
+        CACHE_REQUESTS.inc(cache='transitions', result='hit')
+        action = self._transitions.get(key)
+        if self.trace:
+          self.trace.lookup(states_definition, CACHE_SOURCE, action)
+        return action
+      CACHE_REQUESTS.inc(cache='transitions', result='miss')
+
+      self._logger.debug("search in DB the action in db solving situation %s", states_definition)
+      DB_LOOKUPS.inc(query='action_by_state')
+      with DB_QUERY_SECONDS.time(query='action_by_state'):
+        records = self._data_unit.get_action_by_state(states_definition)
       
       if len(records) > 0:
-        action = Action.from_dict(records[0])
-        self._logger.debug(f"action found : {action}")
-        return Action.from_dict(records[0])
+        action = self._actions.parse('transition', records[:1])[0] if self._actions else Action.from_dict(records[0])
+        self._logger.debug("action found : %s", action)
       else:
-        return None
+        action = None
+
+      if self.trace:
+        self.trace.lookup(states_definition, DB_SOURCE, action)
+      self._transitions.put(key, action)
+      return action
@@ -0,0 +1,440 @@
+import mmap
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Dict, Iterator, List, Tuple
+from .exceptions import DBDriverException, DBExceptionType
+from .snapshot import GraphSnapshot, WORK_ACTION_TYPE
+
+# binary graph snapshot
+# a string table and integer arrays, opened with mmap and read without copy,
+# so the worker processes opening the same file share one physical copy (page cache)
+#
+# header : magic, version, then (offset, length) in bytes of each section
+# sections (little-endian, aligned on 8 bytes) :
+#   string_offsets  int32  (strings+1) offsets in string_data, strings sorted by utf-8 bytes
+#   string_data     bytes  utf-8 strings
+#   actions         int32  (actions+1) x [uid, description, type, pre_start, res_start, asset_start, area_start]
+#                          the last row is a sentinel closing the ranges of the last action
+#   state_edges     int32  states of the actions preconditions and results
+#   states          int32  unique states x [uid, description, state, relation, priority]
+#   asset_edges     int32  assets of the actions
+#   assets          int32  unique assets x [uid, description, interface, label]
+#   area_edges      int32  areas of the actions then of the assemblies
+#   areas           int32  unique areas x [reference, type, uid]
+#   assemblies      int32  (assemblies+1) x [uid, area_start]
+#   origins         double assemblies x [x, y, z]
+#   result_keys     int64  sorted keys (stateobject uid << 32 | state) of the actions results
+#   result_actions  int32  action of each result key
+#   type_keys       int64  sorted action types
+#   type_actions    int32  action of each type key
+# the strings are referenced by their index in the string table, -1 for None
+
+BINARY_EXTENSION = '.bin'
+
+MAGIC = b'MARSGRPH'
+VERSION = 1
+
+SECTION_FORMATS = {'string_offsets': 'i', 'string_data': 'B',
+                   'actions': 'i',
+                   'state_edges': 'i', 'states': 'i',
+                   'asset_edges': 'i', 'assets': 'i',
+                   'area_edges': 'i', 'areas': 'i',
+                   'assemblies': 'i', 'origins': 'd',
+                   'result_keys': 'q', 'result_actions': 'i',
+                   'type_keys': 'q', 'type_actions': 'i'}
+SECTIONS = tuple(SECTION_FORMATS.keys())
+
+HEADER_FORMAT = '<8sI' + 'QQ'*len(SECTIONS)
+ALIGNMENT = 8
+
+ACTION_FIELDS = 7
+STATE_FIELDS = 5
+ASSET_FIELDS = 4
+AREA_FIELDS = 3
+ASSEMBLY_FIELDS = 2
+
+NO_STRING = -1
+NO_PRIORITY = -2**31
+
+
+class _Table:
+  """unique rows of a section, the row index of each row added
+  """
+  def __init__(self):
+    self.rows = array('i')
+    self.indexes:Dict[tuple, int] = {}
+
+  def index(self, row:tuple) -> int:
+    index = self.indexes.get(row)
+    if index is None:
+      index = len(self.indexes)
+      self.indexes[row] = index
+      self.rows.extend(row)
+    return index
+
+
+def write_binary_snapshot(snapshot:GraphSnapshot, path:str):
+  """function to write a graph snapshot in the binary format
+
+  Args:
+      snapshot (GraphSnapshot): graph snapshot
+      path (str): binary snapshot file path
+  """
+  # build the sorted string table
+  strings = set()
+  def collect(*values):
+    strings.update(v for v in values if v is not None)
+
+  for action in snapshot.actions:
+    definition = action['definition']
+    collect(definition['uid'], definition.get('description'), definition['type'])
+    for state in action['preconditions'] + action['results']:
+      collect(state['definition']['uid'], state['definition'].get('description'), state['state'], state['relation'])
+    for asset in action['assets']:
+      collect(*(asset['definition'].get(key) for key in ('uid', 'description', 'interface')))
+      collect(*asset['type'])
+    for area in action['areas']:
+      collect(area['reference'], area['type'], area['uid'])
+  for assembly in snapshot.assemblies:
+    collect(assembly['uid'])
+    for area in assembly['areas']:
+      collect(area['reference'], area['type'], area['uid'])
+
+  encoded = sorted(s.encode('utf-8') for s in strings)
+  string_ids = {s.decode('utf-8'):i for i, s in enumerate(encoded)}
+  def sid(value):
+    return string_ids[value] if value is not None else NO_STRING
+
+  string_offsets = array('i', [0])
+  for s in encoded:
+    string_offsets.append(string_offsets[-1] + len(s))
+  string_data = array('B', b''.join(encoded))
+
+  states, assets, areas = _Table(), _Table(), _Table()
+  state_edges, asset_edges, area_edges = array('i'), array('i'), array('i')
+
+  def state_row(state:Dict, result:bool) -> tuple:
+    priority = None if result else state.get('priority')
+    return (sid(state['definition']['uid']), sid(state['definition'].get('description')),
+            sid(state['state']), sid(state['relation']),
+            priority if priority is not None else NO_PRIORITY)
+
+  def add_areas(area_list:List[Dict]):
+    area_edges.extend(areas.index((sid(area['reference']), sid(area['type']), sid(area['uid'])))
+                      for area in area_list)
+
+  actions = array('i')
+  result_index, type_index = [], []
+
+  for index, action in enumerate(snapshot.actions):
+    definition = action['definition']
+    pre_start = len(state_edges)
+    state_edges.extend(states.index(state_row(state, False)) for state in action['preconditions'])
+    res_start = len(state_edges)
+    for state in action['results']:
+      state_edges.append(states.index(state_row(state, True)))
+      result_index.append(((sid(state['definition']['uid']) << 32) | sid(state['state']), index))
+    asset_start = len(asset_edges)
+    for asset in action['assets']:
+      labels = [label for label in asset['type'] if not label in ('Asset', 'Resource')]
+      asset_edges.append(assets.index(tuple(sid(asset['definition'].get(key))
+                                            for key in ('uid', 'description', 'interface'))
+                                      + (sid(labels[0]) if labels else NO_STRING,)))
+    area_start = len(area_edges)
+    add_areas(action['areas'])
+
+    actions.extend([sid(definition['uid']), sid(definition.get('description')), sid(definition['type']),
+                    pre_start, res_start, asset_start, area_start])
+    type_index.append((sid(definition['type']), index))
+
+  # sentinel row, end of the last action ranges
+  actions.extend([NO_STRING, NO_STRING, NO_STRING, len(state_edges), len(state_edges),
+                  len(asset_edges), len(area_edges)])
+
+  assemblies, origins = array('i'), array('d')
+  for assembly in snapshot.assemblies:
+    assemblies.extend([sid(assembly['uid']), len(area_edges)])
+    add_areas(assembly['areas'])
+    origin = assembly['origin']
+    origins.extend([origin['x'], origin['y'], origin['z']])
+  assemblies.extend([NO_STRING, len(area_edges)])
+
+  result_index.sort()
+  type_index.sort()
+
+  sections = {'string_offsets': string_offsets,
+              'string_data': string_data,
+              'actions': actions,
+              'state_edges': state_edges,
+              'states': states.rows,
+              'asset_edges': asset_edges,
+              'assets': assets.rows,
+              'area_edges': area_edges,
+              'areas': areas.rows,
+              'assemblies': assemblies,
+              'origins': origins,
+              'result_keys': array('q', [key for key, _ in result_index]),
+              'result_actions': array('i', [action for _, action in result_index]),
+              'type_keys': array('q', [key for key, _ in type_index]),
+              'type_actions': array('i', [action for _, action in type_index])}
+
+  if sys.byteorder != 'little':
+    for section in sections.values():
+      section.byteswap()
+
+  header_size = struct.calcsize(HEADER_FORMAT)
+  offset = header_size + (-header_size % ALIGNMENT)
+  table = []
+  for name in SECTIONS:
+    length = len(sections[name]) * sections[name].itemsize
+    table.extend([offset, length])
+    offset += length + (-length % ALIGNMENT)
+
+  with open(path, 'wb') as binary_file:
+    binary_file.write(struct.pack(HEADER_FORMAT, MAGIC, VERSION, *table))
+    for name, section_offset in zip(SECTIONS, table[::2]):
+      binary_file.write(b'\0' * (section_offset - binary_file.tell()))
+      sections[name].tofile(binary_file)
+
+
+class BinarySnapshot:
+  """graph snapshot read from a binary snapshot file opened with mmap
+  answer the same queries as GraphSnapshot
+
+  nothing is parsed at the opening, the records are created on demand from the offsets
+  the last strings, states, assets and areas created are kept to be shared by the next records
+  """
+  def __init__(self, path:str, memo_size:int=4096):
+    try:
+      with open(path, 'rb') as binary_file:
+        self._mmap = mmap.mmap(binary_file.fileno(), 0, access=mmap.ACCESS_READ)
+    except FileNotFoundError as error:
+      raise DBDriverException(['DB', 'SNAPSHOT', 'LOAD'],
+                              DBExceptionType.CONFIG_ERROR,
+                              f"no such graph snapshot file {error.filename}")
+
+    header = struct.unpack_from(HEADER_FORMAT, self._mmap)
+    if header[0] != MAGIC or header[1] != VERSION or sys.byteorder != 'little':
+      self._mmap.close()
+      raise DBDriverException(['DB', 'SNAPSHOT', 'LOAD'],
+                              DBExceptionType.CONFIG_ERROR,
+                              f"graph snapshot file {path} not conform, binary format version {VERSION} expected")
+
+    view = memoryview(self._mmap)
+    table = header[2:]
+    self._sections = {}
+    for i, name in enumerate(SECTIONS):
+      offset, length = table[2*i], table[2*i+1]
+      self._sections[name] = view[offset:offset+length].cast(SECTION_FORMATS[name])
+    view.release()
+
+    self._string_offsets = self._sections['string_offsets']
+    self._string_data = self._sections['string_data']
+    self._actions = self._sections['actions']
+    self._state_edges = self._sections['state_edges']
+    self._asset_edges = self._sections['asset_edges']
+    self._area_edges = self._sections['area_edges']
+    self._areas = self._sections['areas']
+    self._assemblies = self._sections['assemblies']
+    self._origins = self._sections['origins']
+
+    # objects created from the sections, by index, the least recently used are dropped
+    self.__string = lru_cache(maxsize=memo_size)(self.__create_string)
+    self.__state = lru_cache(maxsize=memo_size)(self.__create_state)
+    self.__asset = lru_cache(maxsize=memo_size)(self.__create_asset)
+    self.__area = lru_cache(maxsize=memo_size)(self.__create_area)
+
+    self._work_type = self.__find_string(WORK_ACTION_TYPE)
+    self._tcp_work = self.__find_string('tcp_work')
+    self._eq = self.__find_string('eq')
+    self._neq = self.__find_string('neq')
+
+  def close(self):
+    for section in self._sections.values():
+      section.release()
+    self._sections = {}
+    for memo in (self.__string, self.__state, self.__asset, self.__area):
+      memo.cache_clear()
+    self._mmap.close()
+
+  @property
+  def action_number(self) -> int:
+    return len(self._actions) // ACTION_FIELDS - 1
+
+  # strings
+
+  def __create_string(self, index:int) -> str:
+    if index == NO_STRING:
+      return None
+    return bytes(self._string_data[self._string_offsets[index]:self._string_offsets[index+1]]).decode('utf-8')
+
+  def __find_string(self, value:str) -> int:
+    """function to get the index of a string in the table, NO_STRING if not found
+    """
+    encoded = value.encode('utf-8')
+    low, high = 0, len(self._string_offsets) - 1
+    # binary search, the strings are sorted by utf-8 bytes
+    while low < high:
+      middle = (low + high) // 2
+      if bytes(self._string_data[self._string_offsets[middle]:self._string_offsets[middle+1]]) < encoded:
+        low = middle + 1
+      else:
+        high = middle
+    if low < len(self._string_offsets) - 1 and self.__string(low) == value:
+      return low
+    return NO_STRING
+
+  # objects created from offsets
+
+  def __create_state(self, index:int, result:bool) -> Dict:
+    base = index * STATE_FIELDS
+    uid, description, state, relation, priority = self._sections['states'][base:base+STATE_FIELDS]
+    definition = {'definition': {'uid': self.__string(uid), 'description': self.__string(description)},
+                  'state': self.__string(state),
+                  'relation': self.__string(relation)}
+    if not result:
+      definition['priority'] = priority if priority != NO_PRIORITY else None
+    return definition
+
+  def __create_asset(self, index:int) -> Dict:
+    base = index * ASSET_FIELDS
+    uid, description, interface, label = self._sections['assets'][base:base+ASSET_FIELDS]
+    return {'definition': {'uid': self.__string(uid),
+                           'description': self.__string(description),
+                           'interface': self.__string(interface)},
+            'type': ['Resource', 'Asset', self.__string(label)]}
+
+  def __create_area(self, index:int) -> Dict:
+    base = index * AREA_FIELDS
+    return {'reference': self.__string(self._areas[base]),
+            'type': self.__string(self._areas[base+1]),
+            'uid': self.__string(self._areas[base+2])}
+
+  def __areas(self, start:int, end:int) -> List[Dict]:
+    return [self.__area(i) for i in self._area_edges[start:end]]
+
+  def __area_uids(self, start:int, end:int) -> set:
+    return set(self._areas[i*AREA_FIELDS+2] for i in self._area_edges[start:end])
+
+  def __action_row(self, index:int) -> Tuple[memoryview, memoryview]:
+    base = index * ACTION_FIELDS
+    return self._actions[base:base+ACTION_FIELDS], self._actions[base+ACTION_FIELDS:base+2*ACTION_FIELDS]
+
+  def record(self, index:int, position:Dict=None) -> Dict:
+    """function to create the record of an action, same keys as the register queries records
+    """
+    row, next_row = self.__action_row(index)
+    uid, description, type, pre_start, res_start, asset_start, _ = row
+    record = {'definition': {'uid': self.__string(uid),
+                             'description': self.__string(description),
+                             'type': self.__string(type)},
+              'preconditions': [self.__state(i, False) for i in self._state_edges[pre_start:res_start]],
+              'results': [self.__state(i, True) for i in self._state_edges[res_start:next_row[3]]],
+              'assets': [self.__asset(i) for i in self._asset_edges[asset_start:next_row[5]]]}
+    if position is not None:
+      record['position'] = position
+    return record
+
+  # indexes
+
+  @staticmethod
+  def __actions_by_key(keys:memoryview, actions:memoryview, key:int) -> Iterator[int]:
+    i = bisect_left(keys, key)
+    while i < len(keys) and keys[i] == key:
+      yield actions[i]
+      i += 1
+
+  def __area_filters(self, area_definition:Dict) -> List[set]:
+    # area definition values to string indexes, one set by defined key
+    filters = []
+    for value in area_definition.values():
+      if value == 'all':
+        continue
+      values = value if type(value) == list else [value]
+      filters.append(set(self.__find_string(v) for v in values))
+    return filters
+
+  # queries, same results as GraphSnapshot
+
+  def __work_by_assembly(self, area_definition:Dict) -> Iterator[Tuple[int, int, int, int]]:
+    # work actions (assembly index, area range, action) of the assemblies localized in the area
+    filters = self.__area_filters(area_definition)
+    result_keys, result_actions = self._sections['result_keys'], self._sections['result_actions']
+
+    for i in range(len(self._assemblies) // ASSEMBLY_FIELDS - 1):
+      uid, area_start, _, area_end = self._assemblies[i*ASSEMBLY_FIELDS:(i+2)*ASSEMBLY_FIELDS]
+      if filters:
+        uids = self.__area_uids(area_start, area_end)
+        if not all(uids.intersection(f) for f in filters):
+          continue
+
+      for action in BinarySnapshot.__actions_by_key(result_keys, result_actions, (self._tcp_work << 32) | uid):
+        if self._actions[action*ACTION_FIELDS+2] == self._work_type:
+          yield i, area_start, area_end, action
+
+  def count_work_by_area(self, area_definition:Dict) -> int:
+    """function to count the work actions on the assemblies localized in the area
+    """
+    return sum(1 for _ in self.__work_by_assembly(area_definition))
+
+  def work_by_area(self, area_definition:Dict) -> List[Dict]:
+    """function to get the work actions on the assemblies localized in the area
+    """
+    records = []
+    positions = {}
+    for i, area_start, area_end, action in self.__work_by_assembly(area_definition):
+      position = positions.get(i)
+      if position is None:
+        x, y, z = self._origins[i*3:i*3+3]
+        position = {'coordinates': {'x': x, 'y': y, 'z': z},
+                    'areas': self.__areas(area_start, area_end)}
+        positions[i] = position
+      records.append(self.record(action, position))
+    return records
+
+  def actions_by_area(self, action_type:str, area_definition:Dict) -> List[Dict]:
+    """function to get the actions of a type reaching the area
+    """
+    filters = self.__area_filters(area_definition)
+    type_id = self.__find_string(action_type)
+
+    records = []
+    for action in BinarySnapshot.__actions_by_key(self._sections['type_keys'], self._sections['type_actions'],
+                                                  type_id):
+      row, next_row = self.__action_row(action)
+      uids = self.__area_uids(row[6], next_row[6])
+      if all(uids.intersection(f) for f in filters):
+        records.append(self.record(action, {'areas': self.__areas(row[6], next_row[6])}))
+    return records
+
+  def action_by_state(self, state_definition:Dict) -> List[Dict]:
+    """function to get the actions to move a state from the precondition to the result
+    """
+    uid = self.__find_string(state_definition['uid'])
+    result = self.__find_string(state_definition['result'])
+    if uid == NO_STRING or result == NO_STRING:
+      return []
+
+    precondition = state_definition.get('precondition')
+    precondition = self.__find_string(precondition) if precondition else None
+    states = self._sections['states']
+
+    records = []
+    for action in BinarySnapshot.__actions_by_key(self._sections['result_keys'], self._sections['result_actions'],
+                                                  (uid << 32) | result):
+      row, _ = self.__action_row(action)
+      preconditions = [states[i*STATE_FIELDS:(i+1)*STATE_FIELDS] for i in self._state_edges[row[3]:row[4]]
+                       if states[i*STATE_FIELDS] == uid]
+      # the action must have a precondition on the state
+      if not preconditions:
+        continue
+      # eq to the precondition or neq to the result
+      if precondition is not None and not any((p[3] == self._eq and p[2] == precondition)
+                                              or (p[3] == self._neq and p[2] == result)
+                                              for p in preconditions):
+        continue
+      records.append(self.record(action))
+    return records
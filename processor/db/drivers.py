@@ -1,24 +1,195 @@
+import logging
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 from neo4j import GraphDatabase, BoltDriver
-from neo4j.exceptions import ServiceUnavailable
+from neo4j.exceptions import ClientError, ServiceUnavailable
 from .exceptions import DBDriverException, DBExceptionType
+from ..metrics import NEO4J_AVAILABLE_SECONDS, NEO4J_CONSUMED_SECONDS, NEO4J_RECORDS
 
-class Neo4jDriver(object):
+def format_plan(plan:Dict, depth:int=0) -> str:
+    """function to format a query plan (PROFILE) as an indented text, one operator by line
+
+    Args:
+        plan (Dict): profiled plan of the result summary
+        depth (int, optional): depth of the operator in the plan. Defaults to 0.
+
+    Returns:
+        str: the formatted plan
+    """
+    arguments = plan.get('args', plan.get('arguments', {}))
+    details = arguments.get('Details') or arguments.get('ExpandExpression') or ''
+    line = f"{'  '*depth}{plan.get('operatorType')} rows={plan.get('rows')} dbHits={plan.get('dbHits')} {details}"
+    children = [format_plan(child, depth+1) for child in plan.get('children', [])]
+    return '\n'.join([line.rstrip()] + children)
+
+def plan_db_hits(plan:Dict) -> int:
+    """function to get the database hits of a query plan (PROFILE), all operators included
+
+    Args:
+        plan (Dict): profiled plan of the result summary
 
-    def __init__(self, bolt_uri: str, user:str, passwd:str) -> 'Neo4jDriver':
+    Returns:
+        int: the number of database hits
+    """
+    return (plan.get('dbHits') or 0) + sum(plan_db_hits(child) for child in plan.get('children', []))
+
+class Neo4jDriver(object):
+    """
+        neo4j database driver
+        the summary of each query (times and number of records) is captured,
+        the queries slower than the threshold are logged with their PROFILE plan in the slow query log,
+        profiled in background, and a sample of the queries are run with PROFILE
+    """
+    def __init__(self, bolt_uri: str, user:str, passwd:str, profiling:Dict=None) -> 'Neo4jDriver':
         self.__driver:BoltDriver = GraphDatabase.driver(bolt_uri, auth=(user, passwd),connection_timeout=10.0)
 
-    def run(self, query:str, **query_args):
+        profiling = profiling if profiling else {}
+        # threshold in ms (result available + consumed) to log a query, None = no slow query log
+        self.__slow_query_threshold = profiling.get('slow_query_threshold')
+        # rate of queries run with PROFILE, 0 = no sampled profiling
+        self.__sample_rate = profiling.get('sample_rate', 0)
+        self.__logger = logging.getLogger('sequencer.db.slow_query')
+        # the slow queries are profiled once by query, out of the request path
+        self.__profiled = set()
+        self.__profiled_lock = threading.Lock()
+        self.__profiler:ThreadPoolExecutor = None
+        if self.__slow_query_threshold is not None:
+            self.__profiler = ThreadPoolExecutor(max_workers=1, thread_name_prefix='slow-query-profile')
+
+    def run(self, query:str, query_type:str=None, **query_args) -> List[Dict]:
+        """function to run a query and capture its summary
+
+        Args:
+            query (str): cypher query
+            query_type (str, optional): label of the query in the summary and metrics. Defaults to None.
+            query_args: query parameters
+
+        Raises:
+            DBDriverException: raise if the database is not reachable
+
+        Returns:
+            List[Dict]: the query records
+        """
+        records, _ = self.run_with_summary(query, query_type, **query_args)
+        return records
+
+    def run_with_summary(self, query:str, query_type:str=None, **query_args) -> Tuple[List[Dict], Dict]:
+        """function to run a query and get its summary with the records
+
+        Args:
+            query (str): cypher query
+            query_type (str, optional): label of the query in the summary and metrics. Defaults to None.
+            query_args: query parameters
+
+        Raises:
+            DBDriverException: raise if the database is not reachable
+
+        Returns:
+            Tuple[List[Dict], Dict]: the query records and the summary (query type, times in ms, number of records,
+            database hits if profiled)
+        """
+        query_type = query_type if query_type else 'other'
+        sampled = self.__sample_rate and random.random() < self.__sample_rate
         try:
             with self.__driver.session() as session:
-                result = session.run(query,
+                result = session.run(f'PROFILE {query}' if sampled else query,
                                     **query_args)
                 records = result.data()
+                summary = result.consume()
                 session.close()
-            return records
         except ServiceUnavailable as error:
             error.args[0]
             raise DBDriverException(['DB', 'DRIVER', 'NEO4J','QUERY'],
                                     DBExceptionType.NOT_REACHABLE,
                                     f"neo4j service is not available.\n{error.args[0]}")
+
+        query_summary = {
+            'query_type': query_type,
+            'result_available_after': summary.result_available_after,
+            'result_consumed_after': summary.result_consumed_after,
+            'records': len(records)
+        }
+        # the database hits of a profiled query (sampled or PROFILE in the query)
+        if summary.profile:
+            query_summary['db_hits'] = plan_db_hits(summary.profile)
+        NEO4J_AVAILABLE_SECONDS.observe((summary.result_available_after or 0)/1000, query=query_type)
+        NEO4J_CONSUMED_SECONDS.observe((summary.result_consumed_after or 0)/1000, query=query_type)
+        NEO4J_RECORDS.inc(len(records), query=query_type)
+
+        if sampled and summary.profile:
+            self.__logger.info("sampled %s query profile - %s\n%s\n%s",
+                               query_type, query_summary, query, format_plan(summary.profile))
+
+        duration = (summary.result_available_after or 0) + (summary.result_consumed_after or 0)
+        if self.__slow_query_threshold is not None and duration >= self.__slow_query_threshold:
+            self.__log_slow_query(query, query_args, query_summary, summary.profile if sampled else None)
+
+        return records, query_summary
+
+    def ensure_indexes(self, indexes:List[Tuple[str, Optional[str], str]]) -> List[str]:
+        """function to create the indexes and constraints, if not exist
+        a constraint not created (duplicated values in the graph) is replaced by its index
+
+        Args:
+            indexes (List[Tuple[str, Optional[str], str]]): name, constraint statement (None if no constraint)
+            and index statement of each index
+
+        Raises:
+            DBDriverException: raise if the database is not reachable
+
+        Returns:
+            List[str]: the statements run
+        """
+        logger = logging.getLogger('sequencer.db')
+        statements = []
+        try:
+            with self.__driver.session() as session:
+                for name, constraint, index in indexes:
+                    if constraint:
+                        try:
+                            session.run(constraint).consume()
+                            statements.append(constraint)
+                            continue
+                        except ClientError as error:
+                            logger.warning("constraint %s not created, index created instead: %s", name, error.message)
+                    session.run(index).consume()
+                    statements.append(index)
+        except ServiceUnavailable as error:
+            raise DBDriverException(['DB', 'DRIVER', 'NEO4J', 'INDEXES'],
+                                    DBExceptionType.NOT_REACHABLE,
+                                    f"neo4j service is not available.\n{error.args[0]}")
+        return statements
+
+    def __log_slow_query(self, query:str, query_args:Dict, summary:Dict, plan:Dict=None):
+        # a slow query is profiled the first time, to not double the load of the slow queries
+        # the PROFILE is run in background, the request does not wait for it
+        if plan is None:
+            with self.__profiled_lock:
+                profile = not query in self.__profiled
+                self.__profiled.add(query)
+            if profile:
+                self.__profiler.submit(self.__profile_slow_query, query, query_args, summary)
+                return
+
+        self.__write_slow_query(query, query_args, summary, plan)
+
+    def __profile_slow_query(self, query:str, query_args:Dict, summary:Dict):
+        try:
+            with self.__driver.session() as session:
+                plan = session.run(f'PROFILE {query}', **query_args).consume().profile
+        except Exception as error:
+            self.__logger.debug("slow query not profiled: %s", error)
+            plan = None
+        self.__write_slow_query(query, query_args, summary, plan)
+
+    def __write_slow_query(self, query:str, query_args:Dict, summary:Dict, plan:Dict=None):
+        self.__logger.warning("slow %s query - %s\n%s\nparameters : %s\n%s",
+                              summary['query_type'], summary, query, query_args,
+                              format_plan(plan) if plan else 'plan already logged')
+
     def close(self):
-        self.__driver.close()
\ No newline at end of file
+        if self.__profiler:
+            self.__profiler.shutdown(cancel_futures=True)
+        self.__driver.close()
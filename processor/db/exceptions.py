@@ -6,6 +6,7 @@ class DBExceptionType(ExceptionType):
   MISSING_ELEMENT = 'DB_MISSING_ELEMENT'
   CONFIG_ERROR = 'DB_CONFIG_ERROR'
   UNKNOW_TYPE = 'DB_TYPE_UNKNOW'
+  UNEXPECTED_QUERY = 'DB_UNEXPECTED_QUERY'
 
 
 class DBDriverException(BaseException):
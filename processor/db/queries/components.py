@@ -1,8 +1,21 @@
 import re
 from collections import UserList
-from typing import List, Dict
+from typing import List, Dict, Optional, Union
 from enum import Enum
 
+# whitespaces of the multiline definitions, replaced by a single space
+WHITESPACES = re.compile(r"((\n\ *)|(\ {2,})|(\t\ *))")
+# placeholder of a variable part in a rendered query, with its separating space
+PLACEHOLDER = re.compile(r" ?\x00(\w+)\x00")
+
+def normalize(definition:str) -> str:
+    return WHITESPACES.sub(" ", definition)
+
+def placeholder(name:str) -> str:
+    """function to get the placeholder of a variable part, to render a query template
+    """
+    return f"\x00{name}\x00"
+
 class LogicOperator(Enum):
     AND=' and '
     OR=' or '
@@ -14,8 +27,7 @@ class BaseList(UserList):
         super().__init__(initlist)
     
     def add(self, definition:str):
-        _def = re.sub(r"((\n\ *)|(\ {2,})|(\t\ *))", " ", definition)
-        self.append(_def)
+        self.append(normalize(definition))
     
     def build(self):
         if len(self) > 0:
@@ -52,8 +64,7 @@ class AliasList(BaseList):
         super().__init__(init_list)
     
     def add(self, definition:str, alias:str):
-        _def = re.sub(r"((\n\ *)|(\ {2,})|(\t\ *))", " ", definition)
-        self.append((_def, alias))
+        self.append((normalize(definition), alias))
     
     def build(self):
         if len(self) > 0:
@@ -100,8 +111,7 @@ class AliasClause(Clause):
         super().__init__(prefix, AliasList)
     
     def add(self, definition:str, alias:str=None):
-        _def = re.sub(r"((\n\ *)|(\ {2,})|(\t\ *))", " ", definition)
-        self._definitions.add(_def, alias)
+        self._definitions.add(definition, alias)
     
     def build(self):
         clause = self._definitions.build()
@@ -165,14 +175,40 @@ class DBPipeline:
     def return_clause(self):
         return self._return
     
-    def add(self, query:DBQuery):
+    def add(self, query:Union[DBQuery, str]):
+        # a static subquery can be added already rendered
         self._queries.append(query)
     
     def build(self):
-        query = [f'call {{{req.build()}}}' for req in self._queries]
+        query = [f'call {{{req if type(req) == str else req.build()}}}' for req in self._queries]
         query = [" ".join(query),
                    self._with.build(),
                    self._return.build()]
         query = [r for r in query if r]
         return " ".join(query)
-    
\ No newline at end of file
+
+
+class QueryTemplate:
+    """query rendered once, the variable parts are placeholders
+    rendering a request only joins the static parts with its variable parts
+    """
+    def __init__(self, query:str):
+        # static parts and placeholders names alternate
+        parts = PLACEHOLDER.split(query)
+        self._static = parts[0::2]
+        self._names = parts[1::2]
+
+    def render(self, **values:Optional[str]) -> str:
+        """function to render the query with the variable parts
+        a variable part None (empty clause) is removed with its separating space
+        """
+        query = [self._static[0]]
+        for name, static in zip(self._names, self._static[1:]):
+            value = values.get(name)
+            if value:
+                query.append(' ')
+                query.append(value)
+            query.append(static)
+        # a leading placeholder removed leaves a space
+        return ''.join(query).lstrip()
+
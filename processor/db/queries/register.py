@@ -1,211 +1,200 @@
-
-from typing import  Dict
-from unittest import result
-
-from click import progressbar
-from .components import DBPipeline, DBQuery, LogicClause, LogicList, LogicOperator
-
-def __build_preconditions():
-    precondition = DBQuery()
-    precondition.input_clause.add('action')
-    precondition.match_clause.add('(action)<-[precondition:PRECONDITION]-(precond_state:Resource:StateObject)')
-    precondition.with_clause.add('''collect({state:precondition.state,
-                                     relation:precondition.relation,
-                                     priority:precondition.priority,
-                                     definition:properties(precond_state)})''',
-                                     'preconditions')
-    precondition.return_clause.add('preconditions')
-    return precondition
-
-def __build_results():
-    results = DBQuery()
-    results.input_clause.add('action')
-    results.match_clause.add('(action)-[result:RESULT]->(result_state:Resource:StateObject)')
-    results.with_clause.add('''collect({definition:properties(result_state),
-                               state:result.state,
-                               relation:result.relation})''', 'results')
-    results.return_clause.add('results')
-    return results
-
-def __build_assets():
-    assets = DBQuery()
-    assets.input_clause.add('action')
-    assets.match_clause.add('(action)-[:PERFORMED_BY]->(asset:Resource:Asset)')
-    assets.with_clause.add('''collect({definition: properties(asset),
-                              type: labels(asset)})''', 'assets')
-    assets.return_clause.add('assets')
-    return assets
-
-def __build_action_position():
-    areas = DBQuery()
-    areas.input_clause.add('action')
-    areas.match_clause.add('(action)-[:TO_REACH]->(area:Process:Area)')
-    areas.with_clause.add('''{areas: collect({reference: area.reference,
+from typing import  Dict, List, Optional, Tuple
+
+from .components import DBQuery, QueryTemplate, normalize, placeholder
+
+# the queries are rendered once at import as templates, the builders only render the variable parts
+# (the area filters) and return the query with its parameters, the values are never in the query text
+# so the database plans each query shape once
+#
+# the preconditions, results, assets and areas of an action are read with pattern comprehensions,
+# in the row of the action, no subquery by action
+
+# the comprehensions variables must not be bound in the queries, a bound variable would filter the pattern
+PRECONDITIONS = normalize('''[(action)<-[action_precondition:PRECONDITION]-(precond_state:Resource:StateObject) |
+                              {state:action_precondition.state,
+                               relation:action_precondition.relation,
+                               priority:action_precondition.priority,
+                               definition:properties(precond_state)}]''')
+
+RESULTS = normalize('''[(action)-[action_result:RESULT]->(result_state:Resource:StateObject) |
+                        {definition:properties(result_state),
+                         state:action_result.state,
+                         relation:action_result.relation}]''')
+
+ASSETS = normalize('''[(action)-[:PERFORMED_BY]->(asset:Resource:Asset) |
+                       {definition: properties(asset),
+                        type: labels(asset)}]''')
+
+ACTION_AREAS = normalize('''[(action)-[:TO_REACH]->(area:Process:Area) |
+                             {reference: area.reference,
                               type: area.type,
-                              uid: area.uid})}''', 'position')
-    areas.return_clause.add('position')
-    
-    return areas
-
-def __build_area_where(node:str, relation:str, area_definition:Dict):
-    where_and = LogicClause('where')
-    area_str = "exists(({node})-[:{relation}]->{area})"
+                              uid: area.uid}]''')
+
+ASSEMBLY_AREAS = normalize('''[(assembly)-[:LOCALIZED_IN]->(area:Process:Area) |
+                               {reference: area.reference,
+                                type: area.type,
+                                uid: area.uid}]''')
+
+# the record of an action, same keys for all the actions queries
+ACTION_RECORD = f'''properties(action) as definition,
+                    {PRECONDITIONS} as preconditions,
+                    {RESULTS} as results,
+                    {ASSETS} as assets'''
+
+# indexes and constraints used by the queries, (name, constraint, index if the constraint can not be created)
+# the constraints require unique uids, if the graph has duplicates a simple index is created
+INDEXES:List[Tuple[str, Optional[str], str]] = [
+    ('state_object_uid',
+     'create constraint state_object_uid if not exists for (n:StateObject) require n.uid is unique',
+     'create index state_object_uid if not exists for (n:StateObject) on (n.uid)'),
+    ('area_uid',
+     'create constraint area_uid if not exists for (n:Area) require n.uid is unique',
+     'create index area_uid if not exists for (n:Area) on (n.uid)'),
+    ('assembly_uid',
+     'create constraint assembly_uid if not exists for (n:Assembly) require n.uid is unique',
+     'create index assembly_uid if not exists for (n:Assembly) on (n.uid)'),
+    ('action_type',
+     None,
+     'create index action_type if not exists for (n:Action) on (n.type)'),
+    ('result_state',
+     None,
+     'create index result_state if not exists for ()-[r:RESULT]-() on (r.state)')
+]
+
+def __build_area_filters(area_definition:Dict) -> Tuple[List[str], Dict]:
+    # parameters of the area filters, a list of uids by defined filter
+    # each defined filter must have one of its uids in the areas
+    names = []
+    parameters = {}
     for v in area_definition.values():
         if not v == 'all':
-            if type(v) == list:
-                where_or = LogicList(LogicOperator.OR)
-                for el in v:
-                    where_or.append(area_str.format(node=node,
-                                                 relation=relation,
-                                                 area="(:Process:Area{{uid:'{area_uid}'}})".format(area_uid=el)))
-                where_and.add(where_or)
-            else:
-                where_and.add(area_str.format(node=node,
-                                              relation=relation,
-                                              area="(:Process:Area{{uid:'{area_uid}'}})".format(area_uid=v)))
-    return where_and
-
-
-def __build_appst_by_area(action_type:str, area_definition:Dict):
-    pipeline = DBPipeline()
-    
-    action = DBQuery()
-    action.match_clause.add(f'(action:Resource:Action{{type:"{action_type}"}})')
-    action.return_clause.add('action')
-    
-    where_clause = __build_area_where('action', 'TO_REACH', area_definition)
-    action.where_clause = where_clause
-    
-    pipeline.add(action)
-    pipeline.add(__build_preconditions())
-    pipeline.add(__build_results())
-    pipeline.add(__build_assets())
-    pipeline.add(__build_action_position())
-    
-    pipeline.with_clause.add('properties(action)', 'definition')
-    pipeline.with_clause.add('preconditions')
-    pipeline.with_clause.add('results')
-    pipeline.with_clause.add('assets')
-    pipeline.with_clause.add('position')
-    
-    pipeline.return_clause.add('definition')
-    pipeline.return_clause.add('preconditions')
-    pipeline.return_clause.add('results')
-    pipeline.return_clause.add('assets')
-    pipeline.return_clause.add('position')
-    
-    return pipeline
-
-def __build_state_object_where(state_object_definition:Dict):
-    where_and = LogicClause('where')
-
-    uid = state_object_definition['uid']
-    result = state_object_definition['result']
+            name = f'area_{len(names)}'
+            names.append(name)
+            parameters[name] = v if type(v) == list else [v]
+    return names, parameters
+
+def __build_area_where(names:List[str], prefix:str) -> Optional[str]:
+    # conditions of the area filters on the areas list, None if no filter
+    if names:
+        return f'{prefix} ' + ' and '.join(f'any(area in areas where area.uid in ${name})' for name in names)
+
+def __build_area_seed(variable:str, node:str, relation:str, names:List[str]) -> Optional[str]:
+    # the nodes are seeked from the areas of the first filter (Area.uid index), not scanned
+    if names:
+        return f'match (seed:Process:Area)<-[:{relation}]-({variable}{node}) where seed.uid in ${names[0]} with distinct {variable}'
+
+def __render_area_query(template:QueryTemplate,
+                        variable:str,
+                        node:str,
+                        relation:str,
+                        area_definition:Dict,
+                        prefix:str,
+                        **parameters) -> Tuple[str, Dict]:
+    names, area_parameters = __build_area_filters(area_definition)
+    query = template.render(seed=__build_area_seed(variable, node, relation, names),
+                            where=__build_area_where(names, prefix))
+    return query, {**parameters, **area_parameters}
+
+
+# actions of a type reaching the areas, the position is the areas reached
+ACTION_BY_AREA = QueryTemplate(normalize(f'''{placeholder('seed')}
+    match (action:Resource:Action{{type: $type}})
+    with action, {ACTION_AREAS} as areas
+    {placeholder('where')}
+    return {ACTION_RECORD},
+           {{areas: areas}} as position'''))
+
+# work actions of the assemblies localized in the areas, the position is the assembly origin and areas
+# the work actions are joined to the filtered assemblies by their tcp_work result (assembly uid),
+# a seek of the result_state index by assembly instead of an expand of all the tcp_work results
+WORK_BY_AREA = QueryTemplate(normalize(f'''{placeholder('seed')}
+    match (assembly:Product:Assembly)
+    with assembly, {ASSEMBLY_AREAS} as areas
+    where size(areas) > 0 {placeholder('where')}
+    match (:Resource:StateObject{{uid:"tcp_work"}})<-[:RESULT{{state: assembly.uid}}]-(action:Resource:Action{{type:"MOVE.TCP.WORK"}})
+    return {ACTION_RECORD},
+           {{coordinates: {{x:assembly.origin.x,
+                            y:assembly.origin.y,
+                            z:assembly.origin.z}},
+             areas: areas}} as position'''))
+
+# same goals as WORK_BY_AREA, only counted
+COUNT_WORK_BY_AREA = QueryTemplate(normalize(f'''{placeholder('seed')}
+    match (assembly:Product:Assembly)
+    with assembly, {ASSEMBLY_AREAS} as areas
+    where size(areas) > 0 {placeholder('where')}
+    match (:Resource:StateObject{{uid:"tcp_work"}})<-[:RESULT{{state: assembly.uid}}]-(action:Resource:Action{{type:"MOVE.TCP.WORK"}})
+    return count(action) as count'''))
+
+# actions moving a state to the result, from the precondition if defined
+ACTION_BY_STATE_MATCH = '''match (state_object:StateObject{uid: $uid})-[precondition:PRECONDITION]->(action:Action)-[transition:RESULT]->(state_object)
+                           where transition.state = $result'''
+ACTION_BY_STATE = normalize(f'''{ACTION_BY_STATE_MATCH}
+    return {ACTION_RECORD}''')
+ACTION_BY_STATE_FROM = normalize(f'''{ACTION_BY_STATE_MATCH}
+    and ((precondition.relation = "eq" and precondition.state = $precondition)
+         or (precondition.relation = "neq" and precondition.state = $result))
+    return {ACTION_RECORD}''')
+
+
+def build_action_by_state(state_object_definition:Dict) -> Tuple[str, Dict]:
+    parameters = {'uid': state_object_definition['uid'],
+                  'result': state_object_definition['result']}
     precondition = state_object_definition.get('precondition')
+    if precondition:
+        parameters['precondition'] = precondition
+        return ACTION_BY_STATE_FROM, parameters
+    return ACTION_BY_STATE, parameters
 
-    where_and.add(f'state_object.uid = "{uid}"')
-    where_and.add(f'result.state = "{result}"')
+def build_approach_by_area(area_definition:Dict) -> Tuple[str, Dict]:
+    return __render_area_query(ACTION_BY_AREA, 'action', ':Resource:Action{type: $type}', 'TO_REACH',
+                               area_definition, 'where', type='MOVE.TCP.APPROACH')
 
-    if precondition:
-        pre_or = LogicList(LogicOperator.OR)
-        eq_pre_and = LogicList(LogicOperator.AND)
-        neq_pre_and = LogicList(LogicOperator.AND)
-
-        eq_pre_and.add(f'precondition.relation = "eq"')
-        eq_pre_and.add(f'precondition.state = "{precondition}"')
-        neq_pre_and.add(f'precondition.relation = "neq"')
-        neq_pre_and.add(f'precondition.state = "{result}"')
-
-        pre_or.add(eq_pre_and)
-        pre_or.add(neq_pre_and)
-
-        where_and.add(pre_or)
-    
-    return where_and
-
-def build_action_by_state(state_object_definition:Dict):
-    pipeline = DBPipeline()
-    action = DBQuery()
-
-    action.match_clause.add("(state_object:StateObject)-[precondition:PRECONDITION]->(action:Action)-[result:RESULT]->(state_object)")
-    where_clause = __build_state_object_where(state_object_definition)
-    action.where_clause = where_clause
-    action.return_clause.add('action')
-
-    pipeline.add(action)
-    
-    pipeline.add(__build_preconditions())
-    pipeline.add(__build_results())
-    pipeline.add(__build_assets())
-    
-    pipeline.with_clause.add('properties(action)', 'definition')
-    pipeline.with_clause.add('preconditions')
-    pipeline.with_clause.add('results')
-    pipeline.with_clause.add('assets')
-    
-    pipeline.return_clause.add('definition')
-    pipeline.return_clause.add('preconditions')
-    pipeline.return_clause.add('results')
-    pipeline.return_clause.add('assets')
-
-    return pipeline.build()
-
-
-def build_approach_by_area(area_definition:Dict):
-    return __build_appst_by_area('MOVE.TCP.APPROACH', area_definition).build()
-
-def build_station_by_area(area_definition:Dict):
-    return __build_appst_by_area('MOVE.STATION.WORK', area_definition).build()
-
-def build_work_by_area(area_definition:Dict):
-    pipeline = DBPipeline()
+def build_station_by_area(area_definition:Dict) -> Tuple[str, Dict]:
+    return __render_area_query(ACTION_BY_AREA, 'action', ':Resource:Action{type: $type}', 'TO_REACH',
+                               area_definition, 'where', type='MOVE.STATION.WORK')
+
+def build_work_by_area(area_definition:Dict) -> Tuple[str, Dict]:
+    return __render_area_query(WORK_BY_AREA, 'assembly', ':Product:Assembly', 'LOCALIZED_IN', area_definition, 'and')
+
+def build_count_work_by_area(area_definition:Dict) -> Tuple[str, Dict]:
+    return __render_area_query(COUNT_WORK_BY_AREA, 'assembly', ':Product:Assembly', 'LOCALIZED_IN', area_definition, 'and')
+
+
+EXPORT_ACTIONS = normalize(f'''match (action:Resource:Action)
+    return {ACTION_RECORD},
+           {ACTION_AREAS} as areas''')
+
+def build_export_actions():
+    return EXPORT_ACTIONS
+
+def __build_export_assemblies():
     assembly = DBQuery()
-    
-    assembly.match_clause.add(('(assembly:Product:Assembly)-[:LOCALIZED_IN]->(area:Process:Area)'))
-    where_clause = __build_area_where('assembly', 'LOCALIZED_IN', area_definition)
-    assembly.where_clause = where_clause
+
+    assembly.match_clause.add('(assembly:Product:Assembly)-[:LOCALIZED_IN]->(area:Process:Area)')
     assembly.with_clause.add('assembly.uid', 'uid')
-    assembly.with_clause.add('''{coordinates: {x:assembly.origin.x,
-                                               y:assembly.origin.y,
-                                               z:assembly.origin.z},
-                                 areas:collect(
-                                            {reference: area.reference,
-                                             type: area.type,
-                                             uid: area.uid}
-                                         )}''',
-                                'position')
+    assembly.with_clause.add('''{x:assembly.origin.x,
+                                 y:assembly.origin.y,
+                                 z:assembly.origin.z}''', 'origin')
     assembly.with_clause.add('''collect({reference: area.reference,
                               type: area.type,
                               uid: area.uid})''', 'areas')
-    
+
     assembly.return_clause.add('uid')
-    assembly.return_clause.add('position')
+    assembly.return_clause.add('origin')
     assembly.return_clause.add('areas')
-    
-    action = DBQuery()
-    action.input_clause.add('uid')
-    action.match_clause.add('''(action:Resource:Action{type:"MOVE.TCP.WORK"})
-                            -[result:RESULT]->(so:Resource:StateObject{uid:"tcp_work"})''')
-    action.where_clause.add('result.state in uid')
-    action.return_clause.add('action')
-    
-    pipeline.add(assembly)
-    pipeline.add(action)
-    
-    pipeline.add(__build_preconditions())
-    pipeline.add(__build_results())
-    pipeline.add(__build_assets())
-    
-    pipeline.with_clause.add('properties(action)', 'definition')
-    pipeline.with_clause.add('preconditions')
-    pipeline.with_clause.add('results')
-    pipeline.with_clause.add('assets')
-    pipeline.with_clause.add('position')
-    
-    pipeline.return_clause.add('definition')
-    pipeline.return_clause.add('preconditions')
-    pipeline.return_clause.add('results')
-    pipeline.return_clause.add('assets')
-    pipeline.return_clause.add('position')
-    
-    return pipeline.build()
\ No newline at end of file
+
+    return assembly.build()
+
+EXPORT_ASSEMBLIES = __build_export_assemblies()
+
+def build_export_assemblies():
+    return EXPORT_ASSEMBLIES
+
+def build_graph_version():
+    # version marker set by the graph writers (GraphVersion node) if any,
+    # and the nodes and relationships counts, read from the count store, to detect the changes without marker
+    return '''call {optional match (version:GraphVersion) return max(version.version) as marker}
+              call {match (node) return count(node) as nodes}
+              call {match ()-[relation]->() return count(relation) as relations}
+              return marker, nodes, relations'''
@@ -0,0 +1,152 @@
+import glob
+import gzip
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Tuple
+from .exceptions import DBDriverException, DBExceptionType
+
+# record and replay of the database queries
+# a record log is a gzip file of json lines, one line by query run:
+#   first run of a query   {"k": key index, "query": query, "parameters": parameters, "records": records}
+#   next runs              {"k": key index}
+# so each distinct (query, parameters) result is written once
+# each process records in its own log file <pid>.jsonl.gz in the record directory
+# the values are replayed in their json form: temporal values as iso strings, points as coordinates lists
+
+RECORD_EXTENSION = '.jsonl.gz'
+
+
+def query_key(query:str, parameters:Dict) -> Tuple[str, str]:
+  """function to get the key identifying a query run
+  """
+  return query, json.dumps(parameters, sort_keys=True)
+
+
+def record_value(value:Any) -> Any:
+  """function to get the json form of a record value json doesn't serialize
+  the neo4j points and durations are tuples, serialized as lists by json
+
+  Raises:
+      TypeError: raise if the value has no json form
+  """
+  # neo4j temporal values (Date, Time, DateTime) and python ones
+  if hasattr(value, 'iso_format'):
+    return value.iso_format()
+  if hasattr(value, 'isoformat'):
+    return value.isoformat()
+  if isinstance(value, (bytes, bytearray)):
+    return list(value)
+  raise TypeError(f"value of type {type(value).__name__} can't be recorded")
+
+
+class RecordingDriver:
+  """driver running the queries on a database driver and recording the results in a log
+  """
+  def __init__(self, driver:'Neo4jDriver', record_directory:str):
+    os.makedirs(record_directory, exist_ok=True)
+    self._driver = driver
+    self._path = os.path.join(record_directory, f'{os.getpid()}{RECORD_EXTENSION}')
+    self._log = gzip.open(self._path, 'at')
+    self._keys:Dict[Tuple[str, str], int] = {}
+    self._lock = threading.Lock()
+
+  def run(self, query:str, query_type:str=None, **query_args) -> List[Dict]:
+    records = self._driver.run(query, query_type, **query_args)
+
+    key = query_key(query, query_args)
+    with self._lock:
+      index = self._keys.get(key)
+      if index is None:
+        index = len(self._keys)
+        self._keys[key] = index
+        entry = {'k': index, 'query': query, 'parameters': query_args, 'records': records}
+      else:
+        entry = {'k': index}
+      self._log.write(json.dumps(entry, separators=(',', ':'), default=record_value) + '\n')
+
+    return records
+
+  def close(self):
+    with self._lock:
+      self._log.close()
+    self._driver.close()
+
+
+class ReplayDriver:
+  """driver serving the queries from the record logs, without database
+  a query not recorded is reported and raise a DBDriverException
+  """
+  def __init__(self, record_path:str):
+    self._logger = logging.getLogger('sequencer.replay')
+    self._records:Dict[Tuple[str, str], List[Dict]] = {}
+    # number of runs by key during the record and during the replay
+    self._recorded:Dict[Tuple[str, str], int] = {}
+    self._replayed:Dict[Tuple[str, str], int] = {}
+    self._unexpected:Dict[Tuple[str, str], int] = {}
+    self._lock = threading.Lock()
+
+    paths = sorted(glob.glob(os.path.join(record_path, f'*{RECORD_EXTENSION}'))) \
+      if os.path.isdir(record_path) else [record_path]
+    if not paths or not all(os.path.isfile(path) for path in paths):
+      raise DBDriverException(['DB', 'REPLAY', 'LOAD'],
+                              DBExceptionType.CONFIG_ERROR,
+                              f"no record log found at {record_path}")
+
+    for path in paths:
+      self.__load(path)
+
+  def __load(self, path:str):
+    keys = {}
+    try:
+      with gzip.open(path, 'rt') as log:
+        for line in log:
+          entry = json.loads(line)
+          if 'query' in entry:
+            key = query_key(entry['query'], entry['parameters'])
+            keys[entry['k']] = key
+            self._records[key] = entry['records']
+          key = keys[entry['k']]
+          self._recorded[key] = self._recorded.get(key, 0) + 1
+    except (OSError, EOFError, json.JSONDecodeError, KeyError):
+      # log of an interrupted process, the entries read are kept
+      self._logger.warning("record log %s truncated or not conform, %d queries loaded", path, len(keys))
+
+  def run(self, query:str, query_type:str=None, **query_args) -> List[Dict]:
+    key = query_key(query, query_args)
+    records = self._records.get(key)
+
+    with self._lock:
+      if records is None:
+        self._unexpected[key] = self._unexpected.get(key, 0) + 1
+      else:
+        self._replayed[key] = self._replayed.get(key, 0) + 1
+
+    if records is None:
+      self._logger.warning("unexpected query, not in the record logs :\n%s\nparameters : %s", *key)
+      raise DBDriverException(['DB', 'DRIVER', 'REPLAY', 'QUERY'],
+                              DBExceptionType.UNEXPECTED_QUERY,
+                              "query not found in the record logs, the replayed traffic diverges from the recorded one")
+    return records
+
+  def report(self) -> Dict:
+    """function to compare the replayed queries to the recorded ones
+
+    Returns:
+        Dict: number of queries run, replayed, unexpected, recorded and never replayed, and the unexpected queries
+    """
+    with self._lock:
+      return {
+        'recorded': sum(self._recorded.values()),
+        'replayed': sum(self._replayed.values()),
+        'unexpected': sum(self._unexpected.values()),
+        'not_replayed': len(self._records.keys() - self._replayed.keys()),
+        'unexpected_queries': [{'query': query, 'parameters': json.loads(parameters), 'runs': runs}
+                               for (query, parameters), runs in self._unexpected.items()]
+      }
+
+  def close(self):
+    report = self.report()
+    self._logger.info("replay ended : %d queries replayed on %d recorded, %d unexpected, %d recorded never replayed",
+                      report['replayed'], report['recorded'], report['unexpected'], report['not_replayed'])
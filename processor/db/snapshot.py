@@ -0,0 +1,202 @@
+import gzip
+import json
+from collections import defaultdict
+from typing import Dict, List
+from .exceptions import DBDriverException, DBExceptionType
+from .queries import register as qreg
+
+SNAPSHOT_VERSION = 1
+
+WORK_ACTION_TYPE = 'MOVE.TCP.WORK'
+APPROACH_ACTION_TYPE = 'MOVE.TCP.APPROACH'
+STATION_ACTION_TYPE = 'MOVE.STATION.WORK'
+
+
+def in_area(areas:List[Dict], area_definition:Dict) -> bool:
+  """function to check if a list of areas verify an area definition
+  same semantic as the register queries area filter: each defined value (or one of the values for a list)
+  must be in the areas
+
+  Args:
+      areas (List[Dict]): list of areas (reference, type, uid)
+      area_definition (Dict): dict defining the targeted area
+
+  Returns:
+      bool: true if the areas verify the definition
+  """
+  uids = set(area['uid'] for area in areas)
+  for value in area_definition.values():
+    if value == 'all':
+      continue
+    values = value if type(value) == list else [value]
+    if not uids.intersection(values):
+      return False
+  return True
+
+
+class GraphSnapshot:
+  """in memory copy of the Action/StateObject/Asset/Area/Assembly graph
+  the actions are indexed to answer the register queries without database
+
+  snapshot format:
+    {
+      "version": 1,
+      "actions": [{definition, preconditions, results, assets, areas}],
+      "assemblies": [{uid, origin, areas}]
+    }
+  """
+  def __init__(self, actions:List[Dict], assemblies:List[Dict]):
+    self._actions = actions
+    self._assemblies = assemblies
+
+    # actions by type
+    self._by_type:Dict[str, List[Dict]] = defaultdict(list)
+    # actions by state evolution (stateobject uid, result)
+    self._by_result:Dict[tuple, List[Dict]] = defaultdict(list)
+    # work actions by tcp_work result (assembly uid)
+    self._work_by_assembly:Dict[str, List[Dict]] = defaultdict(list)
+
+    for action in actions:
+      action_type = action['definition']['type']
+      self._by_type[action_type].append(action)
+      for result in action['results']:
+        uid = result['definition']['uid']
+        self._by_result[(uid, result['state'])].append(action)
+        if action_type == WORK_ACTION_TYPE and uid == 'tcp_work':
+          self._work_by_assembly[result['state']].append(action)
+
+  @property
+  def actions(self) -> List[Dict]:
+    return self._actions
+
+  @property
+  def assemblies(self) -> List[Dict]:
+    return self._assemblies
+
+  @staticmethod
+  def __record(action:Dict, position:Dict=None) -> Dict:
+    # same keys as the register queries records
+    record = {'definition': action['definition'],
+              'preconditions': action['preconditions'],
+              'results': action['results'],
+              'assets': action['assets']}
+    if position is not None:
+      record['position'] = position
+    return record
+
+  def work_by_area(self, area_definition:Dict) -> List[Dict]:
+    """function to get the work actions on the assemblies localized in the area
+    """
+    records = []
+    for assembly in self._assemblies:
+      if in_area(assembly['areas'], area_definition):
+        position = {'coordinates': assembly['origin'],
+                    'areas': assembly['areas']}
+        records.extend(GraphSnapshot.__record(action, position)
+                       for action in self._work_by_assembly[assembly['uid']])
+    return records
+
+  def count_work_by_area(self, area_definition:Dict) -> int:
+    """function to count the work actions on the assemblies localized in the area
+    """
+    return sum(len(self._work_by_assembly[assembly['uid']])
+               for assembly in self._assemblies if in_area(assembly['areas'], area_definition))
+
+  def actions_by_area(self, action_type:str, area_definition:Dict) -> List[Dict]:
+    """function to get the actions of a type reaching the area
+    """
+    return [GraphSnapshot.__record(action, {'areas': action['areas']})
+            for action in self._by_type[action_type]
+            if in_area(action['areas'], area_definition)]
+
+  def action_by_state(self, state_definition:Dict) -> List[Dict]:
+    """function to get the actions to move a state from the precondition to the result
+    """
+    uid = state_definition['uid']
+    result = state_definition['result']
+    precondition = state_definition.get('precondition')
+
+    records = []
+    for action in self._by_result[(uid, result)]:
+      preconditions = [p for p in action['preconditions'] if p['definition']['uid'] == uid]
+      # the action must have a precondition on the state
+      if not preconditions:
+        continue
+      # eq to the precondition or neq to the result
+      if precondition and not any((p['relation'] == 'eq' and p['state'] == precondition)
+                                  or (p['relation'] == 'neq' and p['state'] == result)
+                                  for p in preconditions):
+        continue
+      records.append(GraphSnapshot.__record(action))
+    return records
+
+  def to_dict(self) -> Dict:
+    return {
+      'version': SNAPSHOT_VERSION,
+      'actions': self._actions,
+      'assemblies': self._assemblies
+    }
+
+  @staticmethod
+  def from_dict(snapshot:Dict) -> 'GraphSnapshot':
+    try:
+      if snapshot['version'] != SNAPSHOT_VERSION:
+        raise DBDriverException(['DB', 'SNAPSHOT', 'PARSING'],
+                                DBExceptionType.CONFIG_ERROR,
+                                f"graph snapshot version {snapshot['version']} not supported, export it again")
+      return GraphSnapshot(snapshot['actions'], snapshot['assemblies'])
+    except KeyError as error:
+      raise DBDriverException(['DB', 'SNAPSHOT', 'PARSING'],
+                              DBExceptionType.MISSING_ELEMENT,
+                              f"graph snapshot not conform, {error.args[0]} parameter is missing")
+
+  @staticmethod
+  def load(path:str) -> 'GraphSnapshot':
+    """function to load a snapshot file, compressed with gzip if the extension is .gz
+
+    Args:
+        path (str): snapshot file path
+
+    Raises:
+        DBDriverException: raise if the file not exist or is not conform
+
+    Returns:
+        GraphSnapshot: the loaded snapshot
+    """
+    try:
+      open_function = gzip.open if path.endswith('.gz') else open
+      with open_function(path, 'rt') as snapshot_file:
+        snapshot = json.load(snapshot_file)
+      return GraphSnapshot.from_dict(snapshot)
+    except FileNotFoundError as error:
+      raise DBDriverException(['DB', 'SNAPSHOT', 'LOAD'],
+                              DBExceptionType.CONFIG_ERROR,
+                              f"no such graph snapshot file {error.filename}")
+    except json.JSONDecodeError as error:
+      raise DBDriverException(['DB', 'SNAPSHOT', 'LOAD'],
+                              DBExceptionType.CONFIG_ERROR,
+                              f"graph snapshot file {path} not conform : json format not respected")
+
+  def save(self, path:str):
+    """function to save the snapshot in a file, compressed with gzip if the extension is .gz
+
+    Args:
+        path (str): snapshot file path
+    """
+    open_function = gzip.open if path.endswith('.gz') else open
+    with open_function(path, 'wt') as snapshot_file:
+      json.dump(self.to_dict(), snapshot_file)
+
+
+def export_snapshot(driver:'Neo4jDriver') -> GraphSnapshot:
+  """function to export the graph from the database
+
+  Args:
+      driver (Neo4jDriver): database driver
+
+  Returns:
+      GraphSnapshot: snapshot of the graph
+  """
+  actions = driver.run(qreg.build_export_actions())
+  assemblies = driver.run(qreg.build_export_assemblies())
+  return GraphSnapshot(actions, assemblies)
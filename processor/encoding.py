@@ -0,0 +1,215 @@
+import gzip
+import json
+import zlib
+from typing import Dict, List, Tuple, Union
+from .exceptions import ProcessException, ProcessExceptionType
+from .metrics import STAGE_SECONDS
+
+# msgpack is optional, only required for the msgpack content types
+try:
+  import msgpack
+except ImportError:
+  msgpack = None
+
+JSON_CONTENT_TYPE = 'application/json'
+COMPACT_JSON_CONTENT_TYPE = 'application/vnd.mars.compact+json'
+COMPACT_MSGPACK_CONTENT_TYPE = 'application/vnd.mars.compact+msgpack'
+
+# compression functions by content encoding
+COMPRESSIONS = {
+  'gzip': gzip.compress,
+  'deflate': zlib.compress
+}
+
+
+def compact_sequence(json_sequence:List[Dict]) -> Dict:
+  """function to transform a sequence of action definition to its compact form
+  each asset and each action definition is sent once, the sequence refers to them by index
+
+  Args:
+      json_sequence (List[Dict]): sequence of action definition
+
+  Returns:
+      Dict: compact sequence with assets, actions and sequence keys
+  """
+  assets = []
+  asset_indexes = {}
+  actions = []
+  action_indexes = {}
+  sequence = []
+
+  for action in json_sequence:
+    action_index = action_indexes.get(action['uid'])
+
+    if action_index is None:
+      action_assets = []
+      for asset in action['assets']:
+        asset_index = asset_indexes.get(asset['uid'])
+        if asset_index is None:
+          asset_index = len(assets)
+          asset_indexes[asset['uid']] = asset_index
+          assets.append(asset)
+        action_assets.append(asset_index)
+
+      action_index = len(actions)
+      action_indexes[action['uid']] = action_index
+      actions.append([action['uid'],
+                      action['description'],
+                      action['type'],
+                      action_assets])
+
+    sequence.append(action_index)
+
+  return {
+    'assets': assets,
+    'actions': actions,
+    'sequence': sequence
+  }
+
+
+def expand_sequence(compact:Dict) -> List[Dict]:
+  """function to transform a compact sequence to the sequence of action definition
+
+  Args:
+      compact (Dict): compact sequence
+
+  Returns:
+      List[Dict]: sequence of action definition
+  """
+  assets = compact['assets']
+  actions = [{'uid': uid,
+              'description': description,
+              'type': type,
+              'assets': [assets[i] for i in asset_indexes]}
+             for uid, description, type, asset_indexes in compact['actions']]
+  return [actions[i] for i in compact['sequence']]
+
+
+def parse_qualities(header:str) -> Dict[str, float]:
+  """function to parse an accept or accept-encoding header, the media types or codings with their quality
+  a value without q parameter has the quality 1, a value with an invalid quality is ignored
+
+  Args:
+      header (str): header value, e.g. "application/json;q=0.5, */*;q=0.1"
+
+  Returns:
+      Dict[str, float]: the quality by media type or coding, lowercase without parameters
+  """
+  qualities = {}
+  for item in (header or '').split(','):
+    value, *parameters = item.split(';')
+    value = value.strip().lower()
+    if not value:
+      continue
+    quality = 1.0
+    for parameter in parameters:
+      name, _, parameter_value = parameter.partition('=')
+      if name.strip().lower() == 'q':
+        try:
+          quality = float(parameter_value.strip())
+        except ValueError:
+          quality = None
+    if quality is not None and 0 <= quality <= 1:
+      qualities[value] = quality
+  return qualities
+
+
+def negotiate(headers:Dict) -> Tuple[str, str]:
+  """function to get the response content type and encoding from the request headers
+  the accepted value of highest quality is chosen, the compact types and the compressions on a tie,
+  a value of quality 0 is never chosen. the compact types are sent only if they are named in the accept header,
+  json is sent if no type is accepted
+
+  Args:
+      headers (Dict): request headers, accept and accept-encoding keys are read
+
+  Returns:
+      Tuple[str, str]: the content type and the content encoding (None if no compression)
+  """
+  headers = {key.lower():value for key, value in headers.items()} if headers else {}
+
+  accept = parse_qualities(headers.get('accept'))
+  json_quality = accept.get(JSON_CONTENT_TYPE, accept.get('application/*', accept.get('*/*', 0)))
+  content_type, quality = JSON_CONTENT_TYPE, json_quality
+  for accepted in (COMPACT_JSON_CONTENT_TYPE, COMPACT_MSGPACK_CONTENT_TYPE):
+    if accept.get(accepted, 0) > 0 and accept[accepted] >= quality:
+      content_type, quality = accepted, accept[accepted]
+
+  accept_encoding = parse_qualities(headers.get('accept-encoding'))
+  content_encoding, quality = None, 0
+  for encoding in reversed(COMPRESSIONS.keys()):
+    encoding_quality = accept_encoding.get(encoding, accept_encoding.get('*', 0))
+    if encoding_quality > 0 and encoding_quality >= quality:
+      content_encoding, quality = encoding, encoding_quality
+  # no compression if the identity is preferred
+  if content_encoding and accept_encoding.get('identity', 0) > quality:
+    content_encoding = None
+
+  return content_type, content_encoding
+
+
+def encode_body(body:Dict,
+                content_type:str,
+                content_encoding:str=None) -> Union[Dict, bytes]:
+  """function to encode a response body in the negotiated format
+  the sequences (buildProcess and buildProcesses keys) are compacted for the compact content types
+
+  Args:
+      body (Dict): response body
+      content_type (str): negotiated content type
+      content_encoding (str, optional): negotiated compression. Defaults to None.
+
+  Raises:
+      ProcessException: raise if the content type requires an uninstalled package
+
+  Returns:
+      Dict|bytes: the body unchanged if no specific encoding, else the serialized body
+  """
+  if content_type == JSON_CONTENT_TYPE and not content_encoding:
+    return body
+
+  if content_type != JSON_CONTENT_TYPE:
+    body = body.copy()
+    if 'buildProcess' in body:
+      body['buildProcess'] = compact_sequence(body['buildProcess'])
+    if 'buildProcesses' in body:
+      body['buildProcesses'] = [compact_sequence(sequence) for sequence in body['buildProcesses']]
+
+  if content_type == COMPACT_MSGPACK_CONTENT_TYPE:
+    if not msgpack:
+      raise ProcessException(['PROCESS', 'ENCODING'],
+                             ProcessExceptionType.ENCODING_ERROR,
+                             "msgpack encoding requested but the msgpack package is not installed")
+    payload = msgpack.packb(body)
+  else:
+    payload = json.dumps(body, separators=(',', ':')).encode('utf-8')
+
+  if content_encoding:
+    payload = COMPRESSIONS[content_encoding](payload)
+
+  return payload
+
+
+def encode_response(body:Dict, headers:Dict) -> Tuple[Union[Dict, bytes], Dict]:
+  """function to encode a response according the request headers
+
+  Args:
+      body (Dict): response body
+      headers (Dict): request headers
+
+  Returns:
+      Tuple[Dict|bytes, Dict]: the encoded body and the headers updated with the content type and encoding
+  """
+  content_type, content_encoding = negotiate(headers)
+  with STAGE_SECONDS.time(stage='encoding'):
+    payload = encode_body(body, content_type, content_encoding)
+
+  if payload is body:
+    return body, headers
+
+  headers = headers.copy() if headers else {}
+  headers['content-type'] = content_type
+  if content_encoding:
+    headers['content-encoding'] = content_encoding
+
+  return payload, headers
@@ -3,10 +3,24 @@ from typing import List
 
 class ProcessExceptionType(ExceptionType):
   SOLVER_ERROR = "PROCESS_SOLVER_ERROR"
+  UNKNOWN_SEQUENCE = "PROCESS_UNKNOWN_SEQUENCE"
+  ENCODING_ERROR = "PROCESS_ENCODING_ERROR"
+  MEMORY_BUDGET_EXCEEDED = "PROCESS_MEMORY_BUDGET_EXCEEDED"
+  BUSY = "PROCESS_BUSY"
 
 
 class ProcessException(BaseException):
   def __init__(self, origin_stack:List[str], type:ProcessExceptionType, description:str):
     super().__init__(origin_stack,
                      type,
-                     description)
\ No newline at end of file
+                     description)
+
+
+class BusyException(ProcessException):
+  """request refused by the admission control, to retry after a delay in seconds
+  """
+  def __init__(self, origin_stack:List[str], description:str, retry_after:int):
+    super().__init__(origin_stack,
+                     ProcessExceptionType.BUSY,
+                     description)
+    self.retry_after = retry_after
\ No newline at end of file
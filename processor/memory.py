@@ -0,0 +1,102 @@
+import logging
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict
+from .exceptions import ProcessException, ProcessExceptionType
+from .metrics import STAGE_PEAK_BYTES
+
+REJECT_POLICY = 'reject'
+DOWNGRADE_POLICY = 'downgrade'
+
+
+class MemoryBudget:
+  """memory budget of a request, the memory used is estimated from the number of goals
+  before the goals are got from the database
+  """
+  def __init__(self, budget:int, bytes_per_goal:int, policy:str=REJECT_POLICY):
+    """
+    Args:
+        budget (int): memory budget of a request in bytes
+        bytes_per_goal (int): estimated memory used by goal (records, actions, sequence)
+        policy (str, optional): reject or downgrade the requests over the budget. Defaults to reject.
+    """
+    self.budget = budget
+    self.bytes_per_goal = bytes_per_goal
+    self.policy = policy
+    self._logger = logging.getLogger('sequencer.memory')
+
+  def estimate(self, goal_number:int) -> int:
+    return goal_number * self.bytes_per_goal
+
+  def check(self, goal_number:int) -> bool:
+    """function to check if a request is in the budget
+
+    Args:
+        goal_number (int): number of goals of the request
+
+    Raises:
+        ProcessException: raise if the request is over the budget with the reject policy
+
+    Returns:
+        bool: true if the request is in the budget, false if it must be downgraded
+    """
+    estimate = self.estimate(goal_number)
+    if estimate <= self.budget:
+      return True
+
+    description = f"{goal_number} goals, {estimate/2**20:.0f}MiB estimated for a budget of {self.budget/2**20:.0f}MiB"
+    if self.policy == REJECT_POLICY:
+      raise ProcessException(['PROCESS', 'MEMORY'],
+                             ProcessExceptionType.MEMORY_BUDGET_EXCEEDED,
+                             f"request over the memory budget: {description}, reduce the requested area")
+
+    self._logger.warning("request over the memory budget, downgraded: %s", description)
+    return False
+
+
+class MemoryAccounting:
+  """memory allocated by stage of a request, measured with tracemalloc
+  the tracing must be started (tracemalloc.start) else nothing is measured
+  the measures are global to the process, they include the allocations of the concurrent requests
+  """
+  def __init__(self, top:int=5):
+    # number of allocation sites reported by stage
+    self._top = top
+    self.stages:Dict[str, Dict] = {}
+
+  @contextmanager
+  def stage(self, name:str):
+    if not tracemalloc.is_tracing():
+      yield
+      return
+
+    start, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    snapshot = tracemalloc.take_snapshot() if self._top else None
+    try:
+      yield
+    finally:
+      current, peak = tracemalloc.get_traced_memory()
+      sites = []
+      if snapshot:
+        statistics = tracemalloc.take_snapshot().compare_to(snapshot, 'lineno')
+        sites = [{'site': str(statistic.traceback[0]), 'size': statistic.size_diff, 'count': statistic.count_diff}
+                 for statistic in statistics[:self._top]]
+      self.stages[name] = {'peak': peak - start,
+                           'allocated': current - start,
+                           'sites': sites}
+      STAGE_PEAK_BYTES.observe(peak - start, stage=name)
+
+  def report(self) -> Dict:
+    return self.stages
+
+
+@contextmanager
+def account(accounting:MemoryAccounting, name:str):
+  """context manager measuring a stage if the accounting is defined
+  """
+  if accounting is None:
+    yield
+  else:
+    with accounting.stage(name):
+      yield
@@ -0,0 +1,180 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+# process metrics, exposed in the prometheus text format and as a report message
+# the metrics of the segment solving worker processes are not collected
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def format_labels(label_names:Tuple[str], label_values:Tuple[str], extra:str=None) -> str:
+  labels = [f'{name}="{value}"' for name, value in zip(label_names, label_values)]
+  if extra:
+    labels.append(extra)
+  return '{' + ','.join(labels) + '}' if labels else ''
+
+
+class Counter:
+  """monotonic counter, one value by labels values
+  """
+  type = 'counter'
+
+  def __init__(self, name:str, description:str, labels:List[str]=None):
+    self.name = name
+    self.description = description
+    self.labels = tuple(labels) if labels else ()
+    self._values:Dict[Tuple[str], float] = {}
+    self._lock = threading.Lock()
+
+  def inc(self, value:float=1, **labels):
+    key = tuple(str(labels[name]) for name in self.labels)
+    with self._lock:
+      self._values[key] = self._values.get(key, 0) + value
+
+  def value(self, **labels) -> float:
+    return self._values.get(tuple(str(labels[name]) for name in self.labels), 0)
+
+  def samples(self) -> Iterator[Tuple[str, str, float]]:
+    with self._lock:
+      values = list(self._values.items())
+    for key, value in values:
+      yield self.name, format_labels(self.labels, key), value
+
+  def report(self) -> Dict:
+    with self._lock:
+      return {','.join(key) or 'all': value for key, value in self._values.items()}
+
+
+class Histogram:
+  """distribution of observed values (durations in seconds) in cumulative buckets, by labels values
+  """
+  type = 'histogram'
+
+  def __init__(self, name:str, description:str, labels:List[str]=None, buckets:Tuple[float]=DEFAULT_BUCKETS):
+    self.name = name
+    self.description = description
+    self.labels = tuple(labels) if labels else ()
+    self.buckets = tuple(sorted(buckets))
+    # by labels values : count by bucket (last one is +Inf), sum
+    self._values:Dict[Tuple[str], Tuple[List[int], List[float]]] = {}
+    self._lock = threading.Lock()
+
+  def observe(self, value:float, **labels):
+    key = tuple(str(labels[name]) for name in self.labels)
+    index = bisect_left(self.buckets, value)
+    with self._lock:
+      counts, total = self._values.setdefault(key, ([0]*(len(self.buckets)+1), [0.0]))
+      counts[index] += 1
+      total[0] += value
+
+  @contextmanager
+  def time(self, **labels):
+    """context manager observing the duration of its block
+    """
+    tb = time.perf_counter()
+    try:
+      yield
+    finally:
+      self.observe(time.perf_counter() - tb, **labels)
+
+  def samples(self) -> Iterator[Tuple[str, str, float]]:
+    with self._lock:
+      values = [(key, list(counts), total[0]) for key, (counts, total) in self._values.items()]
+    for key, counts, total in values:
+      cumulated = 0
+      for bound, count in zip(self.buckets + (float('inf'),), counts):
+        cumulated += count
+        le = '+Inf' if bound == float('inf') else repr(bound)
+        yield f'{self.name}_bucket', format_labels(self.labels, key, f'le="{le}"'), cumulated
+      yield f'{self.name}_sum', format_labels(self.labels, key), total
+      yield f'{self.name}_count', format_labels(self.labels, key), cumulated
+
+  def report(self) -> Dict:
+    with self._lock:
+      return {','.join(key) or 'all': {'count': sum(counts),
+                                       'sum': round(total[0], 6),
+                                       'mean': round(total[0]/sum(counts), 6)}
+              for key, (counts, total) in self._values.items()}
+
+
+class Registry:
+  """set of metrics of the process
+  """
+  def __init__(self):
+    self._metrics:Dict[str, object] = {}
+
+  def counter(self, name:str, description:str, labels:List[str]=None) -> Counter:
+    return self._metrics.setdefault(name, Counter(name, description, labels))
+
+  def histogram(self, name:str, description:str, labels:List[str]=None,
+                buckets:Tuple[float]=DEFAULT_BUCKETS) -> Histogram:
+    return self._metrics.setdefault(name, Histogram(name, description, labels, buckets))
+
+  def render(self) -> str:
+    """function to render the metrics in the prometheus text format (version 0.0.4)
+    """
+    lines = []
+    for metric in self._metrics.values():
+      lines.append(f'# HELP {metric.name} {metric.description}')
+      lines.append(f'# TYPE {metric.name} {metric.type}')
+      for name, labels, value in metric.samples():
+        lines.append(f'{name}{labels} {value}')
+    return '\n'.join(lines) + '\n'
+
+  def report(self) -> Dict:
+    """function to get the metrics values as a dict, for the report messages
+    """
+    return {name: metric.report() for name, metric in self._metrics.items()}
+
+
+REGISTRY = Registry()
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+STAGE_SECONDS = REGISTRY.histogram('mars_stage_seconds',
+                                   'duration of the sequence building stages',
+                                   ['stage'])
+DB_QUERY_SECONDS = REGISTRY.histogram('mars_db_query_seconds',
+                                      'duration of the database queries by query type',
+                                      ['query'])
+DB_LOOKUPS = REGISTRY.counter('mars_db_lookups_total',
+                              'number of database queries by query type',
+                              ['query'])
+CACHE_REQUESTS = REGISTRY.counter('mars_cache_requests_total',
+                                  'number of cache requests by cache and result (hit or miss)',
+                                  ['cache', 'result'])
+SOLVER_ITERATIONS = REGISTRY.counter('mars_solver_iterations_total',
+                                     'number of solver iterations (goal checked)')
+SOLVER_EXPANSIONS = REGISTRY.counter('mars_solver_expansions_total',
+                                     'number of actions expanded by the solver, by search (precondition or extended)',
+                                     ['search'])
+NEO4J_AVAILABLE_SECONDS = REGISTRY.histogram('mars_neo4j_result_available_seconds',
+                                             'neo4j time until the first record is available, by query type',
+                                             ['query'])
+NEO4J_CONSUMED_SECONDS = REGISTRY.histogram('mars_neo4j_result_consumed_seconds',
+                                            'neo4j time to consume the records, by query type',
+                                            ['query'])
+NEO4J_RECORDS = REGISTRY.counter('mars_neo4j_records_total',
+                                 'number of records returned by neo4j, by query type',
+                                 ['query'])
+STAGE_PEAK_BYTES = REGISTRY.histogram('mars_stage_peak_bytes',
+                                      'peak of memory allocated by stage, measured if the memory accounting is enabled',
+                                      ['stage'],
+                                      buckets=tuple(2**n for n in range(20, 34)))
+ADMISSIONS = REGISTRY.counter('mars_admissions_total',
+                              'number of requests by admission lane and result (admitted, refused or timeout)',
+                              ['lane', 'result'])
+ADMISSION_WAIT_SECONDS = REGISTRY.histogram('mars_admission_wait_seconds',
+                                            'time waited in queue by the admitted requests, by admission lane',
+                                            ['lane'])
+COALESCED_REQUESTS = REGISTRY.counter('mars_coalesced_requests_total',
+                                     'number of coalesced build requests by result (computed or shared with a request in flight)',
+                                     ['result'])
+GRAPH_VERSION_CHANGES = REGISTRY.counter('mars_graph_version_changes_total',
+                                        'number of graph changes detected')
+REQUESTS = REGISTRY.counter('mars_requests_total',
+                            'number of requests by handler',
+                            ['handler'])
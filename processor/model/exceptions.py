@@ -4,6 +4,7 @@ from typing import List
 
 class ModelExceptionType(ExceptionType):
     PARSING_ERROR = "MODEL_PARSING_ERROR"
+    MISSING_POSITION = "MODEL_MISSING_POSITION"
 
 
 class ModelException(BaseException):
@@ -37,89 +37,112 @@ class Asset:
             print('Error not handled raise during StateObject parsing')
             raise e
 
+    @staticmethod
+    def json_from_dict(asset_dict:Dict) -> Dict:
+        """function to get the serialised asset directly from the database record, without Asset object
+        the solver never reads the assets, they are only serialised
+        """
+        definition = asset_dict['definition']
+        try:
+            return {
+                'uid': definition['uid'],
+                'description': definition['description'],
+                'interface': definition['interface']
+            }
+        except KeyError as error:
+            raise ModelException(['ASSET', 'PARSING'],
+                                 ModelExceptionType.PARSING_ERROR,
+                                f"one asset parameters is missing in the asset description, check your database.\nmissing parameter :{error.args[0]}\nasset uid: {definition.get('uid')}" )
+
+# keys of an action record which are not metadata
+ACTION_KEYS = ('definition', 'preconditions', 'results', 'assets')
+
 class Action:
-    def __init__(self, uid:str,
-                 description:str,
-                 type:str,
-                 assets:List[Asset],
-                 preconditions:Situation,
-                 results:List[StateObject],
-                 metadata:Dict):
+    """action parsed from a database record
+    the definition is read at creation, the preconditions, results and assets are parsed
+    from the record on first access and the metadata read from it, many goals are only scored and serialised
+    """
+    def __init__(self, record:Dict):
+        definition = record['definition']
+        self._record = record
+        self._uid = definition['uid']
+        self._description = definition['description']
+        self._type = definition['type']
+        # parsed on first access
+        self._preconditions:Situation = None
+        self._results:List[StateObject] = None
+        self._assets:List[Dict] = None
 
-        self._uid = uid
-        self._description=description
-        self._type = type
-        self._assets = assets
-        self._preconditions=preconditions
-        self._results = results
-        self._metadata = metadata
+    @property
+    def uid(self):
+        return self._uid
 
     @property
     def description(self):
         return self._description
     
     @property
-    def preconditions(self):
+    def preconditions(self) -> Situation:
+        if self._preconditions is None:
+            self._preconditions = self.__parse(Situation.from_list, self._record['preconditions'])
         return self._preconditions
     
     @property
-    def results(self):
+    def results(self) -> List[StateObject]:
+        if self._results is None:
+            self._results = self.__parse(lambda results: [StateObject.from_dict(result) for result in results],
+                                         self._record['results'])
         return self._results
     
     @property
     def type(self):
         return self._type
 
+    @property
+    def assets(self) -> List[Dict]:
+        """serialised assets of the action
+        """
+        if self._assets is None:
+            self._assets = self.__parse(lambda assets: [Asset.json_from_dict(asset) for asset in assets],
+                                        self._record['assets'])
+        return self._assets
+
     def get_metadata(self, key):
-        return self._metadata.get(key)
+        if key in ACTION_KEYS:
+            return None
+        return self._record.get(key)
 
     @property
     def effect(self) -> Situation:
-        effect = self._preconditions.copy()
-        for result in self._results:
+        effect = self.preconditions.copy()
+        for result in self.results:
             effect.update(result)
         return effect
-        
-    @staticmethod
-    def from_dict(action_dict:Dict) -> 'Action':
-        definition = action_dict['definition']
-        preconditions = action_dict['preconditions']
-        results = action_dict['results']
-        assets = action_dict['assets']
-            
-        uid = definition['uid']
-        description = definition['description']
-        type = definition['type']
-        
-        meta_keys = [key for key in action_dict.keys() \
-                    if not key in ['definition', 'preconditions', 'results', 'assets']]
-        
-        metadata = {}
-        for key in meta_keys:
-            metadata[key] = action_dict[key]
 
+    @staticmethod
+    def __parse(parser, value):
+        # the parsing errors are raised on first access, with the action in the stack
         try:
-            assets = [Asset.from_dict(asset) for asset in assets]
-            preconditions = Situation.from_list(preconditions)
-            results = [StateObject.from_dict(result) for result in results]
-            return Action(uid,
-                    description,
-                    type,
-                    assets,
-                    preconditions,
-                    results,
-                    metadata)
-
+            return parser(value)
         except ModelException as error:
             error.add_in_stack(['ACTION'])
             raise error
+        
+    @staticmethod
+    def from_dict(action_dict:Dict) -> 'Action':
+        for key in ACTION_KEYS:
+            if not key in action_dict:
+                raise ModelException(['ACTION', 'PARSING'],
+                                     ModelExceptionType.PARSING_ERROR,
+                                     f"one action parameter is missing in the action record, check your database.\nmissing parameter :{key}")
+        return Action(action_dict)
     
     def to_dict(self):
         return {
             'uid': self._uid,
             'description': self._description,
             'type': self._type,
-            'assets':[asset.to_json() for asset in self._assets]
+            'assets': list(self.assets)
         }
 
     def __repr__(self) -> str:
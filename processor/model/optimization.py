@@ -1,5 +1,5 @@
 
-from typing import List
+from typing import Dict, List
 from .marsnode import Action
 import re
 
@@ -18,19 +18,27 @@ ACTION_TYPE_CODE = {
 PROBE_SCHEMA = '(TE){0,1}SAPC'
 REPETITIVE_LU_TOOL_SCHEMA = 'TEETEE'
 
-def __delete_recursive_lu_tool(sequence:List[Action]):
+def __delete_recursive_lu_tool(sequence:List[Action]) -> List[Dict]:
+  # return the removed subsequences with their index in the sequence once cleaned
   str_code_sequence = ''.join([ACTION_TYPE_CODE[action.type] for action in sequence])
-  rep_lu_tool_it = re.finditer(REPETITIVE_LU_TOOL_SCHEMA, str_code_sequence)
+  matches = list(re.finditer(REPETITIVE_LU_TOOL_SCHEMA, str_code_sequence))
 
-  for match in rep_lu_tool_it:
-    # get the begin index
-    begin = match.start()
-    end = match.end()
+  removed = []
+  # the actions removed before a match shift its index in the cleaned sequence
+  shift = 0
+  for match in matches:
+    removed.append({'removed': [action.uid for action in sequence[match.start():match.end()]],
+                    'at': match.start() - shift})
+    shift += match.end() - match.start()
+
+  # delete from the end, so the indexes of the next matches are unchanged
+  for match in reversed(matches):
+    del sequence[match.start():match.end()]
 
-    del sequence[begin:end]
+  return removed
 
 
-def __move_sequence_by_schema(schema:str, sequence:List[Action], to_index:int):
+def __move_sequence_by_schema(schema:str, sequence:List[Action], to_index:int, moves:List[Dict]=None):
   # empty list to store elements found using schema
   found_sequence = []
   # empty list tot store other elements
@@ -56,17 +64,29 @@ def __move_sequence_by_schema(schema:str, sequence:List[Action], to_index:int):
 
     # get the end index
     end = match.end()
+    # keep the moved subsequence for the explain trace
+    if moves is not None:
+      moves.append({'moved': [action.uid for action in sequence[begin:end]],
+                    'from': begin,
+                    'to': to_index + len(found_sequence)})
     # put the sublist begin new match -> end new match in found
     found_sequence.extend(sequence[begin:end])
   
   other_sequence.extend(sequence[end:])
 
   # 
-  __delete_recursive_lu_tool(other_sequence)
+  removed = __delete_recursive_lu_tool(other_sequence)
+  # index of the removed subsequences in the returned sequence, after the found elements insertion
+  if moves is not None:
+    for removal in removed:
+      if removal['at'] >= to_index:
+        removal['at'] += len(found_sequence)
+      moves.append(removal)
   
   # return a sequence with found element inerted at the wanted index
   return other_sequence[:to_index]+found_sequence+other_sequence[to_index:]
 
 
-def begin_with_probing(sequence:List[Action]):
-  return __move_sequence_by_schema(PROBE_SCHEMA, sequence, to_index=0)
+def begin_with_probing(sequence:List[Action], moves:List[Dict]=None):
+  # moves: if defined, filled with the moved and removed subsequences
+  return __move_sequence_by_schema(PROBE_SCHEMA, sequence, to_index=0, moves=moves)
@@ -0,0 +1,135 @@
+from typing import Dict, List, Optional
+from .exceptions import ModelException, ModelExceptionType
+from .marsnode import Action
+from .scoring import AIRCRAFT_RAIL_ORDER
+
+
+def get_aircraft_rail(action:Action) -> Optional[str]:
+  """function to get the aircraft rail targeted by an action
+
+  Args:
+      action (Action): action with a position metadata
+
+  Raises:
+      ModelException: raise if the action has no position
+
+  Returns:
+      Optional[str]: the aircraft rail uid or None if the action position has no rail
+  """
+  position = action.get_metadata('position')
+  if not position :
+    raise ModelException(['PARTITION', 'RAIL'],
+                         ModelExceptionType.MISSING_POSITION,
+                         f"no position at disposal for action {action.uid}, the action rail is unknown")
+
+  for area in position['areas']:
+    if area['reference'] == 'aircraft' and area['type'] == 'rail':
+      return area['uid']
+
+
+def group_by_rail(action_list:List[Action]) -> Dict[Optional[str], List[Action]]:
+  """function to group a list of actions by aircraft rail
+  the actions order is kept in each group, the actions without rail (or on a rail not in AIRCRAFT_RAIL_ORDER)
+  are grouped after the aircraft rails, the actions without rail in a group of key None
+
+  Args:
+      action_list (List[Action]): list of actions (sorted)
+
+  Returns:
+      Dict[Optional[str], List[Action]]: actions by rail, ordered according AIRCRAFT_RAIL_ORDER
+  """
+  groups = {rail:[] for rail in AIRCRAFT_RAIL_ORDER}
+  for action in action_list:
+    groups.setdefault(get_aircraft_rail(action), []).append(action)
+
+  return {rail:actions for rail, actions in groups.items() if actions}
+
+
+def split_by_rail(action_list:List[Action]) -> List[List[Action]]:
+  """function to split a list of actions at each aircraft rail change
+  the concatenation of the segments is the initial list
+
+  Args:
+      action_list (List[Action]): list of actions sorted by position
+
+  Returns:
+      List[List[Action]]: list of segments, each segment targets only one rail
+  """
+  segments = []
+  current_rail = None
+  for action in action_list:
+    rail = get_aircraft_rail(action)
+    if not segments or rail != current_rail:
+      segments.append([])
+      current_rail = rail
+    segments[-1].append(action)
+
+  return segments
+
+
+def __balance_blocks(sizes:List[int], partition_number:int) -> List[int]:
+  """function to split a list of blocks in contiguous partitions
+  minimizing the size of the biggest partition (linear partition problem),
+  on equality the partitions with the closest sizes are preferred
+
+  Args:
+      sizes (List[int]): size of each block
+      partition_number (int): number of partitions
+
+  Returns:
+      List[int]: the index of the first block of each partition
+  """
+  block_number = len(sizes)
+  # cumulated sizes to get a partition size in constant time
+  cumul = [0]
+  for size in sizes:
+    cumul.append(cumul[-1] + size)
+
+  # cost[k][i] : best (max partition size, sum of squared sizes) to place the i first blocks in k partitions
+  infinite = (float('inf'), float('inf'))
+  cost = [[infinite]*(block_number+1) for _ in range(partition_number+1)]
+  split = [[0]*(block_number+1) for _ in range(partition_number+1)]
+  cost[0][0] = (0, 0)
+
+  for k in range(1, partition_number+1):
+    for i in range(block_number+1):
+      for j in range(i+1):
+        size = cumul[i]-cumul[j]
+        candidate = (max(cost[k-1][j][0], size), cost[k-1][j][1] + size**2)
+        if candidate < cost[k][i]:
+          cost[k][i] = candidate
+          split[k][i] = j
+
+  # rebuild the partitions begin indexes from the end
+  begins = []
+  end = block_number
+  for k in range(partition_number, 0, -1):
+    begin = split[k][end]
+    begins.append(begin)
+    end = begin
+
+  return begins[::-1]
+
+
+def partition_by_rail(action_list:List[Action], partition_number:int) -> List[List[Action]]:
+  """function to split a list of actions in balanced and spatially disjoint partitions
+  a partition contains only contiguous aircraft rails, a rail is never shared between two partitions
+
+  Args:
+      action_list (List[Action]): list of actions sorted by position
+      partition_number (int): number of partitions (one by robot)
+
+  Returns:
+      List[List[Action]]: list of partitions, some can be empty if there are fewer rails than partitions
+  """
+  groups = list(group_by_rail(action_list).values())
+  begins = __balance_blocks([len(group) for group in groups], partition_number)
+  ends = begins[1:] + [len(groups)]
+
+  partitions = []
+  for begin, end in zip(begins, ends):
+    # keep the sorted order of the initial list in each partition
+    members = set(id(action) for group in groups[begin:end] for action in group)
+    partitions.append([action for action in action_list if id(action) in members])
+
+  return partitions
@@ -1,5 +1,6 @@
 from enum import Enum, EnumMeta
 from typing import Dict, List
+from .exceptions import ModelException, ModelExceptionType
 from .marsnode import Action
 
 # init area order constants
@@ -229,8 +230,9 @@ class Position:
       if area.crossbeam_side.value == "front":
         reverse = False
       
-    coordinates = Coordinates.parse(position['coordinates'],
-                                    reverse=reverse)
+    # the station and approach positions are only areas, without coordinates
+    coordinates = Coordinates.parse(coordinates,
+                                    reverse=reverse) if coordinates else None
 
     return Position(area, coordinates)
 
@@ -246,7 +248,9 @@ def sort_by_position(action_list:List[Action]):
   for action in action_list:
     position = action.get_metadata('position')
     if not position :
-      raise Exception('no position at disposal for action')
+      raise ModelException(['SCORING', 'POSITION'],
+                           ModelExceptionType.MISSING_POSITION,
+                           f"no position at disposal for action {action.uid}, the action can't be sorted")
     position = Position.parse(position)
 
     action_pos_score.append((action, position))
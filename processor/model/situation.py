@@ -1,4 +1,5 @@
-from typing import List, Dict, Tuple
+import copy
+from typing import List, Dict, Optional, Tuple
 from collections import OrderedDict
 from .exceptions import ModelException, ModelExceptionType
 
@@ -156,6 +157,10 @@ class Situation:
     # get situation stateobject using its key 
     return self.__state_objects.get(key)
 
+  def __iter__(self):
+    # iterate on the situation stateobjects, ordered by priority
+    return iter(self.__state_objects.values())
+
   def compare(self, situation:'Situation') -> Tuple[StateObject]:
     """ Compare the situation with an other situation and return the first difference
 
@@ -183,9 +188,11 @@ class Situation:
     self.__state_objects[state_object.uid] = state_object
 
   def copy(self):
-    # make a deep copy of a situation
-    state_objects = list(self.__state_objects.values())
-    return Situation(state_objects)
+    # make a copy of a situation, the stateobjects order is kept
+    # no new sort, the stateobjects from actions results have no priority
+    situation = Situation([])
+    situation.__state_objects = OrderedDict(self.__state_objects)
+    return situation
 
   @staticmethod
   def from_list(state_list:List[Dict]) -> 'Situation':
@@ -211,4 +218,98 @@ class Situation:
 
   def __repr__(self) -> str:
       str_list= [f"{key}->{state_obj.relation}->{state_obj.state}" for key,state_obj in self.__state_objects.items()]
-      return ','.join(str_list)
\ No newline at end of file
+      return ','.join(str_list)
+
+
+# parts of a situation definition, the robot states are first
+SITUATION_PARTS = ('robot_situation', 'work_situation')
+
+def overlay_situation_definition(situation_definition:Dict,
+                                 work_situation:Dict=None,
+                                 robot_situation:Dict=None) -> Dict:
+  """function to apply the states values of a request on a situation definition, copy on write
+  the overridden states definitions are copied, the others are shared with the situation definition,
+  which is not modified
+
+  Args:
+      situation_definition (Dict): situation definition with robot and work situations
+      work_situation (Dict, optional): work states values by state key. Defaults to None.
+      robot_situation (Dict, optional): robot states values by state key. Defaults to None.
+
+  Raises:
+      KeyError: raise if a state is not in the situation definition
+
+  Returns:
+      Dict: the new situation definition
+  """
+  definition = {}
+  for part, values in zip(SITUATION_PARTS, (robot_situation, work_situation)):
+    states = dict(situation_definition[part])
+    for state, value in (values or {}).items():
+      states[state] = {**states[state], 'state': value, 'relation': 'eq'}
+    definition[part] = states
+  return definition
+
+
+class SituationTemplate:
+  """default situation, parsed once
+  the requests situations definitions are overlays of the default one (overlay_situation_definition),
+  their states definitions not overridden are the default ones, so their parsed stateobjects are reused
+  the template is not modified, the default definition and the stateobjects are shared by the requests
+  """
+  def __init__(self, situation_definition:Dict):
+    """init function
+
+    Args:
+        situation_definition (Dict): default situation definition with robot and work situations
+    """
+    # own copy, the configuration can not modify the template
+    self._definition = copy.deepcopy(situation_definition)
+    self._states:Dict[int, StateObject] = {}
+    for part in SITUATION_PARTS:
+      for state_definition in self._definition[part].values():
+        self._states[id(state_definition)] = StateObject.from_dict(state_definition)
+    self._situation, self._robot_situation = self.__parse(self._definition)
+
+  def definition(self, work_situation:Dict=None, robot_situation:Dict=None) -> Dict:
+    """function to get a situation definition with the states values of a request
+
+    Args:
+        work_situation (Dict, optional): work states values by state key. Defaults to None.
+        robot_situation (Dict, optional): robot states values by state key. Defaults to None.
+
+    Returns:
+        Dict: the situation definition, sharing the not overridden states definitions with the template
+    """
+    return overlay_situation_definition(self._definition, work_situation, robot_situation)
+
+  def parse(self, situation_definition:Dict) -> Optional[Tuple['Situation', 'Situation']]:
+    """function to parse a situation definition, only the states definitions not from the template are parsed
+
+    Args:
+        situation_definition (Dict): situation definition with robot and work situations
+
+    Returns:
+        Tuple[Situation, Situation]|None: the full situation and the robot situation,
+        None if the definition has not the states of the template
+    """
+    for part in SITUATION_PARTS:
+      if situation_definition[part].keys() != self._definition[part].keys():
+        return None
+
+    situation, robot_situation = self._situation.copy(), self._robot_situation.copy()
+    for part in SITUATION_PARTS:
+      for state_definition in situation_definition[part].values():
+        # the template keeps its states definitions alive, a known id is a template definition
+        if id(state_definition) in self._states:
+          continue
+        state = StateObject.from_dict(state_definition)
+        situation.update(state)
+        if part == 'robot_situation':
+          robot_situation.update(state)
+    return situation, robot_situation
+
+  def __parse(self, situation_definition:Dict) -> Tuple['Situation', 'Situation']:
+    robot_states = [self._states[id(sd)] for sd in situation_definition['robot_situation'].values()]
+    work_states = [self._states[id(sd)] for sd in situation_definition['work_situation'].values()]
+    return Situation(robot_states + work_states), Situation(list(robot_states))
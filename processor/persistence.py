@@ -0,0 +1,105 @@
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+# persistent cache of the values computed from the graph, in a sqlite database (WAL mode)
+# the values are keyed by namespace (cache name), canonical request key and graph version,
+# so the processes of a node share it and it survives the restarts
+# the values are pickled and compressed, the file is local and written by the processor only
+# the values are written in background, the requests do not wait for the pickling and the write
+# the disk cache is not used while the graph version is unknown (None): a value can't be matched to its graph
+
+SCHEMA = '''create table if not exists entries (
+              namespace text not null,
+              key text not null,
+              version text not null,
+              value blob not null,
+              created real not null,
+              primary key (namespace, key, version))'''
+
+
+class DiskCache:
+  """sqlite cache tier shared by the processes, survives the restarts
+  """
+  def __init__(self, path:str, max_entries:int=256, timeout:float=5):
+    """
+    Args:
+        path (str): database file path
+        max_entries (int, optional): maximal number of values, the oldest are removed. Defaults to 256.
+        timeout (float, optional): time in seconds waiting for an other process writing. Defaults to 5.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+      os.makedirs(directory, exist_ok=True)
+    self._max_entries = max_entries
+    self._logger = logging.getLogger('sequencer.cache')
+    self._lock = threading.Lock()
+    # one connection by process, shared by the threads under the lock
+    self._connection = sqlite3.connect(path, timeout=timeout, check_same_thread=False, isolation_level=None)
+    self._connection.execute('pragma journal_mode=wal')
+    self._connection.execute('pragma synchronous=normal')
+    self._connection.execute(SCHEMA)
+    self._writes = 0
+    # the writes are serialized in one background thread
+    self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='disk-cache-write')
+
+  def get(self, namespace:str, key:str, version:Optional[str]) -> Any:
+    """function to get a value of a graph version
+
+    Returns:
+        Any: the value, None if not in the cache, not readable or if the version is unknown (None)
+    """
+    if version is None:
+      return None
+
+    try:
+      with self._lock:
+        row = self._connection.execute('select value from entries where namespace=? and key=? and version=?',
+                                       (namespace, key, version)).fetchone()
+      return pickle.loads(zlib.decompress(row[0])) if row else None
+    except (sqlite3.Error, pickle.UnpicklingError, zlib.error, EOFError) as error:
+      self._logger.warning("disk cache read failed: %s", error)
+      return None
+
+  def put(self, namespace:str, key:str, version:Optional[str], value:Any):
+    """function to write a value of a graph version in background, the write errors are logged and ignored
+    the value must not be modified once put, a value of an unknown version (None) is not written
+    """
+    if version is None:
+      return
+
+    try:
+      self._writer.submit(self.__write, namespace, key, version, value, time.time())
+    except RuntimeError:
+      # cache closed
+      pass
+
+  def __write(self, namespace:str, key:str, version:Optional[str], value:Any, created:float):
+    try:
+      blob = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), 1)
+      with self._lock:
+        self._connection.execute('insert or replace into entries values (?, ?, ?, ?, ?)',
+                                 (namespace, key, version, blob, created))
+        self._writes += 1
+        if self._writes % 32 == 0:
+          self.__prune()
+    except (sqlite3.Error, pickle.PicklingError) as error:
+      self._logger.warning("disk cache write failed: %s", error)
+
+  def __prune(self):
+    # keep the most recent values
+    self._connection.execute('''delete from entries where rowid not in
+                                (select rowid from entries order by created desc limit ?)''',
+                             (self._max_entries,))
+
+  def close(self):
+    # the values put are written before the connection is closed
+    self._writer.shutdown()
+    with self._lock:
+      self._connection.close()
@@ -0,0 +1,104 @@
+import cProfile
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Tuple
+
+# header (or amqp message header) requesting the profiling of the request
+PROFILE_HEADER = 'x-profile'
+# response headers
+PROFILE_ID_HEADER = 'x-profile-id'
+PROFILE_STATUS_HEADER = 'x-profile-status'
+
+PROFILE_EXTENSION = '.pstats'
+
+
+class TokenBucket:
+  """rate limiter, a token is consumed by action and the tokens are refilled at a constant rate
+  """
+  def __init__(self, rate:float, capacity:int):
+    # rate in tokens by second
+    self._rate = rate
+    self._capacity = capacity
+    self._tokens = float(capacity)
+    self._last = time.monotonic()
+    self._lock = threading.Lock()
+
+  def acquire(self) -> bool:
+    """function to consume a token
+
+    Returns:
+        bool: true if a token is available, else false
+    """
+    with self._lock:
+      now = time.monotonic()
+      self._tokens = min(self._capacity, self._tokens + (now - self._last) * self._rate)
+      self._last = now
+      if self._tokens >= 1:
+        self._tokens -= 1
+        return True
+      return False
+
+
+class RequestProfiler:
+  """profiler of the requests asking it by header, the profiles are saved in pstats files
+  read them with python -m pstats <file> or a pstats viewer (snakeviz, speedscope after conversion)
+  """
+  def __init__(self, directory:str, rate:float=6, burst:int=1):
+    """
+    Args:
+        directory (str): directory of the profile files
+        rate (float, optional): maximal number of profiles by minute. Defaults to 6.
+        burst (int, optional): number of profiles allowed at once. Defaults to 1.
+    """
+    self._directory = directory
+    self._bucket = TokenBucket(rate/60, burst)
+    # one profile at a time, the profilers can't be active at the same time
+    self._lock = threading.Lock()
+    self._logger = logging.getLogger('sequencer.profiler')
+
+  @staticmethod
+  def requested(headers:Dict) -> bool:
+    """function to check if the request headers ask a profiling
+    """
+    if not headers:
+      return False
+    value = {str(key).lower(): value for key, value in headers.items()}.get(PROFILE_HEADER)
+    return value is not None and str(value).lower() not in ('', '0', 'false', 'no')
+
+  def profile(self, function:Callable, *args) -> Tuple[Any, Dict]:
+    """function to run a function under the profiler
+
+    Args:
+        function (Callable): function to profile
+        args: function arguments
+
+    Returns:
+        Tuple[Any, Dict]: the function result and the profile headers (profile id or status)
+    """
+    if not self._bucket.acquire():
+      self._logger.warning('profile requested but rate limit reached, request not profiled')
+      return function(*args), {PROFILE_STATUS_HEADER: 'rate-limited'}
+
+    if not self._lock.acquire(blocking=False):
+      self._logger.warning('profile requested but an other request is profiled, request not profiled')
+      return function(*args), {PROFILE_STATUS_HEADER: 'busy'}
+
+    try:
+      profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+      profiler = cProfile.Profile()
+      profiler.enable()
+      try:
+        result = function(*args)
+      finally:
+        profiler.disable()
+        os.makedirs(self._directory, exist_ok=True)
+        path = os.path.join(self._directory, f'{profile_id}{PROFILE_EXTENSION}')
+        profiler.dump_stats(path)
+        self._logger.info('request profiled, profile saved in %s', path)
+    finally:
+      self._lock.release()
+
+    return result, {PROFILE_ID_HEADER: profile_id, PROFILE_STATUS_HEADER: 'profiled'}
@@ -0,0 +1,100 @@
+import time
+from typing import Dict, List
+
+# transition sources
+CACHE_SOURCE = 'cache'
+DB_SOURCE = 'db'
+
+
+class SolverTrace:
+  """structured trace of a sequence building, returned with the sequence in explain mode
+  the solver add one step by iteration, with the expansion and the transitions lookups of the iteration,
+  the lookups out of an expansion (robot return at the end) are kept apart
+  """
+  def __init__(self):
+    self._steps:List[Dict] = []
+    # expansion of the current step while it is searched, None out of an expansion
+    self._expansion:Dict = None
+    self._lookups:List[Dict] = []
+    self._stages:Dict[str, float] = {}
+    self._probing:List[Dict] = []
+    self._tb = time.perf_counter()
+    self._step_tb = None
+
+  def iteration(self, goal:'Action', poss:bool=None):
+    """function to add an iteration step
+
+    Args:
+        goal (Action): goal checked by the solver
+        poss (bool, optional): possibility to perform the goal, None if its effect is already reached.
+    """
+    self.__close_step()
+    self._expansion = None
+    self._step_tb = time.perf_counter()
+    self._steps.append({'goal': goal.uid,
+                        'type': goal.type,
+                        'poss': poss})
+
+  def expansion(self, state_definition:Dict):
+    """function to add the expanded state definition to the current step
+    """
+    if self._steps:
+      self._expansion = {'stateDefinition': dict(state_definition),
+                         'lookups': []}
+      self._steps[-1]['expansion'] = self._expansion
+
+  def close_expansion(self):
+    """function to end the expansion of the current step, the next lookups are out of an expansion
+    """
+    self._expansion = None
+
+  def lookup(self, state_definition:Dict, source:str, action:'Action'=None):
+    """function to add a transition lookup to the current expansion
+    a second lookup of the same expansion is the retry without precondition,
+    a lookup out of an expansion (robot return at the end) is not added to a step
+
+    Args:
+        state_definition (Dict): state definition searched
+        source (str): cache or db
+        action (Action, optional): action found. Defaults to None.
+    """
+    lookup = {'source': source,
+              'retry': False,
+              'precondition': state_definition.get('precondition'),
+              'action': action.uid if action else None}
+    if self._expansion is None:
+      lookup['stateDefinition'] = dict(state_definition)
+      self._lookups.append(lookup)
+      return
+    lookup['retry'] = len(self._expansion['lookups']) > 0
+    self._expansion['lookups'].append(lookup)
+
+  def stage(self, name:str, duration:float):
+    self._stages[name] = round(self._stages.get(name, 0) + duration, 6)
+
+  def probing(self, moves:List[Dict]):
+    """function to add the subsequences moved by the probing optimization
+    """
+    self._probing.extend(moves)
+
+  def __close_step(self):
+    if self._step_tb is not None:
+      self._steps[-1]['time'] = round(time.perf_counter() - self._step_tb, 6)
+      self._step_tb = None
+
+  def to_dict(self) -> Dict:
+    self.__close_step()
+    lookups = [lookup for step in self._steps for lookup in step.get('expansion', {}).get('lookups', [])] \
+              + self._lookups
+    return {
+      'time': round(time.perf_counter() - self._tb, 6),
+      'stages': self._stages,
+      'summary': {'iterations': len(self._steps),
+                  'expansions': sum(1 for step in self._steps if 'expansion' in step),
+                  'cacheLookups': sum(1 for lookup in lookups if lookup['source'] == CACHE_SOURCE),
+                  'dbLookups': sum(1 for lookup in lookups if lookup['source'] == DB_SOURCE),
+                  'retries': sum(1 for lookup in lookups if lookup['retry'])},
+      'steps': self._steps,
+      'lookups': self._lookups,
+      'probing': self._probing
+    }
@@ -0,0 +1,81 @@
+import logging
+import threading
+from typing import Callable, List, Optional
+from .metrics import GRAPH_VERSION_CHANGES
+
+
+class GraphVersionWatcher:
+  """detector of the graph changes, the graph version is polled in background
+  the listeners are called with the old and new versions when the version change
+  the last version is kept while the database is not reachable
+  """
+  def __init__(self, version_function:Callable[[], Optional[str]], interval:float=10):
+    """
+    Args:
+        version_function (Callable[[], Optional[str]]): function to get the graph version (DataUnit.graph_version)
+        interval (float, optional): polling interval in seconds. Defaults to 10.
+    """
+    self._version_function = version_function
+    self._interval = interval
+    self._listeners:List[Callable[[Optional[str], str], None]] = []
+    self._logger = logging.getLogger('sequencer.graph_version')
+    self._stop = threading.Event()
+    self._thread:threading.Thread = None
+
+    self.version:Optional[str] = None
+    self.reachable = True
+    self.check()
+
+  def add_listener(self, listener:Callable[[Optional[str], str], None]):
+    """function to add a function called on the version changes, with the old and the new versions
+    """
+    self._listeners.append(listener)
+
+  def check(self) -> bool:
+    """function to poll the graph version and call the listeners if it changed
+
+    Returns:
+        bool: true if the version changed
+    """
+    try:
+      version = self._version_function()
+    except Exception as error:
+      if self.reachable:
+        self._logger.warning("graph version not available, the cached values are served: %s", error)
+      self.reachable = False
+      return False
+
+    if not self.reachable:
+      self._logger.info("graph version available again")
+    self.reachable = True
+
+    if version == self.version:
+      return False
+
+    old_version, self.version = self.version, version
+    self._logger.info("graph version changed from %s to %s", old_version, version)
+    GRAPH_VERSION_CHANGES.inc()
+    for listener in self._listeners:
+      try:
+        listener(old_version, version)
+      except Exception:
+        self._logger.exception("graph version listener failed")
+    return True
+
+  def start(self):
+    """function to start the polling thread
+    """
+    if self._thread:
+      return
+    self._thread = threading.Thread(target=self.__poll, name='graph-version-watcher', daemon=True)
+    self._thread.start()
+
+  def __poll(self):
+    while not self._stop.wait(self._interval):
+      self.check()
+
+  def stop(self):
+    self._stop.set()
+    if self._thread:
+      self._thread.join()
+      self._thread = None
@@ -0,0 +1,58 @@
+import logging
+import threading
+import time
+from typing import Dict, List, Tuple
+from .components import SequenceUnit, SequenceTypeRegister
+
+
+class WarmUp:
+  """build the common requests in background to fill the sequences cache
+  so the first real requests after a start (or a graph change) are served from the cache
+  """
+  def __init__(self, sequence_unit:SequenceUnit, requests:List[Tuple[SequenceTypeRegister, Dict, Dict]]):
+    """
+    Args:
+        sequence_unit (SequenceUnit): sequence unit with a sequences cache
+        requests (List[Tuple[SequenceTypeRegister, Dict, Dict]]): sequence type, goals definition
+        and situation definition of each request, as builded by the request handlers
+    """
+    self._sequence_unit = sequence_unit
+    self._requests = requests
+    self._logger = logging.getLogger('sequencer.warmup')
+    self._lock = threading.Lock()
+    self._thread:threading.Thread = None
+    # a warm up asked while an other one runs, it is run again at the end
+    self._pending = False
+
+  def run(self):
+    """function to build the requests, a failed request is logged and skipped
+    """
+    tb = time.time()
+    built = 0
+    for sequence_type, goals_definition, situation_definition in self._requests:
+      try:
+        self._sequence_unit.build(sequence_type, goals_definition, situation_definition)
+        built += 1
+      except Exception as error:
+        self._logger.warning(f"warm up of a {sequence_type.name} request failed: {error}")
+    self._logger.info(f"warm up ended - {built}/{len(self._requests)} requests builded in {round(time.time() - tb, 2)} seconds")
+
+  def start(self, *args):
+    """function to run the warm up in a background thread
+    the arguments are ignored, so it can be used as a graph version listener
+    """
+    with self._lock:
+      if self._thread:
+        self._pending = True
+        return
+      self._thread = threading.Thread(target=self.__run_pending, name='warmup', daemon=True)
+      self._thread.start()
+
+  def __run_pending(self):
+    while True:
+      self.run()
+      with self._lock:
+        if not self._pending:
+          self._thread = None
+          return
+        self._pending = False
@@ -82,7 +82,7 @@ def get_validation_schemas(schemas_dir:str)->Dict[str, Dict]:
         for path in path_list:
           schema_dict[path] = schema
         
-      return schema_dict
+    return schema_dict
   except json.JSONDecodeError as error :
     raise BaseException(["VALIDATION_SCHEMA"],
                         BaseExceptionType.CONFIG_NOT_CONFORM,